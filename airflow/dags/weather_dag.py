@@ -58,35 +58,12 @@ for idx, city in enumerate(CITIES):
     )
     ingestion_tasks.append(task)
 
-# Upload to S3 using Python boto3
+# Upload new and changed Parquet files to S3 (manifest-based, parallel; see s3_upload.py)
 upload_to_s3 = BashOperator(
     task_id='upload_to_s3',
     bash_command='''
-    python3 << 'EOF'
-import boto3
-import os
-from pathlib import Path
-
-s3_bucket = os.getenv('S3_BUCKET', 'weather-data-koorosh-thesis')
-s3_client = boto3.client('s3',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-    region_name=os.getenv('AWS_REGION', 'eu-west-1')
-)
-
-data_dir = Path('/opt/airflow/data/raw')
-uploaded = 0
-
-if data_dir.exists():
-    for parquet_file in data_dir.glob('*.parquet'):
-        s3_key = f'raw/{parquet_file.name}'
-        print(f'Uploading {parquet_file.name} to s3://{s3_bucket}/{s3_key}')
-        s3_client.upload_file(str(parquet_file), s3_bucket, s3_key)
-        uploaded += 1
-    print(f'✅ Uploaded {uploaded} files to S3')
-else:
-    print(f'⚠️  Data directory {data_dir} does not exist')
-EOF
+    cd /opt/airflow/scripts
+    python s3_upload.py
     ''',
     dag=dag,
 )
@@ -141,7 +118,7 @@ log_completion = BashOperator(
     bash_command='''
     echo "Weather ingestion completed at $(date)"
     echo "Files uploaded to S3, dbt transformation triggered"
-    ls -lh /opt/airflow/data/raw/*.parquet | tail -10
+    find /opt/airflow/data/raw -name '*.parquet' -newermt '-1 day' | tail -10
     ''',
     dag=dag,
 )
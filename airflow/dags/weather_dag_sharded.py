@@ -0,0 +1,140 @@
+"""
+Sharded Weather Data Ingestion DAG
+Runs daily at 2 AM UTC. Cities come from config.CITIES and are split into
+shards of INGESTION_SHARD_SIZE; each shard is one mapped task that ingests
+its cities concurrently in a single warm interpreter via run_cities().
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from airflow import DAG
+from airflow.exceptions import AirflowException
+from airflow.operators.bash import BashOperator
+from airflow.operators.python import PythonOperator
+
+SCRIPTS_DIR = '/opt/airflow/scripts'
+sys.path.insert(0, SCRIPTS_DIR)
+
+# config only imports the standard library, so it is cheap at parse time
+from config import CITIES, INGESTION_SHARD_SIZE, INGESTION_MAX_ACTIVE_SHARDS, MAX_CONCURRENT_REQUESTS
+
+default_args = {
+    'owner': 'koorosh',
+    'depends_on_past': False,
+    'email_on_failure': False,
+    'email_on_retry': False,
+    'retries': 2,
+    'retry_delay': timedelta(minutes=5),
+    'start_date': datetime(2026, 2, 1),
+}
+
+dag = DAG(
+    'weather_ingestion_sharded',
+    default_args=default_args,
+    description='Daily weather data ingestion, cities sharded across mapped tasks',
+    schedule_interval='0 2 * * *',  # 2 AM UTC daily
+    catchup=False,
+    max_active_runs=1,
+    tags=['weather', 'etl', 'daily', 'sharded'],
+)
+
+
+def shard_cities(city_ids: List[str], shard_size: int) -> List[List[str]]:
+    """Split city ids into consecutive shards of at most shard_size."""
+    return [city_ids[i:i + shard_size] for i in range(0, len(city_ids), shard_size)]
+
+
+def ingest_shard(city_ids: List[str]) -> Dict[str, int]:
+    """Ingest yesterday's data for a shard of cities concurrently in this process."""
+    # Heavy imports (pandas, pyarrow) are paid once per shard, not once per city
+    from config import get_incremental_date
+    from weather_ingest import run_cities
+
+    incremental_date = get_incremental_date()
+    results = run_cities(
+        city_ids, incremental_date, incremental_date,
+        use_historical_api=False, max_workers=min(MAX_CONCURRENT_REQUESTS, len(city_ids))
+    )
+
+    failed = [city_id for city_id, paths in results.items() if not paths]
+    if failed:
+        raise AirflowException(f"Ingestion failed for: {', '.join(failed)}")
+    return {city_id: len(paths) for city_id, paths in results.items()}
+
+
+def upload_to_s3() -> Dict[str, int]:
+    """Upload new and changed raw Parquet files to S3 under raw/."""
+    from s3_upload import upload_dataset
+
+    stats = upload_dataset()
+    if stats['failed']:
+        raise AirflowException(f"{len(stats['failed'])} file(s) failed to upload; the next run retries them")
+    return {key: value for key, value in stats.items() if key != 'failed'}
+
+
+def trigger_dbt_transform():
+    """Trigger the dbt transformation workflow via repository_dispatch."""
+    import requests
+
+    github_token = os.getenv('GITHUB_TOKEN')
+    repo_owner = os.getenv('GITHUB_REPO_OWNER', 'kooroshkz')
+    repo_name = os.getenv('GITHUB_REPO_NAME', 'adaptive-data-profiling-etl')
+
+    if not github_token:
+        print('GITHUB_TOKEN not set, skipping transformation trigger')
+        return
+
+    response = requests.post(
+        f'https://api.github.com/repos/{repo_owner}/{repo_name}/dispatches',
+        headers={
+            'Authorization': f'token {github_token}',
+            'Accept': 'application/vnd.github.v3+json'
+        },
+        json={
+            'event_type': 'trigger-dbt-transform',
+            'client_payload': {
+                'triggered_by': 'airflow',
+                'workflow': 'weather_ingestion_sharded'
+            }
+        }
+    )
+    if response.status_code != 204:
+        raise AirflowException(f'Failed to trigger workflow: {response.status_code} {response.text}')
+    print('Successfully triggered dbt transformation workflow')
+
+
+# Install Python dependencies (only needs to run once, but safe to repeat)
+install_deps = BashOperator(
+    task_id='install_dependencies',
+    bash_command='''
+    pip install pandas pyarrow requests boto3 --quiet
+    ''',
+    dag=dag,
+)
+
+# One mapped task instance per shard; adding cities adds shards, not interpreters per city
+ingest_shards = PythonOperator.partial(
+    task_id='ingest_shard',
+    python_callable=ingest_shard,
+    max_active_tis_per_dagrun=INGESTION_MAX_ACTIVE_SHARDS,
+    dag=dag,
+).expand(
+    op_kwargs=[{'city_ids': shard} for shard in shard_cities(sorted(CITIES), INGESTION_SHARD_SIZE)]
+)
+
+upload = PythonOperator(
+    task_id='upload_to_s3',
+    python_callable=upload_to_s3,
+    dag=dag,
+)
+
+trigger_dbt = PythonOperator(
+    task_id='trigger_dbt_transform',
+    python_callable=trigger_dbt_transform,
+    dag=dag,
+)
+
+install_deps >> ingest_shards >> upload >> trigger_dbt
@@ -0,0 +1,81 @@
+"""Backfill planning and checkpointing for chunked historical ingestion."""
+
+import os
+import json
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import CHECKPOINT_PATH
+from utils import logger
+
+WINDOW_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+WINDOW_CHOICES = list(WINDOW_MONTHS.keys()) + ["none"]
+
+
+def plan_windows(start_date: str, end_date: str, window: str = "month") -> List[Tuple[str, str]]:
+    """Split a date range into calendar-aligned (start, end) windows."""
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if start > end:
+        raise ValueError(f"Start date {start_date} is after end date {end_date}")
+
+    if window == "none":
+        return [(start_date, end_date)]
+    if window not in WINDOW_MONTHS:
+        raise ValueError(f"Unknown backfill window: {window}. Available: {WINDOW_CHOICES}")
+
+    months = WINDOW_MONTHS[window]
+    windows = []
+    current = start
+    while current <= end:
+        boundary = (current.month - 1) // months * months + months
+        next_start = date(current.year + boundary // 12, boundary % 12 + 1, 1)
+        window_end = min(end, next_start - timedelta(days=1))
+        windows.append((current.isoformat(), window_end.isoformat()))
+        current = next_start
+
+    return windows
+
+
+class BackfillCheckpoint:
+    """Manifest of finished backfill windows for one city."""
+
+    def __init__(self, city_id: str, checkpoint_dir: str = CHECKPOINT_PATH):
+        self.city_id = city_id
+        self.path = os.path.join(checkpoint_dir, f"{city_id}_backfill.json")
+        self._lock = threading.Lock()
+        self.windows = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Read finished windows from disk."""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            windows = json.load(f)
+        logger.info(f"Loaded {len(windows)} finished backfill window(s) for {self.city_id}")
+        return windows
+
+    @staticmethod
+    def _key(start_date: str, end_date: str) -> str:
+        return f"{start_date}_{end_date}"
+
+    def is_done(self, start_date: str, end_date: str) -> bool:
+        """Check whether a window has already been ingested."""
+        return self._key(start_date, end_date) in self.windows
+
+    def mark_done(self, start_date: str, end_date: str, hourly_paths: List[str], batch_id: Optional[str]):
+        """Record a finished window and persist the manifest atomically."""
+        with self._lock:
+            self.windows[self._key(start_date, end_date)] = {
+                "start_date": start_date,
+                "end_date": end_date,
+                "hourly_paths": hourly_paths,
+                "batch_id": batch_id,
+                "completed_at": datetime.now().isoformat(timespec="seconds")
+            }
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.windows, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,138 @@
+"""Content-addressed on-disk cache for Open-Meteo API responses."""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from config import (
+    CACHE_PATH, CACHE_MAX_BYTES,
+    CACHE_ARCHIVE_TTL_DAYS, CACHE_RECENT_TTL_HOURS, CACHE_SETTLE_DAYS
+)
+from utils import logger
+
+KEY_PARAMS = ["latitude", "longitude", "start_date", "end_date", "hourly", "daily", "timezone"]
+
+
+def archive_ttl_seconds(end_date: str) -> float:
+    """TTL for an archive response; recent days may still be revised upstream."""
+    settled_before = datetime.now() - timedelta(days=CACHE_SETTLE_DAYS)
+    if datetime.strptime(end_date, "%Y-%m-%d") < settled_before:
+        return CACHE_ARCHIVE_TTL_DAYS * 86400
+    return CACHE_RECENT_TTL_HOURS * 3600
+
+
+class ResponseCache:
+    """Gzipped JSON responses keyed by request content, with size-bounded LRU eviction.
+
+    A file's mtime marks when it was written (used for TTL checks) and its
+    atime marks when it was last read (used for LRU eviction).
+    """
+
+    def __init__(self, cache_dir: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def make_key(url: str, params: Dict[str, Any]) -> str:
+        """Hash the endpoint and the parameters that determine the response."""
+        key_fields = {"url": url, **{name: params.get(name) for name in KEY_PARAMS}}
+        payload = json.dumps(key_fields, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def get(self, url: str, params: Dict[str, Any], ttl_seconds: float) -> Optional[Dict]:
+        """Return a cached response younger than the TTL, or None."""
+        path = self._path(self.make_key(url, params))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        now = time.time()
+        if now - stat.st_mtime > ttl_seconds:
+            logger.info(f"Cached response expired: {os.path.basename(path)}")
+            return None
+
+        try:
+            with gzip.open(path, "rt") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            return None
+
+        os.utime(path, (now, stat.st_mtime))
+        logger.info(f"Cache hit: {os.path.basename(path)}")
+        return data
+
+    def put(self, url: str, params: Dict[str, Any], data: Dict):
+        """Store a response and evict least recently used entries over the size limit."""
+        path = self._path(self.make_key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump(data, f)
+
+        with self._lock:
+            # A refreshed entry replaces the old file, so only the size difference counts
+            try:
+                replaced_size = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+            if self._size is None:
+                self._size = sum(os.path.getsize(p) for p in self._entries())
+            else:
+                self._size += os.path.getsize(path) - replaced_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def discard(self, url: str, params: Dict[str, Any]):
+        """Remove a stored response, e.g. one that failed validation after it was cached."""
+        path = self._path(self.make_key(url, params))
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            if self._size is not None:
+                self._size -= size
+        logger.info(f"Discarded cache entry: {os.path.basename(path)}")
+
+    def _entries(self):
+        """Yield the paths of all cache entries."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    yield os.path.join(root, name)
+
+    def _evict(self):
+        """Delete least recently read entries until the cache fits its size limit."""
+        entries = []
+        for path in self._entries():
+            stat = os.stat(path)
+            entries.append((stat.st_atime, stat.st_size, path))
+        entries.sort()
+
+        self._size = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            os.remove(path)
+            self._size -= size
+            evicted += 1
+
+        logger.info(f"Evicted {evicted} cache entries ({self._size / (1024 * 1024):.1f} MB remaining)")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Small-file compaction for the partitioned raw Parquet dataset.
+
+Daily incremental runs leave one tiny file per city per day in each
+month partition. Compaction merges the small files of a partition into
+files of ``target_rows`` rows sorted by (city_id, time), swaps them in and
+records the merged files and batch_ids in an append-only manifest.
+
+Swap protocol, so a crash never loses or duplicates rows permanently:
+  1. write the merged files under temporary names
+  2. append a ``pending`` manifest record listing outputs and sources
+  3. rename the temporary files into place
+  4. delete the source files
+  5. append a ``done`` record
+Pending records found on the next run are rolled forward if every output
+was renamed into place, and rolled back otherwise.
+"""
+
+import os
+import glob
+import json
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from config import (
+    RAW_DATA_PATH, COMPACTION_MANIFEST_PATH,
+    COMPACTION_TARGET_ROWS, COMPACTION_SMALL_FILE_BYTES
+)
+from parquet_profiles import sort_table, writer_options
+from raw_layout import list_partitions
+from schema_registry import DATASET_VARIABLES, conform_table
+from utils import logger
+
+
+class CompactionManifest:
+    """Append-only JSON-lines log of compactions."""
+
+    def __init__(self, path: str = COMPACTION_MANIFEST_PATH):
+        self.path = path
+
+    def entries(self) -> Dict[str, Dict]:
+        """Fold the log into the latest state of each compaction."""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                entries.setdefault(record["id"], {}).update(record)
+        return entries
+
+    def append(self, record: Dict):
+        """Durably append one record."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def recover(manifest: CompactionManifest):
+    """Finish or roll back compactions interrupted by a crash."""
+    for compaction_id, entry in manifest.entries().items():
+        if entry["status"] != "pending":
+            continue
+
+        if all(os.path.exists(path) for path in entry["outputs"]):
+            for path in entry["sources"]:
+                if os.path.exists(path):
+                    os.remove(path)
+            manifest.append({"id": compaction_id, "status": "done"})
+            logger.info(f"Rolled forward interrupted compaction {compaction_id}")
+        else:
+            for path in entry["outputs"]:
+                for leftover in (path, f"{path}.tmp"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+            manifest.append({"id": compaction_id, "status": "rolled_back"})
+            logger.info(f"Rolled back interrupted compaction {compaction_id}")
+
+
+def compact_partition(
+    partition: str,
+    dataset: str,
+    manifest: CompactionManifest,
+    target_rows: int = COMPACTION_TARGET_ROWS,
+    small_file_bytes: int = COMPACTION_SMALL_FILE_BYTES,
+    dry_run: bool = False
+) -> int:
+    """Merge the small files of one partition and return how many files were replaced."""
+    sources = sorted(
+        path for path in glob.glob(os.path.join(partition, "*.parquet"))
+        if os.path.getsize(path) < small_file_bytes
+    )
+    if len(sources) < 2:
+        return 0
+
+    if dry_run:
+        logger.info(f"Would compact {len(sources)} file(s) in {partition}")
+        return len(sources)
+
+    table = sort_table(pa.concat_tables([conform_table(pq.read_table(path), dataset) for path in sources]))
+    write_options = writer_options(table)
+    write_options["row_group_size"] = target_rows
+    batch_ids = sorted(str(batch_id) for batch_id in pc.unique(table.column("batch_id")).to_pylist())
+
+    city_id = os.path.basename(os.path.dirname(os.path.dirname(partition))).split("=", 1)[1]
+    compaction_id = f"{city_id}_{dataset}_compacted_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+    outputs = []
+    for index, offset in enumerate(range(0, table.num_rows, target_rows)):
+        path = os.path.join(partition, f"{compaction_id}_{index}.parquet")
+        pq.write_table(table.slice(offset, target_rows), f"{path}.tmp", **write_options)
+        outputs.append(path)
+
+    manifest.append({
+        "id": compaction_id,
+        "status": "pending",
+        "dataset": dataset,
+        "partition": partition,
+        "outputs": outputs,
+        "sources": sources,
+        "batch_ids": batch_ids,
+        "row_count": table.num_rows,
+        "created_at": datetime.now().isoformat(timespec="seconds")
+    })
+    for path in outputs:
+        os.replace(f"{path}.tmp", path)
+    for path in sources:
+        os.remove(path)
+    manifest.append({"id": compaction_id, "status": "done"})
+
+    logger.info(f"Compacted {len(sources)} file(s) into {len(outputs)} in {partition} ({table.num_rows:,} rows)")
+    return len(sources)
+
+
+def compact_dataset(
+    dataset: str,
+    base_path: str = RAW_DATA_PATH,
+    manifest: Optional[CompactionManifest] = None,
+    target_rows: int = COMPACTION_TARGET_ROWS,
+    small_file_bytes: int = COMPACTION_SMALL_FILE_BYTES,
+    dry_run: bool = False
+) -> int:
+    """Compact every partition of a dataset and return how many files were replaced."""
+    manifest = manifest or CompactionManifest()
+    if not dry_run:
+        recover(manifest)
+
+    replaced = 0
+    partitions = list_partitions(dataset, base_path)
+    for partition in partitions:
+        replaced += compact_partition(partition, dataset, manifest, target_rows, small_file_bytes, dry_run)
+
+    logger.info(f"Compaction of {dataset}: {replaced} file(s) replaced across {len(partitions)} partition(s)")
+    return replaced
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Merge small raw Parquet files into right-sized, sorted files",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python compaction.py
+  python compaction.py --dataset hourly --target-rows 250000
+  python compaction.py --dry-run
+        """
+    )
+    parser.add_argument(
+        "--dataset",
+        choices=list(DATASET_VARIABLES.keys()) + ["all"],
+        default="all",
+        help="Dataset to compact"
+    )
+    parser.add_argument(
+        "--target-rows",
+        type=int,
+        default=COMPACTION_TARGET_ROWS,
+        help="Rows per output file and row group"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report which partitions would be compacted"
+    )
+    args = parser.parse_args()
+
+    datasets: List[str] = list(DATASET_VARIABLES.keys()) if args.dataset == "all" else [args.dataset]
+    for dataset in datasets:
+        compact_dataset(dataset, target_rows=args.target_rows, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
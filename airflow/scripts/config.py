@@ -1,5 +1,6 @@
 """Configuration for weather data ingestion."""
 
+import os
 from datetime import datetime, timedelta
 
 CITIES = {
@@ -35,11 +36,13 @@ CITIES = {
     }
 }
 
-HISTORICAL_API_URL = "https://archive-api.open-meteo.com/v1/archive"
-FORECAST_API_URL = "https://api.open-meteo.com/v1/forecast"
+# Overridable so ingestion can run against a local mock (benchmarks/mock_open_meteo.py)
+HISTORICAL_API_URL = os.environ.get("OPEN_METEO_HISTORICAL_URL", "https://archive-api.open-meteo.com/v1/archive")
+FORECAST_API_URL = os.environ.get("OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
 
 BACKFILL_START_DATE = "2024-01-01"
 BACKFILL_END_DATE = "2025-12-31"
+BACKFILL_WINDOW = "month"
 
 def get_incremental_date():
     """Returns yesterday's date for incremental ingestion."""
@@ -105,7 +108,88 @@ DAILY_VARIABLES = [
 REQUEST_TIMEOUT = 30
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+MAX_RETRY_DELAY = 30
+HTTP_POOL_SIZE = 10
+
+TRANSFORM_ENGINE = "arrow"
+
+MAX_CONCURRENT_REQUESTS = 5
+REQUESTS_PER_SECOND = float(os.environ.get("OPEN_METEO_REQUESTS_PER_SECOND", 5))  # 0 disables the limiter
+
+# Sharded Airflow ingestion (weather_dag_sharded.py): cities per mapped task, and
+# how many shards run at once; each shard has its own REQUESTS_PER_SECOND budget
+INGESTION_SHARD_SIZE = 10
+INGESTION_MAX_ACTIVE_SHARDS = 2
 
-import os
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 RAW_DATA_PATH = os.path.join(PROJECT_ROOT, "data", "raw")
+CHECKPOINT_PATH = os.path.join(PROJECT_ROOT, "data", "checkpoints")
+COMPACTION_MANIFEST_PATH = os.path.join(RAW_DATA_PATH, "_compaction_manifest.jsonl")
+
+COMPACTION_TARGET_ROWS = 500_000
+COMPACTION_SMALL_FILE_BYTES = 16 * 1024 ** 2
+
+# Parquet writer profiles, applied by parquet_profiles.py
+PARQUET_WRITER_PROFILES = {
+    # The original writer: snappy, default row groups, unsorted, no page index
+    "legacy": {
+        "compression": "snappy",
+    },
+    "balanced": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "row_group_size": 128 * 1024,
+        "sort": True,
+        "page_index": True,
+        "byte_stream_split": True,
+    },
+    "compact": {
+        "compression": "zstd",
+        "compression_level": 12,
+        "row_group_size": 512 * 1024,
+        "sort": True,
+        "page_index": True,
+        "byte_stream_split": True,
+    },
+    "query": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "row_group_size": 32 * 1024,
+        "sort": True,
+        "page_index": True,
+        "byte_stream_split": True,
+        "bloom_filter_columns": ["city_id"],
+    },
+}
+PARQUET_WRITER_PROFILE = "balanced"
+
+CACHE_PATH = os.path.join(PROJECT_ROOT, "data", "cache", "responses")
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_ARCHIVE_TTL_DAYS = 365
+CACHE_RECENT_TTL_HOURS = 6
+CACHE_SETTLE_DAYS = 7
+
+# Raw Parquet upload (s3_upload.py); S3_ENDPOINT_URL points at MinIO or moto for local testing
+S3_BUCKET = os.environ.get("S3_BUCKET", "weather-data-koorosh-thesis")
+S3_PREFIX = "raw"
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+AWS_REGION = os.environ.get("AWS_REGION", "eu-west-1")
+UPLOAD_MANIFEST_PATH = os.path.join(PROJECT_ROOT, "data", "upload_manifest.jsonl")
+UPLOAD_MAX_WORKERS = 8
+UPLOAD_MAX_RETRIES = 4
+UPLOAD_MULTIPART_BYTES = 8 * 1024 ** 2
+
+# Reading raw Parquet in place from S3 (duckdb/storage.py): byte ranges fetched by DuckDB
+# and pyarrow are kept in a persistent local block cache
+RAW_CACHE_PATH = os.path.join(PROJECT_ROOT, "data", "cache", "parquet_blocks")
+RAW_CACHE_BLOCK_BYTES = 1024 ** 2
+
+# Stage metrics (metrics.py): the ingestion CLI appends to METRICS_DB_PATH and, when
+# METRICS_PROMETHEUS_PATH is set, writes a Prometheus textfile-collector file
+METRICS_DB_PATH = os.environ.get("METRICS_DB_PATH", os.path.join(PROJECT_ROOT, "data", "metrics.duckdb"))
+METRICS_PROMETHEUS_PATH = os.environ.get("METRICS_PROMETHEUS_PATH") or None
+METRICS_RSS_SAMPLE_SECONDS = 0.01
+METRICS_DB_WRITE_RETRIES = 5
+
+QUARANTINE_PATH = os.path.join(PROJECT_ROOT, "data", "quarantine")
+VALIDATION_MAX_NULL_RATIO = 0.5
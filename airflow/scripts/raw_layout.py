@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Hive-partitioned layout of the raw Parquet dataset.
+
+Files live under ``dataset=<hourly|daily>/city_id=<id>/year=<yyyy>/month=<m>/``
+so DuckDB's ``read_parquet(..., hive_partitioning = true)`` can prune whole
+directories on city and date filters.
+"""
+
+import os
+import glob
+import argparse
+from typing import Iterator, List, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from config import RAW_DATA_PATH
+from parquet_profiles import apply_writer_profile
+from schema_registry import DATASET_VARIABLES, conform_table
+from utils import logger
+
+
+def partition_dir(dataset: str, city_id: str, year: int, month: int, base_path: str = RAW_DATA_PATH) -> str:
+    """Directory holding one city's files for one month."""
+    return os.path.join(base_path, f"dataset={dataset}", f"city_id={city_id}", f"year={year}", f"month={month}")
+
+
+def dataset_glob(dataset: str, base_path: str = RAW_DATA_PATH) -> str:
+    """Glob matching every Parquet file of a dataset."""
+    return os.path.join(base_path, f"dataset={dataset}", "**", "*.parquet")
+
+
+def list_partitions(dataset: str, base_path: str = RAW_DATA_PATH) -> List[str]:
+    """Leaf partition directories of a dataset."""
+    pattern = os.path.join(base_path, f"dataset={dataset}", "city_id=*", "year=*", "month=*")
+    return sorted(path for path in glob.glob(pattern) if os.path.isdir(path))
+
+
+def split_by_month(table: pa.Table) -> Iterator[Tuple[int, int, pa.Table]]:
+    """Yield (year, month, rows) groups of a table by its time column."""
+    times = table.column("time")
+    month_keys = pc.add(pc.multiply(pc.year(times), 100), pc.month(times))
+    for key in sorted(pc.unique(month_keys).to_pylist()):
+        yield key // 100, key % 100, table.filter(pc.equal(month_keys, key))
+
+
+def write_table_atomic(table: pa.Table, filepath: str, **write_options):
+    """Write a Parquet file under a temporary name and rename it into place."""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    tmp_path = f"{filepath}.tmp"
+    pq.write_table(table, tmp_path, **write_options)
+    os.replace(tmp_path, filepath)
+
+
+def write_partitioned(
+    table: pa.Table,
+    dataset: str,
+    city_id: str,
+    filename: str,
+    base_path: str = RAW_DATA_PATH,
+    **write_options
+) -> List[str]:
+    """Write a table into its city/year/month partitions and return the file paths."""
+    paths = []
+    for year, month, rows in split_by_month(table):
+        filepath = os.path.join(partition_dir(dataset, city_id, year, month, base_path), filename)
+        write_table_atomic(rows, filepath, **write_options)
+        paths.append(filepath)
+    return paths
+
+
+def migrate_flat_files(base_path: str = RAW_DATA_PATH) -> int:
+    """Move legacy flat ``{city}_{dataset}_*.parquet`` files into the partitioned layout."""
+    migrated = 0
+    for dataset in DATASET_VARIABLES:
+        for filepath in sorted(glob.glob(os.path.join(base_path, f"*_{dataset}_*.parquet"))):
+            filename = os.path.basename(filepath)
+            city_id = filename.split(f"_{dataset}_")[0]
+            table, write_options = apply_writer_profile(conform_table(pq.read_table(filepath), dataset))
+            write_partitioned(table, dataset, city_id, filename, base_path, **write_options)
+            os.remove(filepath)
+            migrated += 1
+            logger.info(f"Migrated {filename}")
+
+    logger.info(f"Migrated {migrated} flat file(s) into the partitioned layout")
+    return migrated
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Maintain the partitioned raw Parquet layout")
+    parser.add_argument(
+        "--migrate",
+        action="store_true",
+        help="Move legacy flat files in data/raw into dataset/city_id/year/month partitions"
+    )
+    args = parser.parse_args()
+
+    if args.migrate:
+        migrate_flat_files()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 """Utility functions for weather data ingestion."""
 
 import time
+import random
 import logging
+import threading
 from typing import Dict, Optional, Any
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
 from datetime import datetime
 
+from metrics import stage
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -13,39 +20,96 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class HostRateLimiter:
+    """Thread-safe limiter that spaces out requests to each API host."""
+
+    def __init__(self, requests_per_second: float):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def wait(self, url: str):
+        """Block until a request to the URL's host is allowed."""
+        if not self.min_interval:
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str, pool_size: int = 10) -> requests.Session:
+    """Return the process-wide keep-alive session for the URL's host."""
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            # urllib3 advertises br/zstd only when their decoders are installed
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            _sessions[host] = session
+            logger.info(f"Opened HTTP session for {host} (pool size {pool_size})")
+    return session
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter for the given retry attempt."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
 def make_api_request(
     url: str,
     params: Dict[str, Any],
     timeout: int = 30,
     max_retries: int = 3,
-    retry_delay: int = 2
+    retry_delay: int = 2,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    pool_size: int = 10,
+    max_retry_delay: float = 30
 ) -> Optional[Dict]:
-    """Make HTTP GET request with retry logic."""
+    """Make HTTP GET request over a pooled session with retry logic."""
+    session = get_session(url, pool_size)
     for attempt in range(max_retries):
         try:
+            if rate_limiter:
+                rate_limiter.wait(url)
             logger.info(f"API request attempt {attempt + 1}/{max_retries}")
-            response = requests.get(url, params=params, timeout=timeout)
+            response = session.get(url, params=params, timeout=timeout)
             response.raise_for_status()
-            data = response.json()
+            with stage("json_decode") as decoded:
+                data = response.json()
+                decoded["bytes"] = len(response.content)
             logger.info("API request successful")
             return data
             
         except requests.exceptions.Timeout:
             logger.warning(f"Request timeout (attempt {attempt + 1})")
             if attempt < max_retries - 1:
-                time.sleep(retry_delay * (attempt + 1))
+                time.sleep(backoff_delay(attempt, retry_delay, max_retry_delay))
                 
         except requests.exceptions.HTTPError as e:
             logger.error(f"HTTP error: {e}")
             if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+                time.sleep(backoff_delay(attempt, retry_delay, max_retry_delay))
             else:
                 raise
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed: {e}")
             if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+                time.sleep(backoff_delay(attempt, retry_delay, max_retry_delay))
                 
         except ValueError as e:
             logger.error(f"Invalid JSON response: {e}")
@@ -76,9 +140,19 @@ def validate_weather_data(data: Dict, expected_keys: list) -> bool:
     return True
 
 
-def generate_batch_id() -> str:
-    """Generate unique batch identifier."""
-    batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+def generate_batch_id(city_id: Optional[str] = None, window_start: Optional[str] = None) -> str:
+    """Generate unique batch identifier.
+
+    The timestamp comes first so batch_ids still sort by ingestion time;
+    the city and the window start keep concurrent cities and backfill
+    windows in separate batches.
+    """
+    parts = [datetime.now().strftime("%Y%m%d_%H%M%S")]
+    if city_id:
+        parts.append(city_id)
+    if window_start:
+        parts.append(window_start.replace("-", ""))
+    batch_id = "_".join(parts)
     logger.info(f"Generated batch ID: {batch_id}")
     return batch_id
 
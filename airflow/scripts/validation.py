@@ -0,0 +1,125 @@
+"""Vectorized validation of API payloads before anything is written.
+
+Checks run on the response arrays themselves, so a broken window is caught
+before it reaches Parquet, DuckDB or dbt. A window with any issue is
+quarantined: the payload and its issues go to ``QUARANTINE_PATH`` instead of
+the raw dataset.
+"""
+
+import os
+import gzip
+import json
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from config import QUARANTINE_PATH, VALIDATION_MAX_NULL_RATIO, HOURLY_VARIABLES, DAILY_VARIABLES
+from schema_registry import variable_range
+
+SECTIONS = {
+    "hourly": (HOURLY_VARIABLES, np.timedelta64(1, "h")),
+    "daily": (DAILY_VARIABLES, np.timedelta64(1, "D")),
+}
+
+
+def issue(section: str, check: str, detail: str, variable: str = None) -> Dict:
+    """One validation finding."""
+    return {"section": section, "check": check, "variable": variable, "detail": detail}
+
+
+def check_times(section: str, times: np.ndarray, step: np.timedelta64, expected_start, expected_end) -> List[Dict]:
+    """Timestamps must be strictly increasing by exactly one step and cover the requested window."""
+    issues = []
+    steps = np.diff(times)
+    if np.any(steps <= np.timedelta64(0)):
+        issues.append(issue(section, "monotonic", f"{int(np.sum(steps <= np.timedelta64(0)))} non-increasing timestamp(s)"))
+    gaps = steps > step
+    if np.any(gaps):
+        first = times[:-1][gaps][0]
+        issues.append(issue(section, "gap_free", f"{int(gaps.sum())} gap(s), first after {first}"))
+
+    if times[0] > expected_start or times[-1] < expected_end:
+        issues.append(issue(
+            section, "coverage",
+            f"covers {times[0]} to {times[-1]}, expected {expected_start} to {expected_end}"
+        ))
+    return issues
+
+
+def check_values(section: str, variable: str, values: np.ndarray) -> List[Dict]:
+    """Null ratio and physical range of one variable."""
+    issues = []
+    nulls = np.isnan(values)
+    null_ratio = float(nulls.mean()) if len(values) else 0.0
+    if null_ratio > VALIDATION_MAX_NULL_RATIO:
+        issues.append(issue(section, "null_ratio", f"{null_ratio:.0%} nulls", variable))
+
+    bounds = variable_range(variable)
+    if bounds is not None:
+        present = values[~nulls]
+        out_of_range = (present < bounds[0]) | (present > bounds[1])
+        if np.any(out_of_range):
+            issues.append(issue(
+                section, "range",
+                f"{int(out_of_range.sum())} value(s) outside [{bounds[0]}, {bounds[1]}], "
+                f"e.g. {present[out_of_range][0]:g}",
+                variable
+            ))
+    return issues
+
+
+def validate_payload(data: Dict, start_date: str, end_date: str) -> List[Dict]:
+    """All issues found in an API response for the window start_date..end_date."""
+    issues = []
+    window_start = np.datetime64(start_date)
+    window_end = np.datetime64(end_date)
+
+    for section, (variables, step) in SECTIONS.items():
+        section_data = data.get(section, {})
+        if not section_data.get("time"):
+            issues.append(issue(section, "present", "no timestamps"))
+            continue
+
+        num_rows = len(section_data["time"])
+        lengths = {name: len(values) for name, values in section_data.items()}
+        mismatched = {name: length for name, length in lengths.items() if length != num_rows}
+        if mismatched:
+            issues.append(issue(section, "array_length", f"expected {num_rows} values, got {mismatched}"))
+            continue
+
+        times = np.array(section_data["time"], dtype="datetime64[m]")
+        expected_start = window_start.astype("datetime64[m]")
+        expected_end = (window_end + np.timedelta64(1, "D") - step).astype("datetime64[m]")
+        issues.extend(check_times(section, times, step, expected_start, expected_end))
+
+        for variable in variables:
+            if variable not in section_data:
+                issues.append(issue(section, "present", "variable missing from response", variable))
+                continue
+            if variable in ("sunrise", "sunset"):
+                continue
+            values = np.array(section_data[variable], dtype=np.float64)
+            issues.extend(check_values(section, variable, values))
+
+    return issues
+
+
+def quarantine_payload(data: Dict, issues: List[Dict], city_id: str, start_date: str, end_date: str, batch_id: str) -> str:
+    """Write a rejected payload and its issues under QUARANTINE_PATH and return the file path."""
+    path = os.path.join(QUARANTINE_PATH, city_id, f"{city_id}_{start_date}_{end_date}_{batch_id}.json.gz")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    record = {
+        "city_id": city_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "batch_id": batch_id,
+        "quarantined_at": datetime.now().isoformat(timespec="seconds"),
+        "issues": issues,
+        "payload": data,
+    }
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Compare the Parquet writer profiles on a synthetic year of hourly data.
+
+For every profile in config.PARQUET_WRITER_PROFILES one year of hourly rows
+for ``--cities`` cities is written to a single file, then DuckDB runs a
+one-week ``WHERE time BETWEEN`` and a ``WHERE city_id =`` query against it.
+Rows are generated in arrival order (day by day, cities interleaved), so
+unsorted profiles see what the ingestion would hand them.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingestion"))
+
+from config import HOURLY_VARIABLES, PARQUET_WRITER_PROFILES
+from parquet_profiles import apply_writer_profile
+from schema_registry import VARIABLE_TYPES, conform_table, variable_range
+
+QUERY_REPEATS = 5
+QUERIES = {
+    "time_range": """
+        SELECT COUNT(*), AVG(temperature_2m) FROM read_parquet(?)
+        WHERE time BETWEEN TIMESTAMP '2024-07-01' AND TIMESTAMP '2024-07-07 23:00'
+    """,
+    "city": """
+        SELECT COUNT(*), AVG(temperature_2m) FROM read_parquet(?)
+        WHERE city_id = 'city_007'
+    """,
+}
+
+
+def synthetic_year(num_cities: int, year: int = 2024, seed: int = 42) -> pa.Table:
+    """One year of plausible hourly readings for num_cities cities, in arrival order."""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(np.datetime64(f"{year}-01-01T00"), np.datetime64(f"{year + 1}-01-01T00"), np.timedelta64(1, "h"))
+    hour_of_year = np.arange(len(hours))
+    # Day-major, city-minor: each day's rows of every city arrive together
+    day = hour_of_year // 24
+    order = np.lexsort((np.tile(hour_of_year, num_cities), np.repeat(np.arange(num_cities), len(hours)), np.tile(day, num_cities)))
+    num_rows = num_cities * len(hours)
+
+    seasonal = -np.cos(2 * np.pi * hour_of_year / len(hours))
+    diurnal = -np.cos(2 * np.pi * (hour_of_year % 24) / 24)
+
+    columns = {}
+    for variable in HOURLY_VARIABLES:
+        low, high = variable_range(variable) or (0, 100)
+        span = high - low
+        values = np.empty((num_cities, len(hours)))
+        for city in range(num_cities):
+            walk = np.cumsum(rng.normal(0, 0.003 * span, len(hours)))
+            walk -= np.linspace(0, walk[-1], len(hours))
+            values[city] = low + span * (0.4 + 0.1 * seasonal + 0.02 * diurnal) + walk
+        values = np.clip(values, low, high).ravel()
+        if VARIABLE_TYPES.get(variable, "float32") == "float32":
+            # Open-Meteo rounds readings to 0.1, and fractions such as soil moisture to 0.001
+            decimals = 3 if span <= 1 else 1
+            columns[variable] = pa.array(np.round(values, decimals)[order], pa.float32())
+        else:
+            columns[variable] = pa.array(np.round(values)[order].astype(np.int64))
+
+    city_ids = np.repeat(np.array([f"city_{i:03d}" for i in range(num_cities)]), len(hours))[order]
+    columns["time"] = pa.array(np.tile(hours, num_cities)[order].astype("datetime64[us]"))
+    columns["city_id"] = pa.array(city_ids).dictionary_encode()
+    columns["city_name"] = pa.array(np.char.replace(city_ids, "city_", "City ")).dictionary_encode()
+    columns["latitude"] = pa.array(np.repeat(rng.uniform(-60, 60, num_cities), len(hours))[order])
+    columns["longitude"] = pa.array(np.repeat(rng.uniform(-180, 180, num_cities), len(hours))[order])
+    columns["timezone"] = pa.array(np.full(num_rows, "GMT")).dictionary_encode()
+    columns["ingestion_timestamp"] = pa.array(np.full(num_rows, np.datetime64(f"{year + 1}-01-01T06:00", "us")))
+    columns["batch_id"] = pa.array(np.full(num_rows, f"{year + 1}0101_060000")).dictionary_encode()
+    return conform_table(pa.table(columns), "hourly")
+
+
+def time_query(conn, sql: str, path: str) -> float:
+    """Median wall time of a query in milliseconds."""
+    timings = []
+    for _ in range(QUERY_REPEATS):
+        started = time.perf_counter()
+        conn.execute(sql, [path]).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark_profile(table: pa.Table, profile: str, output_dir: str) -> dict:
+    """Write the table with one profile and time the queries against the file."""
+    path = os.path.join(output_dir, f"{profile}.parquet")
+    started = time.perf_counter()
+    sorted_table, write_options = apply_writer_profile(table, profile)
+    pq.write_table(sorted_table, path, **write_options)
+    write_seconds = time.perf_counter() - started
+
+    conn = duckdb.connect()
+    result = {
+        "profile": profile,
+        "size_mb": os.path.getsize(path) / 1024 ** 2,
+        "write_s": write_seconds,
+        "row_groups": pq.ParquetFile(path).num_row_groups,
+    }
+    for name, sql in QUERIES.items():
+        result[f"{name}_ms"] = time_query(conn, sql, path)
+    conn.close()
+    return result
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Parquet writer profiles on a synthetic year",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python benchmarks/bench_writer_profiles.py
+  python benchmarks/bench_writer_profiles.py --cities 100 --profile legacy --profile balanced
+        """
+    )
+    parser.add_argument(
+        "--cities",
+        type=int,
+        default=50,
+        help="Number of synthetic cities (8,784 hourly rows each)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=list(PARQUET_WRITER_PROFILES.keys()),
+        help="Profile to benchmark; repeatable. Default: all"
+    )
+    args = parser.parse_args()
+
+    table = synthetic_year(args.cities)
+    print(f"Synthetic year: {table.num_rows:,} rows, {table.num_columns} columns, "
+          f"{table.nbytes / 1024 ** 2:.1f} MB in memory\n")
+
+    header = f"{'profile':<10} {'size MB':>8} {'write s':>8} {'groups':>7} {'time range ms':>14} {'city ms':>8}"
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as output_dir:
+        for profile in args.profile or PARQUET_WRITER_PROFILES.keys():
+            r = benchmark_profile(table, profile, output_dir)
+            print(f"{r['profile']:<10} {r['size_mb']:>8.2f} {r['write_s']:>8.2f} {r['row_groups']:>7} "
+                  f"{r['time_range_ms']:>14.1f} {r['city_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic Open-Meteo payloads and a local mock API server.
+
+``SyntheticWeather`` answers archive and forecast requests with API-shaped
+JSON for any coordinates, date range and subset of HOURLY_VARIABLES /
+DAILY_VARIABLES. Every value is a pure function of (seed, coordinates,
+hour), so overlapping windows agree and a rerun reproduces the same data.
+Nulls and anomalies (spikes of a quarter of the variable's range) can be
+injected at a given rate.
+
+``MockOpenMeteoServer`` serves the generator over HTTP on /v1/archive and
+/v1/forecast, with optional latency and error injection. Point a separate
+ingestion process at it through the environment:
+
+    OPEN_METEO_HISTORICAL_URL=http://127.0.0.1:8080/v1/archive
+    OPEN_METEO_FORECAST_URL=http://127.0.0.1:8080/v1/forecast
+    OPEN_METEO_REQUESTS_PER_SECOND=0
+
+or, in-process, where config is already imported, call ``use_mock_api``.
+
+``synthetic_cities`` builds CITIES-shaped entries for load tests with more
+cities than config.CITIES; register them with ``CITIES.update(...)``.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingestion"))
+
+from config import HOURLY_VARIABLES, DAILY_VARIABLES
+from schema_registry import VARIABLE_TYPES, variable_range
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8080
+FORECAST_DAYS = 7
+SPLITMIX_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+# Decimals the real API reports; anything not listed is rounded to 0.1
+VARIABLE_DECIMALS = {
+    "snow_depth": 2,
+    "et0_fao_evapotranspiration": 2,
+    "vapour_pressure_deficit": 2,
+    "soil_moisture_0_to_7cm": 3,
+    "soil_moisture_7_to_28cm": 3,
+    "soil_moisture_28_to_100cm": 3,
+    "soil_moisture_100_to_255cm": 3,
+    "daylight_duration": 2,
+    "sunshine_duration": 2,
+    "shortwave_radiation_sum": 2,
+}
+
+
+def splitmix64(x: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer over uint64 arrays."""
+    x = x + SPLITMIX_GAMMA
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def synthetic_cities(count: int, seed: int = 0) -> Dict[str, Dict]:
+    """CITIES-shaped entries ``synthetic_0000``... at deterministic coordinates."""
+    rng = np.random.default_rng(seed)
+    latitudes = np.round(rng.uniform(-60, 70, count), 4)
+    longitudes = np.round(rng.uniform(-180, 180, count), 4)
+    return {
+        f"synthetic_{i:04d}": {
+            "name": f"Synthetic {i:04d}",
+            "latitude": float(latitudes[i]),
+            "longitude": float(longitudes[i]),
+            "timezone": "GMT",
+        }
+        for i in range(count)
+    }
+
+
+def use_mock_api(weather_ingest, server: "MockOpenMeteoServer"):
+    """Point an imported weather_ingest module at a mock server and lift its rate limit."""
+    weather_ingest.HISTORICAL_API_URL = server.historical_url
+    weather_ingest.FORECAST_API_URL = server.forecast_url
+    weather_ingest.rate_limiter = weather_ingest.HostRateLimiter(0)
+
+
+class SyntheticWeather:
+    """Deterministic Open-Meteo response generator."""
+
+    def __init__(self, seed: int = 0, null_ratio: float = 0.0, anomaly_ratio: float = 0.0):
+        self.seed = seed
+        self.null_ratio = null_ratio
+        self.anomaly_ratio = anomaly_ratio
+
+    def uniform(self, latitude: float, longitude: float, index: np.ndarray, stream: int) -> np.ndarray:
+        """Uniform (0, 1) draws keyed by seed, location, time index and stream."""
+        key = (
+            (self.seed * 1_000_003 + int(round(latitude * 1e4))) * 1_000_003
+            + int(round(longitude * 1e4))
+        ) * 1_009 + stream
+        bits = splitmix64(index.astype(np.uint64) ^ splitmix64(np.array([key % 2 ** 64], dtype=np.uint64)))
+        return ((bits >> np.uint64(11)).astype(np.float64) + 0.5) / 2.0 ** 53
+
+    def normal(self, latitude: float, longitude: float, index: np.ndarray, stream: int) -> np.ndarray:
+        """Standard normal draws via Box-Muller over two uniform streams."""
+        u1 = self.uniform(latitude, longitude, index, 2 * stream)
+        u2 = self.uniform(latitude, longitude, index, 2 * stream + 1)
+        return np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2)
+
+    def hourly_values(self, latitude: float, longitude: float, hours: np.ndarray) -> Dict[str, np.ndarray]:
+        """Every hourly variable for the given local hours (datetime64[h])."""
+        hour_index = hours.astype(np.int64)
+        day_index = hour_index // 24
+        day_of_year = (hours.astype("datetime64[D]") - hours.astype("datetime64[Y]").astype("datetime64[D]")).astype(np.int64)
+        hour_of_day = hour_index % 24
+
+        def regime(stream):
+            # Slow weather regime: daily noise interpolated across the day
+            today = self.normal(latitude, longitude, day_index, stream)
+            tomorrow = self.normal(latitude, longitude, day_index + 1, stream)
+            weight = hour_of_day / 24
+            return today * (1 - weight) + tomorrow * weight
+
+        def noise(stream):
+            return self.normal(latitude, longitude, hour_index, stream)
+
+        hemisphere = 1.0 if latitude >= 0 else -1.0
+        season = -np.cos(2 * np.pi * (day_of_year - 15) / 365.25) * hemisphere
+        diurnal = -np.cos(2 * np.pi * (hour_of_day - 3) / 24)
+
+        temperature = 28 - 0.4 * abs(latitude) + 0.25 * abs(latitude) * season + 4 * diurnal + 3 * regime(1) + 0.4 * noise(2)
+        humidity = np.clip(70 - 12 * diurnal + 12 * regime(3) + 3 * noise(4), 5, 100)
+        dew_point = temperature - (100 - humidity) / 5
+        wind_speed = np.abs(12 + 6 * regime(5) + 2 * diurnal + 2 * noise(6))
+        cloud_cover = np.clip(50 + 40 * regime(7) + 5 * noise(8), 0, 100)
+        wet = self.uniform(latitude, longitude, hour_index, 9) < 0.04 + 0.12 * (cloud_cover / 100) ** 2
+        precipitation = np.where(wet, np.exp(self.normal(latitude, longitude, hour_index, 10) * 0.8 - 0.5), 0.0)
+        freezing = temperature <= 0
+        saturation = 0.6108 * np.exp(17.27 * temperature / (temperature + 237.3))
+        pressure = 1013 + 9 * regime(11) + 0.5 * noise(12)
+        direction = (200 + 90 * regime(13) + 15 * noise(14)) % 360
+        sun = np.clip(diurnal, 0, None)
+
+        values = {
+            "temperature_2m": temperature,
+            "relative_humidity_2m": humidity,
+            "dew_point_2m": dew_point,
+            "apparent_temperature": temperature - 0.1 * wind_speed + (humidity - 50) / 25,
+            "precipitation": precipitation,
+            "rain": np.where(freezing, 0.0, precipitation),
+            "snowfall": np.where(freezing, precipitation * 0.7, 0.0),
+            "snow_depth": np.clip(-temperature * 0.01, 0, None),
+            "weather_code": np.where(wet, np.where(freezing, 71, 61), np.where(cloud_cover > 80, 3, np.where(cloud_cover > 30, 2, 0))),
+            "pressure_msl": pressure,
+            "surface_pressure": pressure - 6,
+            "cloud_cover": cloud_cover,
+            "cloud_cover_low": np.clip(cloud_cover * 0.6 + 10 * noise(15), 0, 100),
+            "cloud_cover_mid": np.clip(cloud_cover * 0.4 + 10 * noise(16), 0, 100),
+            "cloud_cover_high": np.clip(cloud_cover * 0.3 + 10 * noise(17), 0, 100),
+            "et0_fao_evapotranspiration": 0.4 * sun * (1 - cloud_cover / 150),
+            "vapour_pressure_deficit": saturation * (1 - humidity / 100),
+            "wind_speed_10m": wind_speed,
+            "wind_speed_100m": wind_speed * 1.4,
+            "wind_direction_10m": direction,
+            "wind_direction_100m": (direction + 10) % 360,
+            "wind_gusts_10m": wind_speed * 1.8 + 2 * np.abs(noise(18)),
+        }
+        for depth, (damping, lag) in {
+            "0_to_7cm": (0.6, 0.0), "7_to_28cm": (0.4, 0.5), "28_to_100cm": (0.2, 1.0), "100_to_255cm": (0.05, 2.0)
+        }.items():
+            mean = 28 - 0.4 * abs(latitude) + 0.25 * abs(latitude) * season
+            values[f"soil_temperature_{depth}"] = mean + damping * (temperature - mean) + lag
+            values[f"soil_moisture_{depth}"] = np.clip(0.3 + 0.05 * regime(19) - 0.02 * lag, 0, 1)
+        return values
+
+    def daily_values(self, latitude: float, days: np.ndarray, hourly: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Every daily variable, aggregated from the hourly values of whole days."""
+        def per_day(variable):
+            return hourly[variable].reshape(len(days), 24)
+
+        day_of_year = (days - days.astype("datetime64[Y]").astype("datetime64[D]")).astype(np.int64)
+        declination = 23.44 * np.sin(2 * np.pi * (day_of_year - 81) / 365)
+        cos_hour_angle = -np.tan(np.radians(latitude)) * np.tan(np.radians(declination))
+        daylight_hours = np.degrees(np.arccos(np.clip(cos_hour_angle, -1, 1))) * 2 / 15
+        clouds = per_day("cloud_cover").mean(axis=1)
+        precipitation = per_day("precipitation")
+        radians = np.radians(per_day("wind_direction_10m"))
+
+        return {
+            "temperature_2m_max": per_day("temperature_2m").max(axis=1),
+            "temperature_2m_min": per_day("temperature_2m").min(axis=1),
+            "temperature_2m_mean": per_day("temperature_2m").mean(axis=1),
+            "apparent_temperature_max": per_day("apparent_temperature").max(axis=1),
+            "apparent_temperature_min": per_day("apparent_temperature").min(axis=1),
+            "apparent_temperature_mean": per_day("apparent_temperature").mean(axis=1),
+            "sunrise": days + np.round((12 - daylight_hours / 2) * 60).astype("timedelta64[m]"),
+            "sunset": days + np.round((12 + daylight_hours / 2) * 60).astype("timedelta64[m]"),
+            "daylight_duration": daylight_hours * 3600,
+            "sunshine_duration": daylight_hours * 3600 * (1 - clouds / 100),
+            "precipitation_sum": precipitation.sum(axis=1),
+            "rain_sum": per_day("rain").sum(axis=1),
+            "snowfall_sum": per_day("snowfall").sum(axis=1),
+            "precipitation_hours": (precipitation > 0).sum(axis=1),
+            "weather_code": per_day("weather_code").max(axis=1),
+            "wind_speed_10m_max": per_day("wind_speed_10m").max(axis=1),
+            "wind_gusts_10m_max": per_day("wind_gusts_10m").max(axis=1),
+            "wind_direction_10m_dominant": np.degrees(np.arctan2(np.sin(radians).mean(axis=1), np.cos(radians).mean(axis=1))) % 360,
+            "shortwave_radiation_sum": 2.5 * daylight_hours * (1 - 0.7 * clouds / 100),
+            "et0_fao_evapotranspiration": per_day("et0_fao_evapotranspiration").sum(axis=1),
+        }
+
+    def inject(self, variable: str, values: np.ndarray, latitude: float, longitude: float, index: np.ndarray, stream: int) -> List:
+        """Round like the API, add anomalies and nulls, and convert to a JSON list."""
+        bounds = variable_range(variable)
+        if self.anomaly_ratio and bounds and values.dtype.kind == "f":
+            spikes = self.uniform(latitude, longitude, index, stream) < self.anomaly_ratio
+            direction = np.where(self.uniform(latitude, longitude, index, stream + 1) < 0.5, -1, 1)
+            values = np.where(spikes, values + direction * (bounds[1] - bounds[0]) / 4, values)
+        if bounds and values.dtype.kind == "f":
+            values = np.clip(values, *bounds)
+
+        if VARIABLE_TYPES.get(variable, "float32").startswith("int"):
+            result = np.round(values).astype(np.int64).tolist()
+        elif values.dtype.kind == "M":
+            result = [str(value) for value in values.astype("datetime64[m]")]
+        else:
+            result = np.round(values, VARIABLE_DECIMALS.get(variable, 1)).tolist()
+
+        if self.null_ratio and values.dtype.kind != "M":
+            for position in np.flatnonzero(self.uniform(latitude, longitude, index, stream + 2) < self.null_ratio):
+                result[position] = None
+        return result
+
+    def payload(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str,
+        hourly: Optional[List[str]] = None,
+        daily: Optional[List[str]] = None,
+        timezone: str = "GMT"
+    ) -> Dict:
+        """An Open-Meteo archive/forecast response for an inclusive date range."""
+        hourly = HOURLY_VARIABLES if hourly is None else hourly
+        daily = DAILY_VARIABLES if daily is None else daily
+        unknown = [name for name in hourly if name not in HOURLY_VARIABLES] + [name for name in daily if name not in DAILY_VARIABLES]
+        if unknown:
+            raise ValueError(f"Cannot initialize WeatherVariable from invalid String value {unknown[0]}")
+
+        days = np.arange(np.datetime64(start_date, "D"), np.datetime64(end_date, "D") + 1)
+        if len(days) == 0:
+            raise ValueError("Parameter 'start_date' must be before or equal to 'end_date'")
+        hours = np.arange(days[0].astype("datetime64[h]"), (days[-1] + 1).astype("datetime64[h]"))
+        hourly_values = self.hourly_values(latitude, longitude, hours)
+        daily_values = self.daily_values(latitude, days, hourly_values)
+
+        hour_index = hours.astype(np.int64)
+        day_index = days.astype(np.int64)
+        response = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "generationtime_ms": 0.1,
+            "utc_offset_seconds": 0,
+            "timezone": timezone,
+            "timezone_abbreviation": timezone,
+            "elevation": 0.0,
+        }
+        if hourly:
+            response["hourly"] = {"time": [str(hour) + ":00" for hour in hours]}
+            for variable in hourly:
+                response["hourly"][variable] = self.inject(
+                    variable, hourly_values[variable], latitude, longitude, hour_index, 100 + 10 * HOURLY_VARIABLES.index(variable)
+                )
+        if daily:
+            response["daily"] = {"time": [str(day) for day in days]}
+            for variable in daily:
+                response["daily"][variable] = self.inject(
+                    variable, daily_values[variable], latitude, longitude, day_index, 500 + 10 * DAILY_VARIABLES.index(variable)
+                )
+        return response
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """GET /v1/archive and /v1/forecast from the server's generator."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path not in ("/v1/archive", "/v1/forecast"):
+            self.respond(404, {"error": True, "reason": f"Not found: {url.path}"})
+            return
+
+        if server.latency_ms or server.latency_jitter_ms:
+            time.sleep((server.latency_ms + server.random.uniform(0, server.latency_jitter_ms)) / 1000)
+        if server.error_ratio and server.random.random() < server.error_ratio:
+            self.respond(503, {"error": True, "reason": "Injected failure"})
+            return
+
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        try:
+            start_date = params.get("start_date", str(date.today()))
+            end_date = params.get("end_date", str(np.datetime64(start_date) + FORECAST_DAYS - 1))
+            data = server.weather.payload(
+                float(params["latitude"]),
+                float(params["longitude"]),
+                start_date,
+                end_date,
+                params["hourly"].split(",") if params.get("hourly") else [],
+                params["daily"].split(",") if params.get("daily") else [],
+                params.get("timezone", "GMT"),
+            )
+        except (KeyError, ValueError) as e:
+            self.respond(400, {"error": True, "reason": str(e)})
+            return
+        self.respond(200, data)
+
+    def respond(self, status: int, body: Dict):
+        encoded = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+        self.server.requests_served += 1
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class MockOpenMeteoServer(ThreadingHTTPServer):
+    """Local Open-Meteo stand-in; use as a context manager to run it in a background thread."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        weather: Optional[SyntheticWeather] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        error_ratio: float = 0.0,
+        seed: int = 0
+    ):
+        super().__init__((host, port), MockRequestHandler)
+        self.weather = weather or SyntheticWeather(seed)
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_ratio = error_ratio
+        self.random = random.Random(seed)
+        self.requests_served = 0
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def historical_url(self) -> str:
+        return f"{self.base_url}/v1/archive"
+
+    @property
+    def forecast_url(self) -> str:
+        return f"{self.base_url}/v1/forecast"
+
+    def start(self) -> "MockOpenMeteoServer":
+        """Serve in a daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-open-meteo", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock Open-Meteo API listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Serve deterministic synthetic Open-Meteo responses on a local port",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python benchmarks/mock_open_meteo.py
+  python benchmarks/mock_open_meteo.py --port 8081 --latency-ms 80 --null-ratio 0.01 --anomaly-ratio 0.001
+
+  OPEN_METEO_HISTORICAL_URL=http://127.0.0.1:8080/v1/archive \\
+  OPEN_METEO_FORECAST_URL=http://127.0.0.1:8080/v1/forecast \\
+  OPEN_METEO_REQUESTS_PER_SECOND=0 \\
+  python ingestion/weather_ingest.py --mode custom --city amsterdam --start-date 2024-01-01 --end-date 2024-12-31
+        """
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument("--null-ratio", type=float, default=0.0, help="Share of values replaced by null")
+    parser.add_argument("--anomaly-ratio", type=float, default=0.0, help="Share of float values shifted by a quarter of their range")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fixed delay added to every response")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0, help="Uniform random delay added on top")
+    parser.add_argument("--error-ratio", type=float, default=0.0, help="Share of requests answered with HTTP 503")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    weather = SyntheticWeather(args.seed, args.null_ratio, args.anomaly_ratio)
+    server = MockOpenMeteoServer(
+        weather, args.host, args.port, args.latency_ms, args.latency_jitter_ms, args.error_ratio, args.seed
+    )
+    logger.info(f"Mock Open-Meteo API listening on {server.base_url} (archive: {server.historical_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
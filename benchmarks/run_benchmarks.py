@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""End-to-end pipeline benchmark on synthetic data.
+
+Runs ingest -> load -> transform against the in-process mock Open-Meteo API
+at a chosen scale and times every stage separately:
+
+  fetch_weather_data, validate_payload, transform_to_arrow / transform_to_dataframe,
+  save_to_parquet, create_raw_tables, create_staging_table, create_mart_tables, dbt_run
+
+Per stage it records wall time, peak RSS, rows, rows/s and bytes written
+(Parquet bytes for save_to_parquet, database file growth for the DuckDB
+stages). Results are written as JSON to ``benchmarks/results/`` and compared
+with ``benchmarks/baselines/<scale>.json`` when one exists. A stage whose
+wall time or peak RSS exceeds the baseline by more than ``--threshold`` is a
+regression, and the run exits with status 1.
+
+Stages run one after another, without the ingestion thread pool, so each
+timing covers only its own work. Fetch times include the mock server's
+payload generation, which runs in the same process.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCHMARKS_DIR.parent
+sys.path.insert(0, str(PROJECT_ROOT / "ingestion"))
+sys.path.insert(0, str(PROJECT_ROOT / "duckdb"))
+
+import duckdb
+import pyarrow as pa
+
+import config
+import weather_ingest
+import setup_database
+from metrics import RssSampler
+from validation import validate_payload
+from mock_open_meteo import MockOpenMeteoServer, SyntheticWeather, synthetic_cities, use_mock_api
+
+logger = logging.getLogger(__name__)
+
+SCALES = {
+    "small": {"cities": 5, "years": 1},
+    "medium": {"cities": 50, "years": 2},
+    "large": {"cities": 200, "years": 5},
+    "xlarge": {"cities": 500, "years": 10},
+}
+FIRST_YEAR = 2015
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+BASELINES_DIR = BENCHMARKS_DIR / "baselines"
+DBT_PROJECT_DIR = PROJECT_ROOT / "weather_dbt"
+REGRESSION_THRESHOLD = 0.2
+MIN_COMPARE_SECONDS = 0.5  # shorter stages are too noisy to compare
+
+
+class StageRecorder:
+    """Accumulates wall time, peak RSS, rows and bytes per pipeline stage."""
+
+    def __init__(self, sampler: RssSampler):
+        self.sampler = sampler
+        self.stages: Dict[str, Dict] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time one execution of a stage; the yielded dict takes ``rows`` and ``bytes``."""
+        counters = {"rows": 0, "bytes": 0}
+        rss_token = self.sampler.open()
+        started = time.perf_counter()
+        yield counters
+        elapsed = time.perf_counter() - started
+        peak_rss = self.sampler.close(rss_token)
+
+        entry = self.stages.setdefault(name, {"wall_s": 0.0, "peak_rss_mb": 0.0, "rows": 0, "bytes": 0, "calls": 0})
+        entry["wall_s"] += elapsed
+        entry["peak_rss_mb"] = max(entry["peak_rss_mb"], peak_rss / 1024 ** 2)
+        entry["rows"] += counters["rows"]
+        entry["bytes"] += counters["bytes"]
+        entry["calls"] += 1
+
+    def summary(self) -> Dict[str, Dict]:
+        """Stages with derived rows/s, in execution order."""
+        for entry in self.stages.values():
+            entry["rows_per_s"] = entry["rows"] / entry["wall_s"] if entry["wall_s"] else None
+        return self.stages
+
+
+def table_rows(conn, *tables: str) -> int:
+    """Total row count of some tables."""
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables)
+
+
+@contextmanager
+def database_stage(recorder: StageRecorder, name: str, conn, db_path: Path):
+    """A DuckDB stage whose bytes are the database file growth after a checkpoint."""
+    size_before = db_path.stat().st_size if db_path.exists() else 0
+    with recorder.stage(name) as counters:
+        yield counters
+        conn.execute("CHECKPOINT")
+    recorder.stages[name]["bytes"] += max(db_path.stat().st_size - size_before, 0)
+
+
+def ingest(recorder: StageRecorder, city_ids: List[str], years: List[int], raw_path: Path, engine: str, writer_profile: str):
+    """Fetch, validate, transform and save every city-year through the mock API."""
+    weather_ingest.RAW_DATA_PATH = str(raw_path)
+    for city_id in city_ids:
+        ingestion = weather_ingest.WeatherIngestion(city_id, use_cache=False, engine=engine, writer_profile=writer_profile)
+        for year in years:
+            start_date, end_date = f"{year}-01-01", f"{year}-12-31"
+
+            with recorder.stage("fetch_weather_data") as counters:
+                data = ingestion.fetch_weather_data(start_date, end_date, use_historical_api=True)
+                if not data:
+                    raise RuntimeError(f"Mock API returned no data for {city_id} {year}")
+                counters["rows"] = len(data["hourly"]["time"]) + len(data["daily"]["time"])
+
+            with recorder.stage("validate_payload") as counters:
+                issues = validate_payload(data, start_date, end_date)
+                counters["rows"] = len(data["hourly"]["time"]) + len(data["daily"]["time"])
+            if issues:
+                raise RuntimeError(f"Synthetic payload failed validation: {issues[0]}")
+
+            transform = "transform_to_arrow" if engine == "arrow" else "transform_to_dataframe"
+            with recorder.stage(transform) as counters:
+                hourly, daily = getattr(ingestion, transform)(data)
+                counters["rows"] = len(hourly) + len(daily)
+            del data
+
+            with recorder.stage("save_to_parquet") as counters:
+                hourly_paths, daily_paths = ingestion.save_to_parquet(hourly, daily, start_date, end_date)
+                counters["rows"] = len(hourly) + len(daily)
+                counters["bytes"] = sum(os.path.getsize(path) for path in hourly_paths + daily_paths)
+
+
+def load_and_transform(recorder: StageRecorder, raw_path: Path, db_path: Path):
+    """Build the raw, staging and mart layers with setup_database's functions."""
+    setup_database.RAW_DATA_PATH = raw_path
+    conn = duckdb.connect(str(db_path))
+    setup_database.create_schemas(conn)
+
+    with database_stage(recorder, "create_raw_tables", conn, db_path) as counters:
+        setup_database.create_raw_tables(conn, full_refresh=True)
+        counters["rows"] = table_rows(conn, "raw.weather_hourly", "raw.weather_daily")
+
+    with database_stage(recorder, "create_staging_table", conn, db_path) as counters:
+        setup_database.create_staging_table(conn)
+        counters["rows"] = table_rows(conn, "staging.weather_hourly")
+
+    with database_stage(recorder, "create_mart_tables", conn, db_path) as counters:
+        setup_database.create_mart_tables(conn)
+        counters["rows"] = table_rows(conn, "mart.weather_daily", "mart.weather_anomalies")
+
+    conn.close()
+
+
+def run_dbt(recorder: StageRecorder, work_dir: Path, db_path: Path) -> bool:
+    """Run the dbt models in-process against the benchmark database; False if dbt is unavailable."""
+    try:
+        from dbt.cli.main import dbtRunner
+    except ImportError:
+        logger.warning("dbt is not installed; skipping the dbt_run stage")
+        return False
+
+    profiles_dir = work_dir / "dbt"
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+    (profiles_dir / "profiles.yml").write_text(
+        "weather_dbt:\n"
+        "  outputs:\n"
+        "    benchmark:\n"
+        "      type: duckdb\n"
+        f"      path: '{db_path}'\n"
+        "      schema: main\n"
+        "      threads: 4\n"
+        "  target: benchmark\n"
+    )
+
+    size_before = db_path.stat().st_size
+    with recorder.stage("dbt_run"):
+        result = dbtRunner().invoke([
+            "run",
+            "--project-dir", str(DBT_PROJECT_DIR),
+            "--profiles-dir", str(profiles_dir),
+            "--target-path", str(profiles_dir / "target"),
+            "--log-path", str(profiles_dir / "logs"),
+            "--quiet",
+        ])
+    if not result.success:
+        raise RuntimeError(f"dbt run failed: {result.exception}")
+    recorder.stages["dbt_run"]["bytes"] += max(db_path.stat().st_size - size_before, 0)
+    return True
+
+
+def git_commit() -> Optional[str]:
+    """Short hash of the checked-out commit, if any."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scale(scale: str, work_dir: Path, engine: str, writer_profile: str, skip_dbt: bool = False, seed: int = 0) -> Dict:
+    """Run the pipeline at one scale and return the result record."""
+    cities, num_years = SCALES[scale]["cities"], SCALES[scale]["years"]
+    city_ids = list(synthetic_cities(cities, seed).keys())
+    config.CITIES.update(synthetic_cities(cities, seed))
+    years = list(range(FIRST_YEAR, FIRST_YEAR + num_years))
+
+    raw_path = work_dir / "raw"
+    db_path = work_dir / "weather.db"
+    logger.info(f"Benchmark {scale}: {cities} cities x {num_years} year(s) in {work_dir}")
+
+    started_at = datetime.now()
+    with MockOpenMeteoServer(SyntheticWeather(seed)) as server:
+        recorder = StageRecorder(RssSampler())
+        use_mock_api(weather_ingest, server)
+        ingest(recorder, city_ids, years, raw_path, engine, writer_profile)
+        load_and_transform(recorder, raw_path, db_path)
+        if not skip_dbt:
+            run_dbt(recorder, work_dir, db_path)
+
+    stages = recorder.summary()
+    return {
+        "scale": scale,
+        "cities": cities,
+        "years": num_years,
+        "engine": engine,
+        "writer_profile": writer_profile,
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "total_wall_s": sum(stage["wall_s"] for stage in stages.values()),
+        "environment": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "duckdb": duckdb.__version__,
+            "pyarrow": pa.__version__,
+        },
+        "stages": stages,
+    }
+
+
+def compare(result: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Stages whose wall time or peak RSS regressed by more than threshold."""
+    regressions = []
+    for name, stage in result["stages"].items():
+        reference = baseline["stages"].get(name)
+        if not reference:
+            continue
+        if reference["wall_s"] >= MIN_COMPARE_SECONDS and stage["wall_s"] > reference["wall_s"] * (1 + threshold):
+            regressions.append(f"{name}: wall {reference['wall_s']:.2f}s -> {stage['wall_s']:.2f}s")
+        if stage["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{name}: peak RSS {reference['peak_rss_mb']:.0f} MB -> {stage['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def print_result(result: Dict, baseline: Optional[Dict] = None):
+    """Per-stage table, with the change against the baseline when there is one."""
+    print(f"\n{result['scale']}: {result['cities']} cities x {result['years']} year(s), "
+          f"engine={result['engine']}, writer_profile={result['writer_profile']}")
+    header = f"{'stage':<24} {'wall s':>9} {'peak MB':>9} {'rows':>12} {'rows/s':>12} {'MB written':>11} {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, stage in result["stages"].items():
+        change = ""
+        reference = baseline["stages"].get(name) if baseline else None
+        if reference and reference["wall_s"]:
+            change = f"{(stage['wall_s'] / reference['wall_s'] - 1) * 100:+.0f}%"
+        rows_per_s = f"{stage['rows_per_s']:,.0f}" if stage["rows_per_s"] else "-"
+        print(f"{name:<24} {stage['wall_s']:>9.2f} {stage['peak_rss_mb']:>9.0f} {stage['rows']:>12,} "
+              f"{rows_per_s:>12} {stage['bytes'] / 1024 ** 2:>11.1f} {change:>8}")
+    print(f"{'total':<24} {result['total_wall_s']:>9.2f}")
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the ingest, load and transform stages on synthetic data",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Scales: """ + ", ".join(f"{name} ({s['cities']} cities x {s['years']} y)" for name, s in SCALES.items()) + """
+
+Examples:
+  python benchmarks/run_benchmarks.py
+  python benchmarks/run_benchmarks.py --scale small --save-baseline
+  python benchmarks/run_benchmarks.py --scale medium --engine pandas --threshold 0.1
+        """
+    )
+    parser.add_argument(
+        "--scale",
+        action="append",
+        choices=list(SCALES.keys()),
+        help="Scale to run; repeatable. Default: small"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=weather_ingest.TRANSFORM_ENGINES,
+        default=config.TRANSFORM_ENGINE,
+        help="Transform engine of the ingestion"
+    )
+    parser.add_argument(
+        "--writer-profile",
+        choices=list(config.PARQUET_WRITER_PROFILES.keys()),
+        default=config.PARQUET_WRITER_PROFILE,
+        help="Parquet writer profile of the ingestion"
+    )
+    parser.add_argument("--skip-dbt", action="store_true", help="Do not run the dbt models")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument(
+        "--work-dir",
+        help="Keep the generated Parquet files and database here instead of a temporary directory"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="Relative slowdown or memory growth against the baseline that counts as a regression"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store this run as the baseline of its scale"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline INFO logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logger.setLevel(logging.INFO)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    regressions = []
+    for scale in args.scale or ["small"]:
+        if args.work_dir:
+            work_dir = Path(args.work_dir) / scale
+            shutil.rmtree(work_dir, ignore_errors=True)
+            work_dir.mkdir(parents=True)
+            result = run_scale(scale, work_dir, args.engine, args.writer_profile, args.skip_dbt, args.seed)
+        else:
+            with tempfile.TemporaryDirectory(prefix=f"weather_bench_{scale}_") as tmp:
+                result = run_scale(scale, Path(tmp), args.engine, args.writer_profile, args.skip_dbt, args.seed)
+
+        result_path = RESULTS_DIR / f"{scale}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        result_path.write_text(json.dumps(result, indent=2))
+
+        baseline_path = BASELINES_DIR / f"{scale}.json"
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+        print_result(result, baseline)
+        print(f"Results: {result_path}")
+
+        if baseline:
+            found = compare(result, baseline, args.threshold)
+            for regression in found:
+                print(f"  REGRESSION {regression}")
+            if not found:
+                print(f"  No regressions against {baseline_path} (threshold {args.threshold:.0%})")
+            regressions.extend(found)
+        if args.save_baseline:
+            BASELINES_DIR.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(result, indent=2))
+            print(f"  Saved baseline {baseline_path}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,232 @@
+"""Rolling and seasonal anomaly scoring for every hourly variable.
+
+Raw hourly rows are unpivoted once into (city_id, time, metric, value) rows,
+so all variables share one window pass and one baseline join rather than a
+self-join per variable. Each value gets two z-scores:
+
+- rolling: against the trailing ``ROLLING_WINDOW_DAYS`` of the same city and
+  variable, excluding the value itself (DuckDB RANGE window)
+- seasonal: against all values of the same city, variable, month and hour of
+  day, kept as running moments in mart.seasonal_moments
+
+Incremental builds start from the days in _touched_days. The seasonal
+moments drop the previously scored values of those days and add the new
+ones with Chan's update. A changed value moves the rolling baseline of the
+next ``ROLLING_WINDOW_DAYS`` days, so the touched days and the days that
+follow within the window are rescored, reading the preceding window of raw
+rows as context. Rows on other days whose (city, month, hour, variable)
+moments changed get their seasonal columns updated in place.
+"""
+
+import logging
+from typing import List
+
+import project_paths  # noqa: F401  (puts ingestion/ on sys.path)
+from schemas import HOURLY_VARIABLES
+from running_stats import long_moments_select, rebuild_moments, merge_moments
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_SCORES_TABLE = "mart.weather_anomaly_scores"
+SEASONAL_MOMENTS_TABLE = "mart.seasonal_moments"
+SEASONAL_KEYS = [("city_id", "VARCHAR"), ("month", "INTEGER"), ("hour", "INTEGER")]
+
+ANOMALY_VARIABLES = HOURLY_VARIABLES
+ROLLING_WINDOW_DAYS = 30
+ZSCORE_THRESHOLD = 3.0
+MIN_BASELINE_SAMPLES = 24
+
+SCORES_SELECT = """
+    WITH rolling AS (
+        SELECT
+            city_id, time, month, hour, metric, value,
+            AVG(value) OVER w AS rolling_mean,
+            STDDEV_SAMP(value) OVER w AS rolling_stddev,
+            COUNT(value) OVER w AS rolling_count
+        FROM _long_rows
+        WINDOW w AS (
+            PARTITION BY city_id, metric
+            ORDER BY time
+            RANGE BETWEEN INTERVAL {window_days} DAYS PRECEDING AND INTERVAL 1 HOUR PRECEDING
+        )
+    ),
+    scored AS (
+        SELECT
+            r.time,
+            r.city_id,
+            r.metric AS variable,
+            r.value,
+
+            r.rolling_mean,
+            r.rolling_stddev,
+            r.rolling_count,
+            (r.value - r.rolling_mean) / NULLIF(r.rolling_stddev, 0) AS rolling_zscore,
+
+            m.mean AS seasonal_mean,
+            CASE WHEN m.n > 1 THEN SQRT(m.m2 / (m.n - 1)) END AS seasonal_stddev,
+            COALESCE(m.n, 0) AS seasonal_count
+        FROM rolling r
+        LEFT JOIN mart.seasonal_moments m
+            ON m.city_id = r.city_id AND m.metric = r.metric AND m.month = r.month AND m.hour = r.hour
+        {target_filter}
+    )
+    SELECT
+        *,
+        (value - seasonal_mean) / NULLIF(seasonal_stddev, 0) AS seasonal_zscore,
+        COALESCE(rolling_count >= {min_samples} AND ABS(rolling_zscore) > {threshold}, FALSE) AS is_rolling_anomaly,
+        COALESCE(
+            seasonal_count >= {min_samples} AND ABS((value - seasonal_mean) / NULLIF(seasonal_stddev, 0)) > {threshold},
+            FALSE
+        ) AS is_seasonal_anomaly
+    FROM scored
+"""
+
+
+# Seasonal columns of scores whose moments changed, for rows outside the rescored days
+UPDATE_SEASONAL_SQL = """
+    UPDATE {table} a
+    SET seasonal_mean = s.mean,
+        seasonal_stddev = s.stddev,
+        seasonal_count = s.n,
+        seasonal_zscore = (a.value - s.mean) / NULLIF(s.stddev, 0),
+        is_seasonal_anomaly = COALESCE(
+            s.n >= {min_samples} AND ABS((a.value - s.mean) / NULLIF(s.stddev, 0)) > {threshold},
+            FALSE
+        )
+    FROM (
+        SELECT m.city_id, m.month, m.hour, m.metric, m.n, m.mean,
+            CASE WHEN m.n > 1 THEN SQRT(m.m2 / (m.n - 1)) END AS stddev
+        FROM {moments_table} m
+        SEMI JOIN _changed_seasonal c
+            ON c.city_id = m.city_id AND c.month = m.month AND c.hour = m.hour AND c.metric = m.metric
+    ) s
+    WHERE s.city_id = a.city_id AND s.metric = a.variable
+      AND s.month = EXTRACT(month FROM a.time) AND s.hour = EXTRACT(hour FROM a.time)
+"""
+
+
+def long_rows_select(source_sql: str, variables: List[str]) -> str:
+    """Unpivot wide hourly rows into (city_id, time, month, hour, metric, value) rows."""
+    values = ", ".join(f"CAST({variable} AS DOUBLE) AS {variable}" for variable in variables)
+    return f"""
+        SELECT city_id, time, month, hour, metric, value
+        FROM (
+            UNPIVOT (
+                SELECT
+                    city_id,
+                    time,
+                    CAST(EXTRACT(month FROM time) AS INTEGER) AS month,
+                    CAST(EXTRACT(hour FROM time) AS INTEGER) AS hour,
+                    {values}
+                FROM ({source_sql})
+            )
+            ON {", ".join(variables)}
+            INTO NAME metric VALUE value
+        )
+    """
+
+
+def scores_select(target_filter: str = "") -> str:
+    """Scoring query over _long_rows with the engine's thresholds filled in."""
+    return SCORES_SELECT.format(
+        window_days=ROLLING_WINDOW_DAYS,
+        min_samples=MIN_BASELINE_SAMPLES,
+        threshold=ZSCORE_THRESHOLD,
+        target_filter=target_filter
+    )
+
+
+def build_anomaly_scores(conn, incremental: bool = False, variables: List[str] = ANOMALY_VARIABLES):
+    """Create or update mart.weather_anomaly_scores and mart.seasonal_moments.
+
+    With incremental=True the days listed in _touched_days and the
+    ``ROLLING_WINDOW_DAYS`` days after them are rescored, and the seasonal
+    columns of every other row whose seasonal moments changed are updated.
+    """
+    seasonal_keys = [name for name, _ in SEASONAL_KEYS]
+    touched = "SEMI JOIN _touched_days k ON k.city_id = {alias}.city_id AND k.date = CAST({alias}.time AS DATE)"
+    rescored = "SEMI JOIN _rescore_days k ON k.city_id = {alias}.city_id AND k.date = CAST({alias}.time AS DATE)"
+
+    if incremental:
+        logger.info(f"Updating {ANOMALY_SCORES_TABLE} for touched days ({len(variables)} variables)...")
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE _rescore_days AS
+            SELECT DISTINCT city_id, CAST(date + INTERVAL (offset_days) DAY AS DATE) AS date
+            FROM _touched_days, UNNEST(range(0, {ROLLING_WINDOW_DAYS + 1})) AS t(offset_days)
+        """)
+        conn.execute("CREATE OR REPLACE TEMP TABLE _long_rows AS " + long_rows_select(f"""
+            SELECT r.*
+            FROM raw.weather_hourly r
+            JOIN (
+                SELECT city_id,
+                    MIN(date) - INTERVAL {ROLLING_WINDOW_DAYS} DAYS AS context_start,
+                    MAX(date) + INTERVAL 1 DAY AS context_end
+                FROM _rescore_days
+                GROUP BY city_id
+            ) c ON c.city_id = r.city_id AND r.time >= c.context_start AND r.time < c.context_end
+        """, variables))
+
+        conn.execute("CREATE OR REPLACE TEMP TABLE _removed_seasonal AS " + long_moments_select(f"""
+            SELECT city_id,
+                CAST(EXTRACT(month FROM time) AS INTEGER) AS month,
+                CAST(EXTRACT(hour FROM time) AS INTEGER) AS hour,
+                variable AS metric,
+                value
+            FROM {ANOMALY_SCORES_TABLE} a
+            {touched.format(alias="a")}
+        """, seasonal_keys))
+        conn.execute("CREATE OR REPLACE TEMP TABLE _added_seasonal AS " + long_moments_select(
+            f"SELECT * FROM _long_rows l {touched.format(alias='l')}", seasonal_keys
+        ))
+        merge_moments(conn, SEASONAL_MOMENTS_TABLE, "SELECT * FROM _removed_seasonal", seasonal_keys, remove=True)
+        merge_moments(conn, SEASONAL_MOMENTS_TABLE, "SELECT * FROM _added_seasonal", seasonal_keys)
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE _changed_seasonal AS
+            SELECT city_id, month, hour, metric FROM _removed_seasonal
+            UNION
+            SELECT city_id, month, hour, metric FROM _added_seasonal
+        """)
+
+        deleted = conn.execute(f"""
+            DELETE FROM {ANOMALY_SCORES_TABLE} a
+            USING _rescore_days k
+            WHERE k.city_id = a.city_id AND k.date = CAST(a.time AS DATE)
+        """).fetchone()[0]
+        inserted = conn.execute(
+            f"INSERT INTO {ANOMALY_SCORES_TABLE} " + scores_select(rescored.format(alias="r"))
+        ).fetchone()[0]
+        updated = conn.execute(UPDATE_SEASONAL_SQL.format(
+            table=ANOMALY_SCORES_TABLE,
+            moments_table=SEASONAL_MOMENTS_TABLE,
+            min_samples=MIN_BASELINE_SAMPLES,
+            threshold=ZSCORE_THRESHOLD
+        )).fetchone()[0]
+        for temp_table in ("_rescore_days", "_removed_seasonal", "_added_seasonal", "_changed_seasonal"):
+            conn.execute(f"DROP TABLE {temp_table}")
+        logger.info(
+            f"Refreshed {ANOMALY_SCORES_TABLE}: {deleted:,} rows removed, {inserted:,} rows inserted, "
+            f"{updated:,} seasonal baselines updated"
+        )
+    else:
+        logger.info(f"Creating {ANOMALY_SCORES_TABLE} ({len(variables)} variables)...")
+        conn.execute(
+            "CREATE OR REPLACE TEMP TABLE _long_rows AS "
+            + long_rows_select("SELECT * FROM raw.weather_hourly", variables)
+        )
+        rebuild_moments(
+            conn, SEASONAL_MOMENTS_TABLE,
+            long_moments_select("SELECT * FROM _long_rows", seasonal_keys),
+            SEASONAL_KEYS
+        )
+        conn.execute(
+            f"CREATE OR REPLACE TABLE {ANOMALY_SCORES_TABLE} AS " + scores_select() + " ORDER BY time, city_id, variable"
+        )
+
+    conn.execute("DROP TABLE _long_rows")
+
+    counts = conn.execute(f"""
+        SELECT COUNT(*), COUNT(*) FILTER (WHERE is_rolling_anomaly), COUNT(*) FILTER (WHERE is_seasonal_anomaly)
+        FROM {ANOMALY_SCORES_TABLE}
+    """).fetchone()
+    logger.info(f"{ANOMALY_SCORES_TABLE} has {counts[0]:,} rows")
+    logger.info(f"Found {counts[1]:,} rolling and {counts[2]:,} seasonal anomalies")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Rule-based data quality checks evaluated in one pass per table.
+
+Rules are declared in dq_rules.yml. For each table, every rule becomes a
+boolean violation column in a single SELECT. Failure counts and up to
+``SAMPLE_ROWS`` violating rows per rule come from filtered aggregates over
+that one scan, instead of one full-table query per check. Results are
+appended to profile.dq_results. Failures are recorded, not raised, so the
+pipeline keeps running.
+"""
+
+import os
+import argparse
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import duckdb
+import yaml
+
+import project_paths  # noqa: F401  (puts ingestion/ on sys.path)
+from schemas import DQ_RESULTS_SCHEMA
+from config import CITIES, PROJECT_ROOT
+from schema_registry import DATASET_VARIABLES, variable_range
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(PROJECT_ROOT, "duckdb", "weather.db")
+DQ_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dq_rules.yml")
+SAMPLE_ROWS = 5
+
+REFERENCE_SETS = {
+    "cities": lambda: sorted(CITIES.keys()),
+}
+
+
+def load_rules(path: str = DQ_RULES_PATH) -> Dict[str, Dict]:
+    """Table specs keyed by table name."""
+    with open(path) as f:
+        return yaml.safe_load(f)["tables"]
+
+
+def sql_literal(value) -> str:
+    """SQL literal for a string or number."""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def expand_rules(spec: Dict) -> List[Dict]:
+    """Turn a table spec into single-check rules with their violation expressions."""
+    rules = []
+    for rule in spec["rules"]:
+        rule_type = rule["type"]
+        severity = rule.get("severity", "error")
+
+        if rule_type == "not_null":
+            for column in rule["columns"]:
+                rules.append({
+                    "name": f"not_null_{column}", "type": rule_type, "columns": [column],
+                    "severity": severity, "violation": f"{column} IS NULL",
+                })
+
+        elif rule_type == "unique":
+            columns = rule["columns"]
+            rules.append({
+                "name": rule.get("name", f"unique_{'_'.join(columns)}"), "type": rule_type, "columns": columns,
+                "severity": severity, "violation": f"COUNT(*) OVER (PARTITION BY {', '.join(columns)}) > 1",
+            })
+
+        elif rule_type == "range":
+            if rule.get("registry"):
+                bounds = {
+                    variable: variable_range(variable)
+                    for variable in DATASET_VARIABLES[spec["dataset"]] if variable_range(variable)
+                }
+            else:
+                bounds = {rule["column"]: (rule.get("min"), rule.get("max"))}
+            for column, (low, high) in bounds.items():
+                conditions = []
+                if low is not None:
+                    conditions.append(f"{column} < {sql_literal(low)}")
+                if high is not None:
+                    conditions.append(f"{column} > {sql_literal(high)}")
+                if not conditions:
+                    raise ValueError(f"Range rule on {column} needs a min or max")
+                rules.append({
+                    "name": f"range_{column}", "type": rule_type, "columns": [column],
+                    "severity": severity, "violation": " OR ".join(conditions),
+                })
+
+        elif rule_type == "relationship":
+            column = rule["column"]
+            values = ", ".join(sql_literal(value) for value in REFERENCE_SETS[rule["to"]]())
+            rules.append({
+                "name": rule.get("name", f"relationship_{column}_{rule['to']}"), "type": rule_type, "columns": [column],
+                "severity": severity, "violation": f"{column} NOT IN ({values})",
+            })
+
+        elif rule_type == "expression":
+            rules.append({
+                "name": rule["name"], "type": rule_type, "columns": rule.get("columns", []),
+                "severity": severity, "violation": f"NOT ({rule['expression']})",
+            })
+
+        else:
+            raise ValueError(f"Unknown data quality rule type: {rule_type}")
+
+    return rules
+
+
+def evaluate_table(conn, table: str, spec: Dict, batch_ids: Optional[List[str]] = None) -> List[Dict]:
+    """Evaluate every rule of a table in one scan and return one result per rule."""
+    rules = expand_rules(spec)
+    key = spec["key"]
+
+    where, params = "", []
+    if batch_ids is not None and spec.get("batch_column"):
+        where, params = f"WHERE list_contains(?, {spec['batch_column']})", [batch_ids]
+    elif batch_ids is not None:
+        logger.info(f"{table} has no batch column; checking all rows")
+
+    flags = ",\n".join(f"COALESCE({rule['violation']}, FALSE) AS _dq_{i}" for i, rule in enumerate(rules))
+    aggregates = [
+        f"COUNT(*) FILTER (WHERE _dq_{i}), "
+        f"arg_min(CAST(to_json(struct_pack({', '.join(dict.fromkeys(key + rule['columns']))})) AS VARCHAR), "
+        f"{key[-1]}, {SAMPLE_ROWS}) FILTER (WHERE _dq_{i})"
+        for i, rule in enumerate(rules)
+    ]
+    row = conn.execute(f"""
+        WITH flagged AS (
+            SELECT *, {flags}
+            FROM {table}
+            {where}
+        )
+        SELECT COUNT(*), {", ".join(aggregates)}
+        FROM flagged
+    """, params).fetchone()
+
+    rows_checked = row[0]
+    results = []
+    for i, rule in enumerate(rules):
+        failed, samples = row[1 + 2 * i], row[2 + 2 * i]
+        status = "pass" if failed == 0 else ("warn" if rule["severity"] == "warn" else "fail")
+        results.append({
+            "table_name": table,
+            "rule_name": rule["name"],
+            "rule_type": rule["type"],
+            "columns": rule["columns"],
+            "severity": rule["severity"],
+            "rows_checked": rows_checked,
+            "failed_count": failed,
+            "passed_count": rows_checked - failed,
+            "status": status,
+            "sample_rows": samples or [],
+        })
+    return results
+
+
+def run_quality_checks(
+    conn,
+    batch_ids: Optional[List[str]] = None,
+    tables: Optional[List[str]] = None,
+    rules_path: str = DQ_RULES_PATH
+) -> List[Dict]:
+    """Check the configured tables and append the results to profile.dq_results.
+
+    With batch_ids only rows of those batches are checked in tables that
+    declare a batch_column. Missing tables are skipped.
+    """
+    specs = load_rules(rules_path)
+    conn.execute("CREATE SCHEMA IF NOT EXISTS profile")
+    conn.execute(DQ_RESULTS_SCHEMA)
+
+    run_at = datetime.now()
+    run_id = run_at.strftime("%Y%m%d_%H%M%S_%f")
+    results = []
+    for table, spec in specs.items():
+        if tables and table not in tables:
+            continue
+        schema_name, table_name = table.split(".", 1)
+        exists = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE schema_name = ? AND table_name = ?",
+            [schema_name, table_name]
+        ).fetchone()[0]
+        if not exists:
+            logger.warning(f"Skipping data quality checks for missing table {table}")
+            continue
+        results.extend(evaluate_table(conn, table, spec, batch_ids))
+
+    if results:
+        conn.executemany(
+            "INSERT INTO profile.dq_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                [run_id, run_at, r["table_name"], r["rule_name"], r["rule_type"], r["columns"], r["severity"],
+                 batch_ids, r["rows_checked"], r["failed_count"], r["passed_count"], r["status"], r["sample_rows"]]
+                for r in results
+            ]
+        )
+
+    failed = [r for r in results if r["status"] != "pass"]
+    logger.info(f"Data quality run {run_id}: {len(results)} rule(s), {len(failed)} with violations")
+    for r in failed:
+        logger.warning(f"  [{r['status']}] {r['table_name']}.{r['rule_name']}: {r['failed_count']:,} of {r['rows_checked']:,} rows")
+    return results
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Run rule-based data quality checks against the DuckDB database",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python dq_engine.py
+  python dq_engine.py --table raw.weather_hourly
+  python dq_engine.py --batch-id 20250101_060000
+        """
+    )
+    parser.add_argument(
+        "--table",
+        action="append",
+        help="Only check this table; repeatable"
+    )
+    parser.add_argument(
+        "--batch-id",
+        action="append",
+        help="Only check rows of this batch; repeatable"
+    )
+    parser.add_argument(
+        "--rules",
+        default=DQ_RULES_PATH,
+        help="Rule file to evaluate"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    conn = duckdb.connect(DB_PATH)
+    results = run_quality_checks(conn, args.batch_id, args.table, args.rules)
+    conn.close()
+
+    return 1 if any(r["status"] == "fail" for r in results) else 0
+
+
+if __name__ == "__main__":
+    exit(main())
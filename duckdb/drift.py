@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Distribution drift of new batches, scored from stored profile sketches.
+
+Each (batch_id, city_id) profile in profile.batch_profiles is compared per
+variable against a reference window: the same city's previous
+``REFERENCE_BATCHES`` batch profiles, merged. Both sides are t-digests, so
+no raw Parquet is read:
+
+- PSI over ``PSI_BINS`` bins cut at the reference quantiles, flagged only
+  for batches of at least ``PSI_MIN_SAMPLES`` values
+- two-sample KS statistic over the two approximate CDFs, flagged above the
+  critical value at alpha = 0.01 for batches of at least ``KS_MIN_SAMPLES``
+  values
+- the change in null rate
+
+Scores go to profile.drift_scores.
+"""
+
+import argparse
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import duckdb
+import numpy as np
+
+import project_paths  # noqa: F401  (puts ingestion/ on sys.path)
+from schemas import DRIFT_SCORES_SCHEMA
+from sketches import ColumnProfile, TDigest
+from profiler import DB_PATH, BATCH_KEYS, load_profiles, merge_profiles
+
+logger = logging.getLogger(__name__)
+
+DRIFT_DATASETS = ["hourly"]
+REFERENCE_BATCHES = 30
+PSI_BINS = 10
+PSI_EPSILON = 1e-4
+PSI_THRESHOLD = 0.25
+PSI_MIN_SAMPLES = 100  # below this PSI is mostly sampling noise
+KS_ALPHA_COEFFICIENT = 1.628  # c(alpha) for alpha = 0.01
+# Hourly values are autocorrelated, so a day's 24 values carry far fewer independent
+# samples than the critical value assumes; smaller batches are never flagged by KS
+KS_MIN_SAMPLES = 100
+
+
+def psi(batch: TDigest, reference: TDigest, bins: int = PSI_BINS) -> Optional[float]:
+    """Population stability index over bins cut at the reference quantiles."""
+    if len(batch.means) == 0 or len(reference.means) == 0:
+        return None
+    edges = np.unique([reference.quantile(q) for q in np.linspace(0, 1, bins + 1)[1:-1]])
+    expected = np.diff(np.concatenate([[0.0], reference.cdf(edges), [1.0]]))
+    actual = np.diff(np.concatenate([[0.0], batch.cdf(edges), [1.0]]))
+    expected = np.clip(expected, PSI_EPSILON, None)
+    actual = np.clip(actual, PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(batch: TDigest, reference: TDigest) -> Optional[float]:
+    """Largest gap between the two approximate CDFs."""
+    if len(batch.means) == 0 or len(reference.means) == 0:
+        return None
+    grid = np.union1d(batch.means, reference.means)
+    return float(np.max(np.abs(batch.cdf(grid) - reference.cdf(grid))))
+
+
+def ks_critical(n: int, m: int) -> Optional[float]:
+    """Two-sample KS critical value for sample sizes n and m."""
+    if not n or not m:
+        return None
+    return KS_ALPHA_COEFFICIENT * float(np.sqrt((n + m) / (n * m)))
+
+
+def score_column(batch: ColumnProfile, reference: ColumnProfile) -> Dict:
+    """Drift scores of one variable."""
+    psi_score = psi(batch.tdigest, reference.tdigest)
+    ks = ks_statistic(batch.tdigest, reference.tdigest)
+    critical = ks_critical(batch.n, reference.n)
+    null_rate_delta = (
+        batch.null_rate - reference.null_rate
+        if batch.null_rate is not None and reference.null_rate is not None else None
+    )
+    return {
+        "batch_count": batch.n,
+        "reference_count": reference.n,
+        "psi": psi_score,
+        "ks": ks,
+        "ks_critical": critical,
+        "null_rate_delta": null_rate_delta,
+        "is_drift": bool(
+            (psi_score is not None and batch.n >= PSI_MIN_SAMPLES and psi_score > PSI_THRESHOLD)
+            or (ks is not None and critical is not None and batch.n >= KS_MIN_SAMPLES and ks > critical)
+        ),
+    }
+
+
+def score_batch(conn, dataset: str, batch_id: str, city_id: str, reference_batches: int = REFERENCE_BATCHES) -> List[List]:
+    """Drift score rows of one batch and city against its reference window."""
+    reference_ids = [
+        row[0] for row in conn.execute("""
+            SELECT DISTINCT batch_id
+            FROM profile.batch_profiles
+            WHERE dataset = ? AND city_id = ? AND batch_id < ?
+            ORDER BY batch_id DESC
+            LIMIT ?
+        """, [dataset, city_id, batch_id, reference_batches]).fetchall()
+    ]
+    if not reference_ids:
+        logger.info(f"No reference batches before {batch_id} for {city_id}; skipping drift")
+        return []
+
+    where = "WHERE dataset = ? AND city_id = ? AND "
+    batch = load_profiles(conn, "profile.batch_profiles", BATCH_KEYS, where + "batch_id = ?", [dataset, city_id, batch_id])
+    reference = merge_profiles(
+        load_profiles(
+            conn, "profile.batch_profiles", BATCH_KEYS,
+            where + "list_contains(?, batch_id)", [dataset, city_id, reference_ids]
+        ),
+        group_by=[len(BATCH_KEYS)]
+    )
+
+    computed_at = datetime.now()
+    rows = []
+    for (_, _, _, column), profile in batch.items():
+        if (column,) not in reference:
+            continue
+        scores = score_column(profile, reference[(column,)])
+        rows.append([dataset, batch_id, city_id, column, len(reference_ids), *scores.values(), computed_at])
+    return rows
+
+
+def detect_drift(conn, dataset: str = "hourly", batch_ids: Optional[List[str]] = None) -> int:
+    """Score batches of a dataset and return how many batch/city pairs were scored.
+
+    Without batch_ids every batch profile that has no drift scores yet is scored.
+    A city's first batch has no reference window and is never a target.
+    """
+    conn.execute("CREATE SCHEMA IF NOT EXISTS profile")
+    conn.execute(DRIFT_SCORES_SCHEMA)
+
+    has_reference = """
+        EXISTS (
+            SELECT 1 FROM profile.batch_profiles r
+            WHERE r.dataset = p.dataset AND r.city_id = p.city_id AND r.batch_id < p.batch_id
+        )
+    """
+    if batch_ids is None:
+        targets = conn.execute(f"""
+            SELECT DISTINCT p.batch_id, p.city_id
+            FROM profile.batch_profiles p
+            ANTI JOIN profile.drift_scores d
+                ON d.dataset = p.dataset AND d.batch_id = p.batch_id AND d.city_id = p.city_id
+            WHERE p.dataset = ? AND {has_reference}
+            ORDER BY 1, 2
+        """, [dataset]).fetchall()
+    else:
+        targets = conn.execute(f"""
+            SELECT DISTINCT p.batch_id, p.city_id
+            FROM profile.batch_profiles p
+            WHERE p.dataset = ? AND list_contains(?, p.batch_id) AND {has_reference}
+            ORDER BY 1, 2
+        """, [dataset, batch_ids]).fetchall()
+
+    if not targets:
+        logger.info(f"No {dataset} batches to score for drift")
+        return 0
+
+    rows = []
+    for batch_id, city_id in targets:
+        rows.extend(score_batch(conn, dataset, batch_id, city_id))
+
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        conn.executemany(
+            "DELETE FROM profile.drift_scores WHERE dataset = ? AND batch_id = ? AND city_id = ?",
+            [[dataset, batch_id, city_id] for batch_id, city_id in targets]
+        )
+        if rows:
+            conn.executemany(
+                "INSERT INTO profile.drift_scores VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    scored = len({(row[1], row[2]) for row in rows})
+    drifted = sum(1 for row in rows if row[-2])
+    logger.info(f"Scored drift for {scored} {dataset} batch/city pair(s): {drifted} drifting variable(s)")
+    return scored
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Score distribution drift of batches from stored profiles",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python drift.py
+  python drift.py --batch-id 20250101_060000
+        """
+    )
+    parser.add_argument(
+        "--dataset",
+        choices=DRIFT_DATASETS,
+        default="hourly",
+        help="Dataset to score"
+    )
+    parser.add_argument(
+        "--batch-id",
+        action="append",
+        help="Score (or rescore) this batch; repeatable. Default: every unscored batch"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    conn = duckdb.connect(DB_PATH)
+    detect_drift(conn, args.dataset, args.batch_id)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""Column profiling of the raw Parquet dataset with mergeable sketches.
+
+Every hourly and daily variable gets one profile per partition (dataset,
+city_id, year, month) in profile.partition_profiles and one per ingestion
+batch and city in profile.batch_profiles. A profile holds the null rate, min/max,
+mean/M2, a t-digest, a HyperLogLog and a log histogram (see sketches.py).
+
+Profiles describe the rows raw.weather_hourly and raw.weather_daily keep:
+of several versions of a (city_id, time) row across files only the latest
+counts (RAW_VERSION_ORDER, as in the raw load).
+
+Only files missing from profile._profiled_files are read. Their profiles are
+merged into the stored partition profiles when none of their rows replaces a
+row of another file, which a read of the partition's key columns tells.
+Otherwise, and when a partition's files were removed or rewritten (e.g. by
+compaction), the partition is profiled again from the latest rows of its
+current files, because sketches cannot subtract rows. Batch profiles are
+written once per (batch_id, city_id); a batch whose rows were replaced by a
+later batch is profiled again from the rows it still holds. Compacted files
+only hold batches that were already profiled.
+"""
+
+import os
+import argparse
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import project_paths  # noqa: F401  (puts ingestion/ on sys.path)
+from schemas import (
+    PARTITION_PROFILES_SCHEMA, BATCH_PROFILES_SCHEMA, PROFILED_FILES_SCHEMA,
+    RAW_KEY_COLUMNS, RAW_VERSION_ORDER
+)
+from sketches import ColumnProfile, PROFILE_RECORD_COLUMNS
+from config import PROJECT_ROOT, RAW_DATA_PATH
+from storage import open_storage
+from schema_registry import DATASET_VARIABLES, conform_table
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(PROJECT_ROOT, "duckdb", "weather.db")
+
+PARTITION_KEYS = ["dataset", "city_id", "year", "month"]
+BATCH_KEYS = ["dataset", "batch_id", "city_id"]
+# Columns that decide which version of a row the raw load keeps
+VERSION_COLUMNS = RAW_KEY_COLUMNS + ["ingestion_timestamp", "batch_id"]
+
+
+def column_values(table: pa.Table, column: str) -> np.ndarray:
+    """A column as float64 with NaN for nulls; timestamps become epoch microseconds."""
+    values = table.column(column)
+    if pa.types.is_timestamp(values.type):
+        values = pc.cast(values, pa.int64())
+    return pc.cast(values, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def profile_table(table: pa.Table, dataset: str) -> Dict[str, ColumnProfile]:
+    """Profile every variable of a dataset in a table."""
+    return {
+        variable: ColumnProfile.from_values(column_values(table, variable))
+        for variable in DATASET_VARIABLES[dataset]
+    }
+
+
+def partition_key(path: str) -> Tuple[str, int, int]:
+    """(city_id, year, month) of a file from its hive partition directories."""
+    parts = dict(
+        part.split("=", 1) for part in os.path.dirname(path).split(os.sep)[-3:] if "=" in part
+    )
+    return parts["city_id"], int(parts["year"]), int(parts["month"])
+
+
+def mark_latest(conn, table: pa.Table) -> pa.Table:
+    """Add an is_latest column: whether the raw load keeps the row over other versions of its key."""
+    conn.register("_profile_rows", table)
+    try:
+        return conn.execute(f"""
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY {", ".join(RAW_KEY_COLUMNS)}
+                ORDER BY {RAW_VERSION_ORDER}
+            ) = 1 AS is_latest
+            FROM _profile_rows
+        """).fetch_arrow_table()
+    finally:
+        conn.unregister("_profile_rows")
+
+
+def replaced_batches(marked: pa.Table) -> List[str]:
+    """batch_ids with rows that a later version replaces."""
+    replaced = marked.filter(pc.invert(marked.column("is_latest")))
+    return [batch_id for batch_id in pc.unique(pc.cast(replaced.column("batch_id"), pa.string())).to_pylist() if batch_id]
+
+
+def latest_rows(marked: pa.Table) -> pa.Table:
+    """The rows of a mark_latest table that the raw load keeps."""
+    return marked.filter(marked.column("is_latest")).drop_columns(["is_latest"])
+
+
+def has_replaced_rows(marked: pa.Table) -> bool:
+    """Whether a mark_latest table holds more than one version of any key."""
+    return not pc.all(marked.column("is_latest")).as_py()
+
+
+def batch_pairs(table: pa.Table) -> Set[Tuple[str, str]]:
+    """Distinct (batch_id, city_id) pairs of a table."""
+    groups = pa.table({
+        "batch_id": pc.cast(table.column("batch_id"), pa.string()),
+        "city_id": pc.cast(table.column("city_id"), pa.string())
+    }).group_by(["batch_id", "city_id"]).aggregate([])
+    return set(zip(groups.column("batch_id").to_pylist(), groups.column("city_id").to_pylist()))
+
+
+def profile_batches(table: pa.Table, dataset: str, pairs: Set[Tuple[str, str]]) -> Dict[Tuple, ColumnProfile]:
+    """Profiles of the rows of each (batch_id, city_id) pair, keyed like profile.batch_profiles."""
+    batch_column = pc.cast(table.column("batch_id"), pa.string())
+    city_column = pc.cast(table.column("city_id"), pa.string())
+    profiles = {}
+    for batch_id, city_id in sorted(pairs):
+        rows = table.filter(pc.and_(pc.equal(batch_column, batch_id), pc.equal(city_column, city_id)))
+        if rows.num_rows == 0:
+            continue
+        for column, profile in profile_table(rows, dataset).items():
+            profiles[(dataset, batch_id, city_id, column)] = profile
+    return profiles
+
+
+def load_profiles(conn, table: str, keys: List[str], where: str = "", params: Optional[List] = None) -> Dict[Tuple, ColumnProfile]:
+    """Stored profiles keyed by (*keys, column_name)."""
+    columns = keys + ["column_name"] + PROFILE_RECORD_COLUMNS
+    rows = conn.execute(f"SELECT {', '.join(columns)} FROM {table} {where}", params or []).fetchall()
+    profiles = {}
+    for row in rows:
+        record = dict(zip(columns, row))
+        profiles[tuple(record[key] for key in keys + ["column_name"])] = ColumnProfile.from_record(record)
+    return profiles
+
+
+def save_profiles(conn, table: str, keys: List[str], profiles: Dict[Tuple, ColumnProfile]):
+    """Replace the stored profiles of the given keys."""
+    if not profiles:
+        return
+    columns = keys + ["column_name"] + PROFILE_RECORD_COLUMNS + ["updated_at"]
+    key_match = " AND ".join(f"{key} = ?" for key in keys + ["column_name"])
+    updated_at = datetime.now()
+    conn.executemany(f"DELETE FROM {table} WHERE {key_match}", [list(key) for key in profiles])
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        [list(key) + list(profile.to_record().values()) + [updated_at] for key, profile in profiles.items()]
+    )
+
+
+def merge_profiles(profiles: Dict[Tuple, ColumnProfile], group_by: List[int]) -> Dict[Tuple, ColumnProfile]:
+    """Roll profiles up to the key positions in group_by."""
+    merged = {}
+    for key, profile in profiles.items():
+        group = tuple(key[i] for i in group_by)
+        merged[group] = merged[group].merge(profile) if group in merged else profile
+    return merged
+
+
+def profile_dataset(conn, dataset: str, storage, full_refresh: bool = False) -> List[str]:
+    """Update the profiles of one dataset from unprofiled files and return the new batch_ids."""
+    if full_refresh:
+        for table in ("profile.partition_profiles", "profile.batch_profiles", "profile._profiled_files"):
+            conn.execute(f"DELETE FROM {table} WHERE dataset = ?", [dataset])
+
+    current = {f["path"]: (f["size_bytes"], f["mtime"]) for f in storage.list_files(dataset)}
+    profiled = {
+        path: (size_bytes, mtime)
+        for path, size_bytes, mtime in conn.execute(
+            "SELECT path, size_bytes, mtime FROM profile._profiled_files WHERE dataset = ?", [dataset]
+        ).fetchall()
+    }
+
+    new_files = [path for path, stat in current.items() if profiled.get(path) != stat]
+    stale_partitions = {partition_key(path) for path, stat in profiled.items() if current.get(path) != stat}
+    if not new_files and not stale_partitions:
+        logger.info(f"No new {dataset} files to profile")
+        return []
+
+    tables = {}
+    columns = DATASET_VARIABLES[dataset] + [column for column in VERSION_COLUMNS if column not in DATASET_VARIABLES[dataset]]
+
+    def read(path: str) -> pa.Table:
+        if path not in tables:
+            tables[path] = conform_table(storage.read_table(path), dataset).select(columns)
+        return tables[path]
+
+    def read_keys(path: str) -> pa.Table:
+        if path in tables:
+            return tables[path].select(VERSION_COLUMNS)
+        return conform_table(storage.read_table(path, columns=VERSION_COLUMNS), dataset).select(VERSION_COLUMNS)
+
+    files_by_partition: Dict[Tuple, List[str]] = {}
+    for path in current:
+        files_by_partition.setdefault(partition_key(path), []).append(path)
+    new_by_partition: Dict[Tuple, List[str]] = {}
+    for path in new_files:
+        new_by_partition.setdefault(partition_key(path), []).append(path)
+
+    partition_profiles = {}
+    removed_partitions = []
+    rebuilt_partitions = []
+    # city_id -> batch_ids that lost rows to a later version, so their batch profiles are redone
+    replaced: Dict[str, Set[str]] = {}
+    for partition in stale_partitions | set(new_by_partition):
+        paths = files_by_partition.get(partition, [])
+        if not paths:
+            removed_partitions.append(partition)
+            continue
+        if partition in stale_partitions or has_replaced_rows(mark_latest(conn, pa.concat_tables([read_keys(path) for path in paths]))):
+            marked = mark_latest(conn, pa.concat_tables([read(path) for path in paths]))
+            # Stale partitions (e.g. after compaction) often hold no replaced rows at all
+            batch_ids = replaced_batches(marked)
+            if batch_ids:
+                replaced.setdefault(partition[0], set()).update(batch_ids)
+            table = latest_rows(marked)
+            existing = {}
+            rebuilt_partitions.append(partition)
+        else:
+            table = pa.concat_tables([read(path) for path in new_by_partition[partition]])
+            existing = load_profiles(
+                conn, "profile.partition_profiles", PARTITION_KEYS,
+                "WHERE dataset = ? AND city_id = ? AND year = ? AND month = ?", [dataset, *partition]
+            )
+        for column, profile in profile_table(table, dataset).items():
+            key = (dataset, *partition, column)
+            partition_profiles[key] = existing[key].merge(profile) if key in existing else profile
+
+    known_batches = set(conn.execute(
+        "SELECT DISTINCT batch_id, city_id FROM profile.batch_profiles WHERE dataset = ?", [dataset]
+    ).fetchall())
+    batch_profiles = {}
+    if new_files:
+        new_rows = pa.concat_tables([read(path) for path in new_files])
+        targets = {
+            (batch_id, city_id) for batch_id, city_id in batch_pairs(new_rows)
+            if batch_id is not None and (batch_id, city_id) not in known_batches
+        }
+        # In a city with replaced rows, new batches are profiled from the latest rows below
+        batch_profiles.update(profile_batches(new_rows, dataset, {pair for pair in targets if pair[1] not in replaced}))
+        for batch_id, city_id in targets:
+            if city_id in replaced:
+                replaced[city_id].add(batch_id)
+
+    redone_batches = set()
+    for city_id, batch_ids in replaced.items():
+        city_paths = [path for path in current if partition_key(path)[0] == city_id]
+        # Every partition holding rows of the batches, so each profile covers the whole batch
+        partitions = {
+            partition_key(path) for path in city_paths
+            if batch_ids & set(pc.cast(read_keys(path).column("batch_id"), pa.string()).to_pylist())
+        }
+        marked = mark_latest(conn, pa.concat_tables([read(path) for path in city_paths if partition_key(path) in partitions]))
+        pairs = {(batch_id, city_id) for batch_id in batch_ids}
+        batch_profiles.update(profile_batches(latest_rows(marked), dataset, pairs))
+        redone_batches |= pairs & known_batches
+
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        for partition in removed_partitions:
+            conn.execute(
+                "DELETE FROM profile.partition_profiles WHERE dataset = ? AND city_id = ? AND year = ? AND month = ?",
+                [dataset, *partition]
+            )
+        save_profiles(conn, "profile.partition_profiles", PARTITION_KEYS, partition_profiles)
+        # A redone batch whose rows were all replaced keeps no profile
+        for batch_id, city_id in redone_batches:
+            conn.execute(
+                "DELETE FROM profile.batch_profiles WHERE dataset = ? AND batch_id = ? AND city_id = ?",
+                [dataset, batch_id, city_id]
+            )
+        save_profiles(conn, "profile.batch_profiles", BATCH_KEYS, batch_profiles)
+
+        conn.execute(
+            "DELETE FROM profile._profiled_files WHERE dataset = ? AND NOT list_contains(?, path)",
+            [dataset, list(current)]
+        )
+        conn.execute("DELETE FROM profile._profiled_files WHERE list_contains(?, path)", [new_files])
+        profiled_at = datetime.now()
+        conn.executemany(
+            "INSERT INTO profile._profiled_files VALUES (?, ?, ?, ?, ?)",
+            [[path, dataset, *current[path], profiled_at] for path in new_files]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    new_batches = sorted({batch_id for _, batch_id, city_id, _ in batch_profiles if (batch_id, city_id) not in known_batches})
+    logger.info(
+        f"Profiled {len(new_files)} new {dataset} file(s): {len({key[:-1] for key in partition_profiles})} "
+        f"partition(s) updated ({len(rebuilt_partitions)} rebuilt), {len(new_batches)} new batch(es), "
+        f"{len(redone_batches)} batch(es) re-profiled after their rows were replaced"
+    )
+    return new_batches
+
+
+def profile_raw_files(conn, storage=None, full_refresh: bool = False) -> Dict[str, List[str]]:
+    """Profile new raw files of every dataset and return the newly profiled batch_ids per dataset.
+
+    storage is a storage.py storage or a directory/s3:// URI; RAW_DATA_PATH by default.
+    """
+    if storage is None or isinstance(storage, str):
+        storage = open_storage(storage or RAW_DATA_PATH)
+    logger.info(f"Profiling raw files ({'full refresh' if full_refresh else 'incremental'})...")
+    conn.execute("CREATE SCHEMA IF NOT EXISTS profile")
+    for ddl in (PARTITION_PROFILES_SCHEMA, BATCH_PROFILES_SCHEMA, PROFILED_FILES_SCHEMA):
+        conn.execute(ddl)
+
+    return {dataset: profile_dataset(conn, dataset, storage, full_refresh) for dataset in DATASET_VARIABLES}
+
+
+def column_summaries(conn, dataset: str, city_id: Optional[str] = None) -> Dict[str, Dict]:
+    """Per-column summary of a dataset, merged across partitions (and cities unless one is given)."""
+    where, params = "WHERE dataset = ?", [dataset]
+    if city_id:
+        where += " AND city_id = ?"
+        params.append(city_id)
+    profiles = load_profiles(conn, "profile.partition_profiles", PARTITION_KEYS, where, params)
+    merged = merge_profiles(profiles, group_by=[len(PARTITION_KEYS)])
+    return {column: merged[(column,)].summary() for column in DATASET_VARIABLES[dataset] if (column,) in merged}
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Profile raw weather Parquet files into the profile schema",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python profiler.py
+  python profiler.py --full-refresh
+  python profiler.py --show hourly --city amsterdam
+        """
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Drop stored profiles and profile every file again"
+    )
+    parser.add_argument(
+        "--show",
+        choices=list(DATASET_VARIABLES.keys()),
+        help="Print the merged column profiles of a dataset instead of profiling"
+    )
+    parser.add_argument(
+        "--city",
+        help="Restrict --show to one city"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    conn = duckdb.connect(DB_PATH)
+
+    if args.show:
+        for column, summary in column_summaries(conn, args.show, args.city).items():
+            stats = ", ".join(
+                f"{name}={value:.4g}" if isinstance(value, float) else f"{name}={value}"
+                for name, value in summary.items()
+            )
+            logger.info(f"{column}: {stats}")
+    else:
+        profile_raw_files(conn, full_refresh=args.full_refresh)
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Put ingestion/ on sys.path for the database scripts.
+
+The scripts in this directory share config, the schema registry and the
+raw layout with the ingestion scripts. Every module here that imports one
+of those imports this module first, so it works as a script, from
+sync_and_refresh.py or from the benchmarks regardless of import order.
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+INGESTION_DIR = str(PROJECT_ROOT / "ingestion")
+
+if INGESTION_DIR not in sys.path:
+    sys.path.insert(0, INGESTION_DIR)
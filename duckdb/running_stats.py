@@ -0,0 +1,101 @@
+"""Persisted running moments (count, mean, M2) kept current with Chan's merge.
+
+A moments table holds one row per key and metric. The moments of a batch of
+new rows are folded in with ``merge_moments``; rows that are about to be
+replaced are folded out with ``remove=True``. The stored statistics therefore
+always describe the current data without rescanning it.
+"""
+
+from typing import List, Tuple
+
+
+def moments_table_ddl(table: str, key_columns: List[Tuple[str, str]]) -> str:
+    """CREATE TABLE statement for a moments table with (column, type) keys."""
+    keys = "".join(f"    {name} {kind},\n" for name, kind in key_columns)
+    return f"""
+CREATE TABLE IF NOT EXISTS {table} (
+{keys}    metric VARCHAR,
+    n BIGINT,
+    mean DOUBLE,
+    m2 DOUBLE,
+    updated_at TIMESTAMP
+);
+"""
+
+
+def long_moments_select(source_sql: str, keys: List[str]) -> str:
+    """Query computing (n, mean, M2) per key and metric over (keys..., metric, value) rows."""
+    key_list = ", ".join(keys)
+    return f"""
+        SELECT {key_list}, metric,
+            COUNT(value) AS n,
+            AVG(value) AS mean,
+            VAR_POP(value) * COUNT(value) AS m2
+        FROM ({source_sql})
+        GROUP BY {key_list}, metric
+    """
+
+
+def moments_select(source_sql: str, keys: List[str], metrics: List[str]) -> str:
+    """Query computing (n, mean, M2) per key and metric over a wide source query."""
+    key_list = ", ".join(keys)
+    values = ", ".join(f"CAST({metric} AS DOUBLE) AS {metric}" for metric in metrics)
+    return long_moments_select(f"""
+        UNPIVOT (SELECT {key_list}, {values} FROM ({source_sql}))
+        ON {", ".join(metrics)}
+        INTO NAME metric VALUE value
+    """, keys)
+
+
+def rebuild_moments(conn, table: str, moments_sql: str, key_columns: List[Tuple[str, str]]):
+    """Recreate a moments table from a moments query."""
+    conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.execute(moments_table_ddl(table, key_columns))
+    conn.execute(f"INSERT INTO {table} SELECT *, CURRENT_TIMESTAMP FROM ({moments_sql})")
+
+
+def merge_moments(conn, table: str, delta_sql: str, keys: List[str], remove: bool = False):
+    """Fold a batch's moments into a moments table, or out of it with remove=True.
+
+    Adding batch b to total a uses Chan et al.'s pairwise update:
+        n = na + nb,  delta = mb - ma
+        mean = ma + delta * nb / n
+        M2 = M2a + M2b + delta^2 * na * nb / n
+    Removing b from total t solves the same equations for the remainder a.
+    """
+    key_list = ", ".join(keys + ["metric"])
+    join = " AND ".join(f"t.{key} = d.{key}" for key in keys + ["metric"])
+
+    if remove:
+        merged = f"""
+            SELECT {key_list}, n, mean,
+                CASE WHEN n > 0 THEN GREATEST(t_m2 - d_m2 - POW(d_mean - mean, 2) * n * d_n / t_n, 0) ELSE 0 END AS m2
+            FROM (
+                SELECT {", ".join(f"t.{key}" for key in keys + ["metric"])},
+                    t.n AS t_n, t.m2 AS t_m2, d.n AS d_n, d.mean AS d_mean, d.m2 AS d_m2,
+                    t.n - d.n AS n,
+                    CASE WHEN t.n > d.n THEN (t.n * t.mean - d.n * d.mean) / (t.n - d.n) ELSE 0 END AS mean
+                FROM {table} t
+                JOIN ({delta_sql}) d ON {join}
+                WHERE d.n > 0
+            )
+        """
+    else:
+        merged = f"""
+            SELECT {", ".join(f"d.{key}" for key in keys + ["metric"])},
+                COALESCE(t.n, 0) + d.n AS n,
+                CASE WHEN COALESCE(t.n, 0) = 0 THEN d.mean
+                    ELSE t.mean + (d.mean - t.mean) * d.n / (t.n + d.n)
+                END AS mean,
+                CASE WHEN COALESCE(t.n, 0) = 0 THEN d.m2
+                    ELSE t.m2 + d.m2 + POW(d.mean - t.mean, 2) * t.n * d.n / (t.n + d.n)
+                END AS m2
+            FROM ({delta_sql}) d
+            LEFT JOIN {table} t ON {join}
+            WHERE d.n > 0
+        """
+
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE _merged_moments AS {merged}")
+    conn.execute(f"DELETE FROM {table} t USING _merged_moments d WHERE {join}")
+    conn.execute(f"INSERT INTO {table} SELECT *, CURRENT_TIMESTAMP FROM _merged_moments")
+    conn.execute("DROP TABLE _merged_moments")
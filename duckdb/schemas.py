@@ -1,21 +1,139 @@
 """DuckDB database schema definitions."""
 
-RAW_WEATHER_SCHEMA = """
-CREATE TABLE IF NOT EXISTS raw.weather (
-    time TIMESTAMP,
-    temperature_2m DOUBLE,
-    relative_humidity_2m INTEGER,
-    precipitation DOUBLE,
-    wind_speed_10m DOUBLE,
-    cloud_cover INTEGER,
-    pressure_msl DOUBLE,
+import project_paths  # noqa: F401  (puts ingestion/ on sys.path)
+from schema_registry import DATASET_VARIABLES, duckdb_columns
+
+
+def raw_table_ddl(table: str, dataset: str, replace: bool = True, extra_columns: str = "") -> str:
+    """CREATE TABLE statement for a raw table using the shared schema registry."""
+    columns = ",\n".join(f"    {name} {sql_type}" for name, sql_type in duckdb_columns(dataset))
+    if extra_columns:
+        columns += f",\n    {extra_columns}"
+    create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+    return f"{create} {table} (\n{columns}\n);"
+
+
+RAW_WEATHER_HOURLY_SCHEMA = raw_table_ddl("raw.weather_hourly", "hourly")
+RAW_WEATHER_HOURLY_COLUMNS = [name for name, _ in duckdb_columns("hourly")]
+
+RAW_WEATHER_DAILY_SCHEMA = raw_table_ddl("raw.weather_daily", "daily")
+RAW_WEATHER_DAILY_COLUMNS = [name for name, _ in duckdb_columns("daily")]
+
+RAW_KEY_COLUMNS = ["city_id", "time"]
+# Of several rows with the same key the first in this order is kept
+RAW_VERSION_ORDER = "ingestion_timestamp DESC, batch_id DESC"
+HOURLY_VARIABLES = DATASET_VARIABLES["hourly"]
+
+# Rows an incremental load replaces are kept in "replaced_table" with the time they
+# were replaced, so consumers that folded them into running moments (the dbt
+# city_moments model) can fold them out again
+RAW_TABLES = {
+    "hourly": {
+        "table": "raw.weather_hourly",
+        "ddl": RAW_WEATHER_HOURLY_SCHEMA,
+        "ddl_if_missing": raw_table_ddl("raw.weather_hourly", "hourly", replace=False),
+        "replaced_table": "raw.weather_hourly_replaced",
+        "replaced_ddl": raw_table_ddl("raw.weather_hourly_replaced", "hourly", replace=False, extra_columns="replaced_at TIMESTAMP"),
+        "columns": RAW_WEATHER_HOURLY_COLUMNS,
+    },
+    "daily": {
+        "table": "raw.weather_daily",
+        "ddl": RAW_WEATHER_DAILY_SCHEMA,
+        "ddl_if_missing": raw_table_ddl("raw.weather_daily", "daily", replace=False),
+        "replaced_table": "raw.weather_daily_replaced",
+        "replaced_ddl": raw_table_ddl("raw.weather_daily_replaced", "daily", replace=False, extra_columns="replaced_at TIMESTAMP"),
+        "columns": RAW_WEATHER_DAILY_COLUMNS,
+    },
+}
+
+LOADED_FILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw._loaded_files (
+    path VARCHAR,
+    dataset VARCHAR,
+    size_bytes BIGINT,
+    mtime TIMESTAMP,
+    row_count BIGINT,
+    batch_id VARCHAR,
+    loaded_at TIMESTAMP
+);
+"""
+
+SKETCH_COLUMNS = """
+    column_name VARCHAR,
+    row_count BIGINT,
+    null_count BIGINT,
+    min_value DOUBLE,
+    max_value DOUBLE,
+    n BIGINT,
+    mean DOUBLE,
+    m2 DOUBLE,
+    tdigest_means DOUBLE[],
+    tdigest_weights DOUBLE[],
+    hll_registers BLOB,
+    hist_buckets BIGINT[],
+    hist_counts BIGINT[],
+    updated_at TIMESTAMP"""
+
+PARTITION_PROFILES_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS profile.partition_profiles (
+    dataset VARCHAR,
     city_id VARCHAR,
-    city_name VARCHAR,
-    latitude DOUBLE,
-    longitude DOUBLE,
-    timezone VARCHAR,
-    ingestion_timestamp TIMESTAMP,
-    batch_id VARCHAR
+    year INTEGER,
+    month INTEGER,{SKETCH_COLUMNS}
+);
+"""
+
+BATCH_PROFILES_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS profile.batch_profiles (
+    dataset VARCHAR,
+    batch_id VARCHAR,
+    city_id VARCHAR,{SKETCH_COLUMNS}
+);
+"""
+
+PROFILED_FILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile._profiled_files (
+    path VARCHAR,
+    dataset VARCHAR,
+    size_bytes BIGINT,
+    mtime TIMESTAMP,
+    profiled_at TIMESTAMP
+);
+"""
+
+DRIFT_SCORES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile.drift_scores (
+    dataset VARCHAR,
+    batch_id VARCHAR,
+    city_id VARCHAR,
+    column_name VARCHAR,
+    reference_batches INTEGER,
+    batch_count BIGINT,
+    reference_count BIGINT,
+    psi DOUBLE,
+    ks DOUBLE,
+    ks_critical DOUBLE,
+    null_rate_delta DOUBLE,
+    is_drift BOOLEAN,
+    computed_at TIMESTAMP
+);
+"""
+
+DQ_RESULTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile.dq_results (
+    run_id VARCHAR,
+    run_at TIMESTAMP,
+    table_name VARCHAR,
+    rule_name VARCHAR,
+    rule_type VARCHAR,
+    columns VARCHAR[],
+    severity VARCHAR,
+    batch_ids VARCHAR[],
+    rows_checked BIGINT,
+    failed_count BIGINT,
+    passed_count BIGINT,
+    status VARCHAR,
+    sample_rows VARCHAR[]
 );
 """
 
@@ -2,9 +2,23 @@
 """DuckDB database initialization script."""
 
 import os
+import argparse
 import duckdb
 import logging
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Dict, List
+
+import project_paths  # noqa: F401  (puts ingestion/ on sys.path)
+from schemas import RAW_TABLES, RAW_KEY_COLUMNS, RAW_VERSION_ORDER, LOADED_FILES_SCHEMA
+from running_stats import moments_select, rebuild_moments, merge_moments
+from anomaly_engine import build_anomaly_scores
+from profiler import profile_raw_files
+from drift import DRIFT_DATASETS, detect_drift
+from dq_engine import run_quality_checks
+from storage import open_storage
+from config import METRICS_PROMETHEUS_PATH
+from metrics import export_metrics, instrumented, stage
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,6 +29,20 @@ logger = logging.getLogger(__name__)
 PROJECT_ROOT = Path(__file__).parent.parent
 DB_PATH = PROJECT_ROOT / "duckdb" / "weather.db"
 RAW_DATA_PATH = PROJECT_ROOT / "data" / "raw"
+# An s3://bucket/prefix here (or --raw-uri) reads raw Parquet in place instead of RAW_DATA_PATH
+RAW_DATA_URI = os.environ.get("RAW_DATA_URI")
+
+# Per-city running moments of staging metrics, used as anomaly baselines
+CITY_MOMENTS_TABLE = "mart.city_moments"
+CITY_MOMENTS_KEYS = [("city_id", "VARCHAR")]
+CITY_MOMENT_METRICS = ["temperature_2m", "precipitation"]
+
+# Replaced raw rows are kept this long; incremental dbt builds of city_moments
+# must run at least this often (or with --full-refresh)
+REPLACED_ROWS_RETENTION_DAYS = 30
+
+# Mart tables an incremental build updates in place; if any is missing, rebuild everything
+DERIVED_MART_TABLES = ["weather_daily", "weather_anomalies", "city_moments", "weather_anomaly_scores", "seasonal_moments"]
 
 
 def ensure_directories():
@@ -35,167 +63,387 @@ def create_database():
 def create_schemas(conn):
     """Create database schemas."""
     logger.info("Creating schemas...")
-    schemas = ["raw", "staging", "mart"]
+    schemas = ["raw", "staging", "mart", "profile"]
     
     for schema in schemas:
         conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
         logger.info(f"Created schema: {schema}")
 
 
-def create_raw_tables(conn):
-    """Create raw.weather_hourly and raw.weather_daily tables from Parquet files."""
-    logger.info("Creating raw weather tables...")
+def raw_storage():
+    """Storage of the raw dataset: RAW_DATA_URI if set, else RAW_DATA_PATH (see storage.py)."""
+    return open_storage(RAW_DATA_URI or RAW_DATA_PATH)
+
+
+def list_raw_files(dataset: str, storage=None) -> List[Dict]:
+    """Stat every Parquet file of a partitioned dataset."""
+    return (storage or raw_storage()).list_files(dataset)
+
+
+def find_unloaded_files(conn, dataset: str, files: List[Dict]) -> List[Dict]:
+    """Files that are not in raw._loaded_files or changed since they were loaded."""
+    loaded = {
+        path: (size_bytes, mtime)
+        for path, size_bytes, mtime in conn.execute(
+            "SELECT path, size_bytes, mtime FROM raw._loaded_files WHERE dataset = ?", [dataset]
+        ).fetchall()
+    }
+    return [f for f in files if loaded.get(f["path"]) != (f["size_bytes"], f["mtime"])]
+
+
+def load_raw_dataset(conn, dataset: str, full_refresh: bool = True, storage=None) -> List[str]:
+    """Merge unseen files of a dataset into its raw table and return the loaded batch_ids.
+    
+    Rows are keyed on (city_id, time). The first row in RAW_VERSION_ORDER
+    (latest ingestion_timestamp, then highest batch_id) wins, both among the
+    new files and against rows that are already loaded. Replaced rows are
+    copied to the dataset's replaced-rows table first. The table, the
+    replaced rows and the raw._loaded_files ledger are updated in one
+    transaction.
+    """
+    raw_table = RAW_TABLES[dataset]
+    table = raw_table["table"]
+    columns = ", ".join(raw_table["columns"])
+    key_match = " AND ".join(f"t.{key} = n.{key}" for key in RAW_KEY_COLUMNS)
+    replaced_match = f"{key_match} AND (t.ingestion_timestamp, t.batch_id) <= (n.ingestion_timestamp, n.batch_id)"
+    files = list_raw_files(dataset, storage)
+    
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        if full_refresh:
+            conn.execute(raw_table["ddl"])
+            conn.execute("DELETE FROM raw._loaded_files WHERE dataset = ?", [dataset])
+        else:
+            conn.execute(raw_table["ddl_if_missing"])
+        conn.execute(raw_table["replaced_ddl"])
+        conn.execute(
+            f"DELETE FROM {raw_table['replaced_table']} WHERE replaced_at < ?",
+            [datetime.now() - timedelta(days=REPLACED_ROWS_RETENTION_DAYS)]
+        )
+            
+        # Files removed since the last load (e.g. merged by compaction) leave the ledger
+        conn.execute(
+            "DELETE FROM raw._loaded_files WHERE dataset = ? AND NOT list_contains(?, path)",
+            [dataset, [f["path"] for f in files]]
+        )
+        
+        new_files = find_unloaded_files(conn, dataset, files)
+        if not new_files:
+            conn.execute("COMMIT")
+            logger.info(f"No new {dataset} files to load into {table}")
+            return []
+            
+        logger.info(f"Loading {len(new_files)} new {dataset} file(s) into {table}")
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE _new_rows AS
+            SELECT {columns}, filename
+            FROM read_parquet(?, hive_partitioning = true, union_by_name = true, filename = true)
+        """, [[f["path"] for f in new_files]])
+        
+        file_stats = {
+            filename: (row_count, batch_ids)
+            for filename, row_count, batch_ids in conn.execute("""
+                SELECT filename, COUNT(*), STRING_AGG(DISTINCT batch_id, ',')
+                FROM _new_rows
+                GROUP BY filename
+            """).fetchall()
+        }
+        
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE _dedup_rows AS
+            SELECT {columns}
+            FROM _new_rows
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY {", ".join(RAW_KEY_COLUMNS)}
+                ORDER BY {RAW_VERSION_ORDER}
+            ) = 1
+        """)
+        loaded_at = datetime.now()
+        conn.execute(f"""
+            INSERT INTO {raw_table['replaced_table']}
+            SELECT t.*, ? FROM {table} t
+            JOIN _dedup_rows n ON {replaced_match}
+        """, [loaded_at])
+        replaced_count = conn.execute(f"""
+            DELETE FROM {table} t
+            USING _dedup_rows n
+            WHERE {replaced_match}
+        """).fetchone()[0]
+        inserted_count = conn.execute(f"""
+            INSERT INTO {table}
+            SELECT n.* FROM _dedup_rows n
+            ANTI JOIN {table} t ON {key_match}
+        """).fetchone()[0]
+        
+        conn.execute("DELETE FROM raw._loaded_files WHERE list_contains(?, path)", [[f["path"] for f in new_files]])
+        conn.executemany(
+            "INSERT INTO raw._loaded_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                [f["path"], dataset, f["size_bytes"], f["mtime"], *file_stats.get(f["path"], (0, None)), loaded_at]
+                for f in new_files
+            ]
+        )
+        
+        scanned_count = conn.execute("SELECT COUNT(*) FROM _new_rows").fetchone()[0]
+        batch_ids = [row[0] for row in conn.execute("SELECT DISTINCT batch_id FROM _dedup_rows ORDER BY 1").fetchall()]
+        conn.execute("DROP TABLE _new_rows")
+        conn.execute("DROP TABLE _dedup_rows")
+        conn.execute("COMMIT")
+        
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+        
+    total_count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    logger.info(f"Inserted {inserted_count:,} rows into {table} ({replaced_count:,} replaced older versions)")
+    if scanned_count > inserted_count:
+        logger.info(f"Dropped {scanned_count - inserted_count:,} duplicate (city_id, time) rows from {dataset} files")
+    logger.info(f"{table} now holds {total_count:,} rows")
+    
+    return batch_ids
+
+
+def create_raw_tables(conn, full_refresh: bool = True, storage=None) -> Dict[str, List[str]]:
+    """Load raw.weather_hourly and raw.weather_daily from Parquet files.
     
-    hourly_files = list(RAW_DATA_PATH.glob("*_hourly_*.parquet"))
-    daily_files = list(RAW_DATA_PATH.glob("*_daily_*.parquet"))
+    With full_refresh=False only files missing from raw._loaded_files are
+    read. Returns the newly loaded batch_ids per dataset.
+    """
+    storage = storage or raw_storage()
+    logger.info(f"Loading raw weather tables from {storage.uri} ({'full refresh' if full_refresh else 'incremental'})...")
+    conn.execute(LOADED_FILES_SCHEMA)
+    storage.attach(conn)
+    
+    hourly_files = storage.list_files("hourly")
+    daily_files = storage.list_files("daily")
+    
+    legacy_files = storage.legacy_files()
+    if legacy_files:
+        logger.warning(f"Ignoring {len(legacy_files)} flat Parquet file(s) outside the partitioned layout")
+        logger.info("Migrate them first: python ingestion/raw_layout.py --migrate")
     
     if not hourly_files:
-        logger.warning("No hourly Parquet files found in data/raw/")
+        logger.warning(f"No hourly Parquet files found in {storage.uri}/dataset=hourly/")
         logger.info("Run ingestion first: python ingestion/weather_ingest.py")
-        return
+        return {}
     
     logger.info(f"Found {len(hourly_files)} hourly Parquet file(s)")
     logger.info(f"Found {len(daily_files)} daily Parquet file(s)")
     
-    conn.execute(f"""
-        CREATE OR REPLACE TABLE raw.weather_hourly AS
-        SELECT * FROM read_parquet('{RAW_DATA_PATH}/*_hourly_*.parquet')
-    """)
-    
-    hourly_result = conn.execute("SELECT COUNT(*) FROM raw.weather_hourly").fetchone()
-    hourly_count = hourly_result[0]
-    
-    logger.info(f"Loaded {hourly_count:,} rows into raw.weather_hourly")
+    loaded = {"hourly": load_raw_dataset(conn, "hourly", full_refresh, storage)}
     
     if daily_files:
-        conn.execute(f"""
-            CREATE OR REPLACE TABLE raw.weather_daily AS
-            SELECT * FROM read_parquet('{RAW_DATA_PATH}/*_daily_*.parquet')
-        """)
+        loaded["daily"] = load_raw_dataset(conn, "daily", full_refresh, storage)
         
-        daily_result = conn.execute("SELECT COUNT(*) FROM raw.weather_daily").fetchone()
-        daily_count = daily_result[0]
+    return loaded
+
+
+STAGING_HOURLY_SELECT = """
+    SELECT
+        time,
+        CAST(time AS DATE) AS date,
+        EXTRACT(year FROM time) AS year,
+        EXTRACT(month FROM time) AS month,
+        EXTRACT(day FROM time) AS day,
+        EXTRACT(hour FROM time) AS hour,
+        EXTRACT(dow FROM time) AS day_of_week,
+        EXTRACT(quarter FROM time) AS quarter,
+        
+        COALESCE(temperature_2m, 0.0) AS temperature_2m,
+        COALESCE(relative_humidity_2m, 0) AS relative_humidity_2m,
+        COALESCE(precipitation, 0.0) AS precipitation,
+        COALESCE(wind_speed_10m, 0.0) AS wind_speed_10m,
+        COALESCE(cloud_cover, 0) AS cloud_cover,
+        COALESCE(pressure_msl, 1013.25) AS pressure_msl,
         
-        logger.info(f"Loaded {daily_count:,} rows into raw.weather_daily")
+        city_id,
+        city_name,
+        latitude,
+        longitude,
+        timezone,
+        
+        ingestion_timestamp,
+        batch_id,
+        
+        CASE WHEN temperature_2m IS NULL THEN 1 ELSE 0 END AS has_missing_temp,
+        CASE WHEN precipitation IS NULL THEN 1 ELSE 0 END AS has_missing_precip
+    FROM raw.weather_hourly r
+    {source_filter}
+"""
 
+MART_DAILY_SELECT = """
+    SELECT
+        city_id,
+        city_name,
+        date,
+        
+        MIN(temperature_2m) AS temp_min,
+        MAX(temperature_2m) AS temp_max,
+        AVG(temperature_2m) AS temp_avg,
+        STDDEV(temperature_2m) AS temp_stddev,
+        
+        SUM(precipitation) AS precip_total,
+        MAX(precipitation) AS precip_max,
+        COUNT(CASE WHEN precipitation > 0 THEN 1 END) AS hours_with_rain,
+        
+        AVG(wind_speed_10m) AS wind_avg,
+        MAX(wind_speed_10m) AS wind_max,
+        
+        AVG(relative_humidity_2m) AS humidity_avg,
+        AVG(pressure_msl) AS pressure_avg,
+        AVG(cloud_cover) AS cloud_cover_avg,
+        
+        COUNT(*) AS total_hours,
+        SUM(has_missing_temp) AS missing_temp_count,
+        
+        MAX(ingestion_timestamp) AS last_updated
+    FROM staging.weather_hourly s
+    {source_filter}
+    GROUP BY city_id, city_name, date
+"""
 
-def create_staging_table(conn):
-    """Create staging.weather_hourly table with transformations."""
-    logger.info("Creating staging.weather_hourly table...")
-    
-    conn.execute("""
-        CREATE OR REPLACE TABLE staging.weather_hourly AS
+MART_ANOMALIES_SELECT = """
+    WITH stats AS (
         SELECT
-            time,
-            CAST(time AS DATE) AS date,
-            EXTRACT(year FROM time) AS year,
-            EXTRACT(month FROM time) AS month,
-            EXTRACT(day FROM time) AS day,
-            EXTRACT(hour FROM time) AS hour,
-            EXTRACT(dow FROM time) AS day_of_week,
-            EXTRACT(quarter FROM time) AS quarter,
-            
-            COALESCE(temperature_2m, 0.0) AS temperature_2m,
-            COALESCE(relative_humidity_2m, 0) AS relative_humidity_2m,
-            COALESCE(precipitation, 0.0) AS precipitation,
-            COALESCE(wind_speed_10m, 0.0) AS wind_speed_10m,
-            COALESCE(cloud_cover, 0) AS cloud_cover,
-            COALESCE(pressure_msl, 1013.25) AS pressure_msl,
-            
             city_id,
-            city_name,
-            latitude,
-            longitude,
-            timezone,
-            
-            ingestion_timestamp,
-            batch_id,
-            
-            CASE WHEN temperature_2m IS NULL THEN 1 ELSE 0 END AS has_missing_temp,
-            CASE WHEN precipitation IS NULL THEN 1 ELSE 0 END AS has_missing_precip
+            mean AS avg_temp,
+            CASE WHEN n > 1 THEN SQRT(m2 / (n - 1)) END AS stddev_temp
+        FROM mart.city_moments
+        WHERE metric = 'temperature_2m'
+    )
+    SELECT
+        w.time,
+        w.city_id,
+        w.city_name,
+        w.temperature_2m,
+        w.precipitation,
+        
+        (w.temperature_2m - s.avg_temp) / NULLIF(s.stddev_temp, 0) AS temp_zscore,
+        
+        CASE 
+            WHEN ABS((w.temperature_2m - s.avg_temp) / NULLIF(s.stddev_temp, 0)) > 3 THEN TRUE
+            ELSE FALSE
+        END AS is_temp_anomaly
+        
+    FROM staging.weather_hourly w
+    JOIN stats s ON w.city_id = s.city_id
+    {source_filter}
+    WHERE s.stddev_temp IS NOT NULL
+"""
+
+
+def table_exists(conn, schema: str, table: str) -> bool:
+    """Check whether a table exists in the database."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE schema_name = ? AND table_name = ?",
+        [schema, table]
+    ).fetchone()[0] > 0
+
+
+def mark_touched_days(conn, batch_ids: List[str]) -> int:
+    """Collect the (city_id, date) keys covered by newly loaded batches into _touched_days."""
+    conn.execute("""
+        CREATE OR REPLACE TEMP TABLE _touched_days AS
+        SELECT DISTINCT city_id, CAST(time AS DATE) AS date
         FROM raw.weather_hourly
-    """)
+        WHERE list_contains(?, batch_id)
+    """, [batch_ids])
     
-    result = conn.execute("SELECT COUNT(*) FROM staging.weather_hourly").fetchone()
-    logger.info(f"Created staging.weather_hourly with {result[0]:,} rows")
+    touched_count = conn.execute("SELECT COUNT(*) FROM _touched_days").fetchone()[0]
+    logger.info(f"{len(batch_ids)} new batch(es) touch {touched_count:,} city-day(s)")
+    return touched_count
+
+
+def touched_filter(alias: str, date_expr: str) -> str:
+    """Join clause restricting a query to the keys in _touched_days."""
+    return f"SEMI JOIN _touched_days k ON k.city_id = {alias}.city_id AND k.date = {date_expr}"
+
+
+def refresh_touched_rows(conn, table: str, select_sql: str, alias: str, date_column: str):
+    """Delete and re-insert the rows of a derived table that belong to touched days."""
+    deleted = conn.execute(f"""
+        DELETE FROM {table} d
+        USING _touched_days k
+        WHERE k.city_id = d.city_id AND k.date = CAST(d.{date_column} AS DATE)
+    """).fetchone()[0]
+    inserted = conn.execute(
+        f"INSERT INTO {table} " + select_sql.format(source_filter=touched_filter(alias, f"CAST({alias}.{date_column} AS DATE)"))
+    ).fetchone()[0]
+    logger.info(f"Refreshed {table}: {deleted:,} rows removed, {inserted:,} rows inserted")
+
 
+def touched_staging_moments(conn, table: str):
+    """Snapshot the city moments of the staging rows on touched days into a temp table."""
+    source = "SELECT * FROM staging.weather_hourly s " + touched_filter("s", "s.date")
+    keys = [name for name, _ in CITY_MOMENTS_KEYS]
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE {table} AS " + moments_select(source, keys, CITY_MOMENT_METRICS))
 
-def create_mart_tables(conn):
-    """Create mart layer tables."""
-    logger.info("Creating mart tables...")
+
+def create_staging_table(conn, incremental: bool = False):
+    """Create staging.weather_hourly table with transformations.
     
-    conn.execute("""
-        CREATE OR REPLACE TABLE mart.weather_daily AS
-        SELECT
-            city_id,
-            city_name,
-            date,
-            
-            MIN(temperature_2m) AS temp_min,
-            MAX(temperature_2m) AS temp_max,
-            AVG(temperature_2m) AS temp_avg,
-            STDDEV(temperature_2m) AS temp_stddev,
-            
-            SUM(precipitation) AS precip_total,
-            MAX(precipitation) AS precip_max,
-            COUNT(CASE WHEN precipitation > 0 THEN 1 END) AS hours_with_rain,
-            
-            AVG(wind_speed_10m) AS wind_avg,
-            MAX(wind_speed_10m) AS wind_max,
-            
-            AVG(relative_humidity_2m) AS humidity_avg,
-            AVG(pressure_msl) AS pressure_avg,
-            AVG(cloud_cover) AS cloud_cover_avg,
-            
-            COUNT(*) AS total_hours,
-            SUM(has_missing_temp) AS missing_temp_count,
-            
-            MAX(ingestion_timestamp) AS last_updated
-        FROM staging.weather_hourly
-        GROUP BY city_id, city_name, date
-        ORDER BY date, city_id
-    """)
+    mart.city_moments is kept in step with the table. With incremental=True
+    only the days listed in _touched_days are rebuilt, and the moments of the
+    replaced rows are merged out and those of the new rows merged in, so the
+    per-city statistics cost O(new rows) instead of a full scan.
+    """
+    if incremental:
+        logger.info("Updating staging.weather_hourly for touched days...")
+        keys = [name for name, _ in CITY_MOMENTS_KEYS]
+        touched_staging_moments(conn, "_removed_moments")
+        refresh_touched_rows(conn, "staging.weather_hourly", STAGING_HOURLY_SELECT, "r", "time")
+        touched_staging_moments(conn, "_added_moments")
+        merge_moments(conn, CITY_MOMENTS_TABLE, "SELECT * FROM _removed_moments", keys, remove=True)
+        merge_moments(conn, CITY_MOMENTS_TABLE, "SELECT * FROM _added_moments", keys)
+        conn.execute("DROP TABLE _removed_moments")
+        conn.execute("DROP TABLE _added_moments")
+    else:
+        logger.info("Creating staging.weather_hourly table...")
+        conn.execute(
+            "CREATE OR REPLACE TABLE staging.weather_hourly AS " + STAGING_HOURLY_SELECT.format(source_filter="")
+        )
+        keys = [name for name, _ in CITY_MOMENTS_KEYS]
+        rebuild_moments(
+            conn, CITY_MOMENTS_TABLE,
+            moments_select("SELECT * FROM staging.weather_hourly", keys, CITY_MOMENT_METRICS),
+            CITY_MOMENTS_KEYS
+        )
     
-    result = conn.execute("SELECT COUNT(*) FROM mart.weather_daily").fetchone()
-    logger.info(f"Created mart.weather_daily with {result[0]:,} rows")
+    result = conn.execute("SELECT COUNT(*) FROM staging.weather_hourly").fetchone()
+    logger.info(f"staging.weather_hourly has {result[0]:,} rows")
+
+
+def create_mart_tables(conn, incremental: bool = False):
+    """Create mart layer tables.
     
-    conn.execute("""
-        CREATE OR REPLACE TABLE mart.weather_anomalies AS
-        WITH stats AS (
-            SELECT
-                city_id,
-                AVG(temperature_2m) AS avg_temp,
-                STDDEV(temperature_2m) AS stddev_temp
-            FROM staging.weather_hourly
-            GROUP BY city_id
+    With incremental=True only the days listed in _touched_days are recomputed.
+    """
+    if incremental:
+        logger.info("Updating mart tables for touched days...")
+        refresh_touched_rows(conn, "mart.weather_daily", MART_DAILY_SELECT, "s", "date")
+        refresh_touched_rows(conn, "mart.weather_anomalies", MART_ANOMALIES_SELECT, "w", "time")
+    else:
+        logger.info("Creating mart tables...")
+        conn.execute(
+            "CREATE OR REPLACE TABLE mart.weather_daily AS "
+            + MART_DAILY_SELECT.format(source_filter="") + " ORDER BY date, city_id"
         )
-        SELECT
-            w.time,
-            w.city_id,
-            w.city_name,
-            w.temperature_2m,
-            w.precipitation,
-            
-            (w.temperature_2m - s.avg_temp) / NULLIF(s.stddev_temp, 0) AS temp_zscore,
-            
-            CASE 
-                WHEN ABS((w.temperature_2m - s.avg_temp) / NULLIF(s.stddev_temp, 0)) > 3 THEN TRUE
-                ELSE FALSE
-            END AS is_temp_anomaly
-            
-        FROM staging.weather_hourly w
-        JOIN stats s ON w.city_id = s.city_id
-        WHERE s.stddev_temp IS NOT NULL
-        ORDER BY w.time
-    """)
+        conn.execute(
+            "CREATE OR REPLACE TABLE mart.weather_anomalies AS "
+            + MART_ANOMALIES_SELECT.format(source_filter="") + " ORDER BY w.time"
+        )
+    
+    result = conn.execute("SELECT COUNT(*) FROM mart.weather_daily").fetchone()
+    logger.info(f"mart.weather_daily has {result[0]:,} rows")
     
     result = conn.execute("SELECT COUNT(*) FROM mart.weather_anomalies").fetchone()
     anomaly_count = conn.execute("SELECT COUNT(*) FROM mart.weather_anomalies WHERE is_temp_anomaly = TRUE").fetchone()
     
-    logger.info(f"Created mart.weather_anomalies with {result[0]:,} rows")
+    logger.info(f"mart.weather_anomalies has {result[0]:,} rows")
     logger.info(f"Found {anomaly_count[0]} temperature anomalies")
 
 
+@instrumented("health_checks")
 def run_health_checks(conn):
     """Run database health checks."""
     logger.info("Running health checks...")
@@ -226,8 +474,81 @@ def run_health_checks(conn):
     logger.info("\nAll health checks passed")
 
 
-def main():
+def refresh_database(conn, full_refresh: bool = True, storage=None) -> Dict[str, List[str]]:
+    """Load raw files and rebuild (or incrementally update) everything derived from them.
+    
+    Runs on an open connection so callers such as sync_and_refresh.py can
+    reuse it. Returns the newly loaded batch_ids per dataset.
+    """
+    storage = storage or raw_storage()
+    create_schemas(conn)
+    with stage("raw_load") as raw_load:
+        load_started = datetime.now()
+        loaded = create_raw_tables(conn, full_refresh, storage)
+        raw_load["rows"], raw_load["bytes"] = conn.execute(
+            "SELECT COALESCE(SUM(row_count), 0), COALESCE(SUM(size_bytes), 0) FROM raw._loaded_files WHERE loaded_at >= ?",
+            [load_started]
+        ).fetchone()
+    with stage("profile"):
+        profile_raw_files(conn, storage, full_refresh)
+    with stage("drift"):
+        for dataset in DRIFT_DATASETS:
+            detect_drift(conn, dataset)
+    new_batches = loaded.get("hourly", [])
+    
+    rebuild = full_refresh or not all(table_exists(conn, "mart", table) for table in DERIVED_MART_TABLES)
+    if rebuild or new_batches:
+        incremental = not rebuild
+        if incremental:
+            mark_touched_days(conn, new_batches)
+        with stage("staging") as staging:
+            create_staging_table(conn, incremental=incremental)
+            staging["rows"] = conn.execute("SELECT COUNT(*) FROM staging.weather_hourly").fetchone()[0]
+        with stage("mart") as mart:
+            create_mart_tables(conn, incremental=incremental)
+            build_anomaly_scores(conn, incremental=incremental)
+            mart["rows"] = conn.execute("SELECT COUNT(*) FROM mart.weather_daily").fetchone()[0]
+        with stage("quality_checks"):
+            run_quality_checks(conn, batch_ids=sorted(set(new_batches + loaded.get("daily", []))) if incremental else None)
+    else:
+        logger.info("No new raw data; staging and mart tables are up to date")
+        
+    run_health_checks(conn)
+    return loaded
+
+
+def main(argv=None):
     """Main execution."""
+    parser = argparse.ArgumentParser(description="Build the DuckDB weather database from raw Parquet files")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only load Parquet files missing from raw._loaded_files"
+    )
+    mode.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Rebuild the raw tables from every Parquet file (default)"
+    )
+    parser.add_argument(
+        "--raw-uri",
+        default=RAW_DATA_URI,
+        help="Read raw Parquet from this directory or s3://bucket/prefix instead of data/raw"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Read s3:// raw data through httpfs without the local block cache"
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        default=METRICS_PROMETHEUS_PATH,
+        help="Also write per-stage metrics to this Prometheus text file (they always go to the metrics table)"
+    )
+    args = parser.parse_args(argv)
+    full_refresh = not args.incremental
+    
     logger.info("=" * 70)
     logger.info("DUCKDB DATABASE SETUP")
     logger.info("=" * 70)
@@ -235,11 +556,8 @@ def main():
     try:
         ensure_directories()
         conn = create_database()
-        create_schemas(conn)
-        create_raw_tables(conn)
-        create_staging_table(conn)
-        create_mart_tables(conn)
-        run_health_checks(conn)
+        refresh_database(conn, full_refresh, open_storage(args.raw_uri or RAW_DATA_PATH, cache=not args.no_cache))
+        export_metrics(prometheus_path=args.metrics_prometheus, conn=conn)
         conn.close()
         
         logger.info("=" * 70)
@@ -0,0 +1,312 @@
+"""Mergeable column sketches for data profiling.
+
+Every sketch can be built from a NumPy array and merged with another sketch
+of the same kind. A profile of new rows can therefore be folded into a stored
+profile without rereading the rows behind it.
+
+- ``TDigest``: merging t-digest (k1 scale) for approximate quantiles
+- ``HyperLogLog``: distinct-count estimate, merged by register-wise max
+- ``LogHistogram``: sparse histogram with log-spaced buckets, merged by summing counts
+- ``ColumnProfile``: null rate, min/max, mean/variance (Chan's merge) plus the sketches above
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+TDIGEST_COMPRESSION = 200
+HLL_PRECISION = 12
+HISTOGRAM_GAMMA = 1.01
+HISTOGRAM_MIN_VALUE = 1e-6
+
+
+class TDigest:
+    """Merging t-digest holding sorted (mean, weight) centroids."""
+
+    def __init__(self, means=None, weights=None, compression: int = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.asarray(means if means is not None else [], dtype=np.float64)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=np.float64)
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, compression: int = TDIGEST_COMPRESSION) -> "TDigest":
+        """Digest of raw values."""
+        digest = cls(compression=compression)
+        digest.means, digest.weights = digest._compress(values, np.ones(len(values)))
+        return digest
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Digest covering the values of both digests."""
+        merged = TDigest(compression=self.compression)
+        merged.means, merged.weights = self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights])
+        )
+        return merged
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        """Group sorted centroids so each cluster spans at most one unit of the k1 scale."""
+        if len(means) == 0:
+            return means.astype(np.float64), weights.astype(np.float64)
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        clusters = np.floor(k - k[0]).astype(np.int64)
+
+        cluster_weights = np.bincount(clusters, weights=weights)
+        cluster_sums = np.bincount(clusters, weights=means * weights)
+        keep = cluster_weights > 0
+        return cluster_sums[keep] / cluster_weights[keep], cluster_weights[keep]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q (0..1)."""
+        if len(self.means) == 0:
+            return None
+        positions = (np.cumsum(self.weights) - self.weights / 2) / self.weights.sum()
+        return float(np.interp(q, positions, self.means))
+
+    def cdf(self, x) -> np.ndarray:
+        """Approximate fraction of values <= x, vectorized over x."""
+        x = np.asarray(x, dtype=np.float64)
+        if len(self.means) == 0:
+            return np.full(x.shape, np.nan)
+        positions = (np.cumsum(self.weights) - self.weights / 2) / self.weights.sum()
+        return np.interp(x, self.means, positions, left=0.0, right=1.0)
+
+
+def _splitmix64(values: np.ndarray) -> np.ndarray:
+    """Vectorized 64-bit mix of the bit patterns of float64 values."""
+    x = (values + 0.0).astype(np.float64).view(np.uint64)
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length for uint64 arrays."""
+    x = values.copy()
+    length = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (np.uint64(1) << np.uint64(shift))
+        length[high] += shift
+        x[high] >>= np.uint64(shift)
+    return length + (x > 0)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2**precision one-byte registers."""
+
+    def __init__(self, registers: Optional[bytes] = None, precision: int = HLL_PRECISION):
+        self.precision = precision
+        if registers is None:
+            self.registers = np.zeros(1 << precision, dtype=np.uint8)
+        else:
+            self.registers = np.frombuffer(registers, dtype=np.uint8).copy()
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, precision: int = HLL_PRECISION) -> "HyperLogLog":
+        """Sketch of raw values."""
+        sketch = cls(precision=precision)
+        if len(values) == 0:
+            return sketch
+        hashes = _splitmix64(values)
+        suffix_bits = 64 - precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        rank = (suffix_bits - _bit_length(suffix) + 1).astype(np.uint8)
+        np.maximum.at(sketch.registers, index, rank)
+        return sketch
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Sketch covering the values of both sketches."""
+        merged = HyperLogLog(precision=self.precision)
+        merged.registers = np.maximum(self.registers, other.registers)
+        return merged
+
+    def estimate(self) -> float:
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return float(m * np.log(m / zeros))
+        return float(raw)
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+
+class LogHistogram:
+    """Sparse histogram whose bucket bounds grow by a factor gamma, mirrored for negatives.
+
+    Bucket 0 holds values with |x| < HISTOGRAM_MIN_VALUE; bucket k > 0 holds
+    positive values in [MIN * gamma**(k-1), MIN * gamma**k), and -k the
+    matching negative values. Buckets need no fitted range, so any two
+    histograms merge exactly.
+    """
+
+    def __init__(self, buckets=None, counts=None):
+        self.buckets = np.asarray(buckets if buckets is not None else [], dtype=np.int64)
+        self.counts = np.asarray(counts if counts is not None else [], dtype=np.int64)
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "LogHistogram":
+        """Histogram of raw values."""
+        magnitude = np.abs(values)
+        buckets = np.zeros(len(values), dtype=np.int64)
+        large = magnitude >= HISTOGRAM_MIN_VALUE
+        buckets[large] = (
+            np.floor(np.log(magnitude[large] / HISTOGRAM_MIN_VALUE) / np.log(HISTOGRAM_GAMMA)).astype(np.int64) + 1
+        ) * np.sign(values[large]).astype(np.int64)
+        keys, counts = np.unique(buckets, return_counts=True)
+        return cls(keys, counts)
+
+    def merge(self, other: "LogHistogram") -> "LogHistogram":
+        """Histogram covering the values of both histograms."""
+        keys, inverse = np.unique(np.concatenate([self.buckets, other.buckets]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([self.counts, other.counts]))
+        return LogHistogram(keys, counts.astype(np.int64))
+
+    @staticmethod
+    def bucket_bounds(bucket: int):
+        """(lower, upper) value bounds of a bucket."""
+        if bucket == 0:
+            return -HISTOGRAM_MIN_VALUE, HISTOGRAM_MIN_VALUE
+        low = HISTOGRAM_MIN_VALUE * HISTOGRAM_GAMMA ** (abs(bucket) - 1)
+        high = HISTOGRAM_MIN_VALUE * HISTOGRAM_GAMMA ** abs(bucket)
+        return (low, high) if bucket > 0 else (-high, -low)
+
+
+class ColumnProfile:
+    """Mergeable profile of one numeric column."""
+
+    def __init__(
+        self,
+        row_count: int = 0,
+        null_count: int = 0,
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+        n: int = 0,
+        mean: float = 0.0,
+        m2: float = 0.0,
+        tdigest: Optional[TDigest] = None,
+        hll: Optional[HyperLogLog] = None,
+        histogram: Optional[LogHistogram] = None
+    ):
+        self.row_count = row_count
+        self.null_count = null_count
+        self.min_value = min_value
+        self.max_value = max_value
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.tdigest = tdigest or TDigest()
+        self.hll = hll or HyperLogLog()
+        self.histogram = histogram or LogHistogram()
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "ColumnProfile":
+        """Profile of a float64 array in which NaN marks a null."""
+        present = values[~np.isnan(values)]
+        n = len(present)
+        return cls(
+            row_count=len(values),
+            null_count=len(values) - n,
+            min_value=float(present.min()) if n else None,
+            max_value=float(present.max()) if n else None,
+            n=n,
+            mean=float(present.mean()) if n else 0.0,
+            m2=float(np.sum((present - present.mean()) ** 2)) if n else 0.0,
+            tdigest=TDigest.from_values(present),
+            hll=HyperLogLog.from_values(present),
+            histogram=LogHistogram.from_values(present)
+        )
+
+    def merge(self, other: "ColumnProfile") -> "ColumnProfile":
+        """Profile covering the rows of both profiles."""
+        n = self.n + other.n
+        if n:
+            delta = other.mean - self.mean
+            mean = self.mean + delta * other.n / n
+            m2 = self.m2 + other.m2 + delta * delta * self.n * other.n / n
+        else:
+            mean, m2 = 0.0, 0.0
+        mins = [v for v in (self.min_value, other.min_value) if v is not None]
+        maxs = [v for v in (self.max_value, other.max_value) if v is not None]
+        return ColumnProfile(
+            row_count=self.row_count + other.row_count,
+            null_count=self.null_count + other.null_count,
+            min_value=min(mins) if mins else None,
+            max_value=max(maxs) if maxs else None,
+            n=n,
+            mean=mean,
+            m2=m2,
+            tdigest=self.tdigest.merge(other.tdigest),
+            hll=self.hll.merge(other.hll),
+            histogram=self.histogram.merge(other.histogram)
+        )
+
+    @property
+    def null_rate(self) -> Optional[float]:
+        return self.null_count / self.row_count if self.row_count else None
+
+    @property
+    def variance(self) -> Optional[float]:
+        return self.m2 / (self.n - 1) if self.n > 1 else None
+
+    def summary(self, quantiles: List[float] = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)) -> Dict:
+        """Plain-number view of the profile."""
+        summary = {
+            "row_count": self.row_count,
+            "null_rate": self.null_rate,
+            "min": self.min_value,
+            "max": self.max_value,
+            "mean": self.mean if self.n else None,
+            "stddev": float(np.sqrt(self.variance)) if self.variance is not None else None,
+            "distinct": round(self.hll.estimate()),
+        }
+        for q in quantiles:
+            summary[f"p{round(q * 100):02d}"] = self.tdigest.quantile(q)
+        return summary
+
+    def to_record(self) -> Dict:
+        """Column values for a profile table row."""
+        return {
+            "row_count": self.row_count,
+            "null_count": self.null_count,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "n": self.n,
+            "mean": self.mean,
+            "m2": self.m2,
+            "tdigest_means": self.tdigest.means.tolist(),
+            "tdigest_weights": self.tdigest.weights.tolist(),
+            "hll_registers": self.hll.to_bytes(),
+            "hist_buckets": self.histogram.buckets.tolist(),
+            "hist_counts": self.histogram.counts.tolist(),
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict) -> "ColumnProfile":
+        """Profile from a profile table row."""
+        return cls(
+            row_count=record["row_count"],
+            null_count=record["null_count"],
+            min_value=record["min_value"],
+            max_value=record["max_value"],
+            n=record["n"],
+            mean=record["mean"],
+            m2=record["m2"],
+            tdigest=TDigest(record["tdigest_means"], record["tdigest_weights"]),
+            hll=HyperLogLog(record["hll_registers"]),
+            histogram=LogHistogram(record["hist_buckets"], record["hist_counts"])
+        )
+
+
+PROFILE_RECORD_COLUMNS = list(ColumnProfile().to_record().keys())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Where the database build reads the raw Parquet dataset from.
+
+``open_storage`` returns a LocalStorage for a directory (data/raw by
+default) and an S3Storage for an ``s3://bucket/prefix`` URI, so
+setup_database.py and profiler.py can read files in place instead of
+syncing them to data/raw first. Both list the files of a dataset as
+(path, size_bytes, mtime), the same shape the load and profile ledgers
+store, and make their paths readable by DuckDB's read_parquet and by
+pyarrow.
+
+S3Storage lists objects with s3fs. With a cache directory (the default)
+s3fs is wrapped in an fsspec block cache that is registered on the DuckDB
+connection: every byte range DuckDB or pyarrow fetches, i.e. Parquet
+footers and the row groups a query touches, is kept in a sparse local
+file and survives the process, so a later run only fetches what it has
+not read before. A cached object is checked against its ETag when opened,
+so a rewritten object is fetched again. Without a cache directory DuckDB
+reads through httpfs, as the dbt-transform workflow does.
+
+Both modes take S3_ENDPOINT_URL, so they can run against MinIO or a moto
+server instead of AWS.
+"""
+
+import os
+import glob
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import project_paths  # noqa: F401  (puts ingestion/ on sys.path)
+from config import AWS_REGION, S3_ENDPOINT_URL, RAW_CACHE_PATH, RAW_CACHE_BLOCK_BYTES
+from raw_layout import dataset_glob
+
+S3_PROTOCOLS = ("s3", "s3a")
+
+
+def drop_stale_entry(cache_fs, path: str, block_file: str):
+    """Forget a block-cached object whose ETag changed.
+
+    fsspec's pop_from_cache is not enough: saving the metadata merges the
+    entry on disk back in, with the old version's size and blocks, so the
+    metadata file is rewritten without it. (A function rather than a method:
+    CachingFileSystem hands unknown attributes to the wrapped filesystem.)
+    """
+    cache_fs._metadata.cached_files[-1].pop(cache_fs._strip_protocol(path), None)
+    for stale in (block_file, os.path.join(cache_fs.storage[-1], "cache")):
+        if os.path.exists(stale):
+            os.remove(stale)
+    cache_fs.save_cache()
+
+
+class LocalStorage:
+    """Raw dataset in a local directory."""
+
+    filesystem = None
+
+    def __init__(self, root: str):
+        self.root = str(root)
+        self.uri = self.root
+
+    def list_files(self, dataset: str) -> List[Dict]:
+        """Stat every Parquet file of a partitioned dataset."""
+        files = []
+        for path in sorted(glob.glob(dataset_glob(dataset, self.root), recursive=True)):
+            stat = os.stat(path)
+            files.append({
+                "path": path,
+                "size_bytes": stat.st_size,
+                "mtime": datetime.fromtimestamp(stat.st_mtime)
+            })
+        return files
+
+    def legacy_files(self) -> List[str]:
+        """Flat Parquet files left outside the partitioned layout."""
+        return sorted(
+            glob.glob(os.path.join(self.root, "*_hourly_*.parquet"))
+            + glob.glob(os.path.join(self.root, "*_daily_*.parquet"))
+        )
+
+    def attach(self, conn):
+        """Nothing to set up; DuckDB reads local paths directly."""
+
+    def read_table(self, path: str, columns: Optional[List[str]] = None) -> pa.Table:
+        return pq.read_table(path, columns=columns)
+
+
+class S3Storage:
+    """Raw dataset under an S3 prefix, read in place."""
+
+    def __init__(
+        self,
+        uri: str,
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        region: str = AWS_REGION,
+        cache_path: Optional[str] = RAW_CACHE_PATH,
+        block_size: int = RAW_CACHE_BLOCK_BYTES
+    ):
+        try:
+            import s3fs
+            from fsspec.implementations.cached import CachingFileSystem
+        except ImportError as e:
+            raise ImportError("Reading raw Parquet from S3 requires s3fs: pip install s3fs") from e
+
+        class ETagS3FileSystem(s3fs.S3FileSystem):
+            def ukey(self, path):
+                """Identify an object version by ETag, the same whether info came from a listing or a HEAD."""
+                return self.info(path)["ETag"]
+
+        class CachedS3FileSystem(CachingFileSystem):
+            """Block cache over s3fs, addressed with plain s3:// paths so DuckDB routes them here."""
+            protocol = S3_PROTOCOLS
+
+            def _open(self, path, *args, **kwargs):
+                # fsspec merges the blocks of a new object version into the stale entry; drop it first.
+                # The cache metadata has no public lookup, hence the fsspec pin in requirements.txt;
+                # tests/test_storage.py fails if a release changes it
+                detail = self._metadata.check_file(self._strip_protocol(path), None)
+                if detail and detail[0]["uid"] != self.fs.ukey(path):
+                    drop_stale_entry(self, path, detail[1])
+                return super()._open(path, *args, **kwargs)
+
+        self.uri = uri.rstrip("/")
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.cache_path = cache_path
+        self.s3 = ETagS3FileSystem(
+            endpoint_url=endpoint_url,
+            client_kwargs={"region_name": region},
+            default_block_size=block_size,
+            skip_instance_cache=True
+        )
+        self.filesystem = self.s3
+        if cache_path:
+            os.makedirs(cache_path, exist_ok=True)
+            # check_files compares the stored ETag on every open, so a rewritten object is fetched again
+            self.filesystem = CachedS3FileSystem(fs=self.s3, cache_storage=cache_path, check_files=True, expiry_time=False)
+
+    def list_files(self, dataset: str) -> List[Dict]:
+        """Size and modification time of every Parquet object of a dataset."""
+        # Drop listings from earlier calls, which also back the ETag checks of the block cache
+        self.s3.invalidate_cache()
+        objects = self.s3.find(f"{self.uri}/dataset={dataset}/", detail=True)
+        return [
+            {
+                "path": f"s3://{key}",
+                "size_bytes": info["size"],
+                "mtime": datetime.fromtimestamp(info["LastModified"].timestamp())
+            }
+            for key, info in sorted(objects.items())
+            if key.endswith(".parquet")
+        ]
+
+    def legacy_files(self) -> List[str]:
+        """Uploads only ever contain the partitioned layout."""
+        return []
+
+    def attach(self, conn):
+        """Let the connection's read_parquet resolve s3:// paths, once per connection."""
+        if not self.cache_path:
+            self._attach_httpfs(conn)
+        elif self.filesystem.protocol[0] not in conn.list_filesystems():
+            conn.register_filesystem(self.filesystem)
+
+    def _attach_httpfs(self, conn):
+        conn.execute("INSTALL httpfs")
+        conn.execute("LOAD httpfs")
+        options = {"REGION": self.region}
+        if os.environ.get("AWS_ACCESS_KEY_ID"):
+            options["KEY_ID"] = os.environ["AWS_ACCESS_KEY_ID"]
+            options["SECRET"] = os.environ.get("AWS_SECRET_ACCESS_KEY", "")
+            if os.environ.get("AWS_SESSION_TOKEN"):
+                options["SESSION_TOKEN"] = os.environ["AWS_SESSION_TOKEN"]
+        if self.endpoint_url:
+            endpoint = urlparse(self.endpoint_url)
+            options["ENDPOINT"] = endpoint.netloc
+            options["USE_SSL"] = endpoint.scheme == "https"
+            options["URL_STYLE"] = "path"
+        settings = ", ".join(
+            f"{key} {value}" if isinstance(value, bool) else f"{key} '{value.replace(chr(39), chr(39) * 2)}'"
+            for key, value in options.items()
+        )
+        conn.execute(f"CREATE OR REPLACE SECRET raw_s3 (TYPE s3, {settings})")
+        # In-process reuse of footers across the queries of one build
+        conn.execute("SET parquet_metadata_cache = true")
+
+    def read_table(self, path: str, columns: Optional[List[str]] = None) -> pa.Table:
+        return pq.read_table(self.s3._strip_protocol(path), columns=columns, filesystem=self.filesystem)
+
+
+def open_storage(uri: str, cache: bool = True):
+    """Storage for a local directory or an s3:// URI; cache=False reads S3 through httpfs."""
+    uri = str(uri)
+    if urlparse(uri).scheme in S3_PROTOCOLS:
+        return S3Storage(uri, cache_path=RAW_CACHE_PATH if cache else None)
+    return LocalStorage(uri)
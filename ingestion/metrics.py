@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Stage-level timing and resource metrics for ingestion and database builds.
+
+Wrap a unit of work in ``stage`` (or decorate a function with
+``instrumented``) to record its wall time, rows, bytes and peak RSS:
+
+    with stage("transform", city_id="amsterdam", batch_id=batch_id) as m:
+        hourly, daily = transform(raw_data)
+        m["rows"] = hourly.num_rows + daily.num_rows
+
+Tags given to a stage are inherited by stages opened inside it, also in
+helpers that know nothing about cities (e.g. the JSON decode in
+utils.make_api_request). Records collect in the process-wide ``METRICS``
+collector until a command exports them, to the ``metrics`` table of a DuckDB
+database and optionally as a Prometheus text file (for node_exporter's
+textfile collector). The table keeps every record with its batch_id; the
+Prometheus series are per (stage, city_id), so their number does not grow
+with every run.
+
+Peak RSS is sampled from a background thread that only runs while a stage
+is open. RSS is per process, so stages that overlap in threads (cities
+ingested concurrently) share their peaks.
+"""
+
+import os
+import sys
+import time
+import logging
+import resource
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from itertools import count
+from typing import Callable, Dict, Iterator, List, Optional
+
+from config import METRICS_RSS_SAMPLE_SECONDS, METRICS_DB_WRITE_RETRIES, RETRY_DELAY, MAX_RETRY_DELAY
+
+# utils.make_api_request records stages, so this module must not import utils at load time
+logger = logging.getLogger(__name__)
+
+RUN_ID = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+METRICS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS metrics (
+        run_id VARCHAR,
+        stage VARCHAR,
+        city_id VARCHAR,
+        batch_id VARCHAR,
+        started_at TIMESTAMP,
+        duration_s DOUBLE,
+        rows BIGINT,
+        bytes BIGINT,
+        peak_rss_mb DOUBLE,
+        status VARCHAR
+    )
+"""
+METRIC_COLUMNS = [
+    "run_id", "stage", "city_id", "batch_id", "started_at",
+    "duration_s", "rows", "bytes", "peak_rss_mb", "status"
+]
+
+# (metric name, help text, field of an aggregate() entry) for the Prometheus export
+PROMETHEUS_METRICS = [
+    ("weather_stage_duration_seconds", "Wall time spent in the stage", "duration_s"),
+    ("weather_stage_rows", "Rows handled by the stage", "rows"),
+    ("weather_stage_bytes", "Bytes read or written by the stage", "bytes"),
+    ("weather_stage_peak_rss_bytes", "Peak process RSS while the stage ran", "peak_rss_bytes"),
+    ("weather_stage_calls", "Executions of the stage", "calls"),
+    ("weather_stage_errors", "Executions of the stage that raised or failed", "errors"),
+]
+
+_tags: ContextVar[Dict[str, str]] = ContextVar("metric_tags", default={})
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs (macOS): fall back to the lifetime high-water mark
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Tracks the peak RSS of every open stage from one shared background thread."""
+
+    def __init__(self, interval: float = METRICS_RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._peaks: Dict[int, int] = {}
+        self._tokens = count()
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self) -> int:
+        """Start tracking a stage; the sampler thread runs while any stage is open."""
+        with self._lock:
+            token = next(self._tokens)
+            self._peaks[token] = current_rss()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self._thread.start()
+        return token
+
+    def close(self, token: int) -> int:
+        """Stop tracking a stage and return its peak RSS in bytes."""
+        rss = current_rss()
+        with self._lock:
+            return max(self._peaks.pop(token), rss)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = current_rss()
+            with self._lock:
+                if not self._peaks:
+                    self._thread = None
+                    return
+                for token, peak in self._peaks.items():
+                    if rss > peak:
+                        self._peaks[token] = rss
+
+
+class MetricsCollector:
+    """Thread-safe buffer of stage records."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: List[Dict] = []
+        self.sampler = RssSampler()
+
+    def add(self, record: Dict):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> List[Dict]:
+        with self._lock:
+            return list(self._records)
+
+    def drain(self) -> List[Dict]:
+        """Return and forget the buffered records, so each export writes them once."""
+        with self._lock:
+            records, self._records = self._records, []
+        return records
+
+
+METRICS = MetricsCollector()
+
+
+@contextmanager
+def stage(name: str, collector: MetricsCollector = METRICS, **tags) -> Iterator[Dict]:
+    """Record one execution of a stage; set ``rows`` and ``bytes`` on the yielded dict.
+
+    A stage that raises is recorded with status "error". Set ``status`` to
+    "failed" for a failure that is handled without raising.
+    """
+    merged = {**_tags.get(), **{key: str(value) for key, value in tags.items() if value is not None}}
+    context_token = _tags.set(merged)
+    counters = {"rows": 0, "bytes": 0, "status": "ok"}
+    started_at = datetime.now()
+    rss_token = collector.sampler.open()
+    started = time.perf_counter()
+    try:
+        yield counters
+    except BaseException:
+        counters["status"] = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        peak_rss = collector.sampler.close(rss_token)
+        _tags.reset(context_token)
+        collector.add({
+            "run_id": RUN_ID,
+            "stage": name,
+            "city_id": merged.get("city_id"),
+            "batch_id": merged.get("batch_id"),
+            "started_at": started_at,
+            "duration_s": duration,
+            "rows": counters["rows"],
+            "bytes": counters["bytes"],
+            "peak_rss_mb": peak_rss / 1024 ** 2,
+            "status": counters["status"],
+        })
+
+
+def instrumented(name: str, rows: Optional[Callable] = None, **tags):
+    """Decorator form of ``stage``; rows(result) derives the row count from the return value."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, **tags) as counters:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    counters["rows"] = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def write_duckdb(conn, records: List[Dict]):
+    """Append records to the ``metrics`` table of an open DuckDB connection."""
+    conn.execute(METRICS_SCHEMA)
+    if records:
+        conn.executemany(
+            f"INSERT INTO metrics ({', '.join(METRIC_COLUMNS)}) VALUES ({', '.join('?' for _ in METRIC_COLUMNS)})",
+            [[record[column] for column in METRIC_COLUMNS] for record in records]
+        )
+
+
+def write_duckdb_file(path: str, records: List[Dict], retries: int = METRICS_DB_WRITE_RETRIES) -> bool:
+    """Append records to a metrics database file; never raises, so metrics cannot fail a run.
+
+    Parallel ingestion processes contend for the file lock, so a locked
+    file is retried with backoff before the records are given up.
+    """
+    from utils import backoff_delay
+
+    try:
+        import duckdb
+    except ImportError:
+        logger.warning("duckdb is not installed; stage metrics were not written")
+        return False
+
+    for attempt in range(retries):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = duckdb.connect(path)
+            try:
+                write_duckdb(conn, records)
+            finally:
+                conn.close()
+            return True
+        except duckdb.IOException as e:
+            if attempt == retries - 1:
+                logger.warning(f"Could not write {len(records)} stage metric(s) to {path}: {e}")
+                return False
+            time.sleep(backoff_delay(attempt, RETRY_DELAY, MAX_RETRY_DELAY))
+        except Exception as e:
+            # e.g. a metrics table from an older schema, or an unwritable directory; retrying will not help
+            logger.warning(f"Could not write {len(records)} stage metric(s) to {path}: {e}")
+            return False
+    return False
+
+
+def aggregate(records: List[Dict]) -> Dict[tuple, Dict]:
+    """Fold records into one entry per (stage, city_id)."""
+    entries = {}
+    for record in records:
+        key = (record["stage"], record["city_id"])
+        entry = entries.setdefault(key, {"duration_s": 0.0, "rows": 0, "bytes": 0, "peak_rss_bytes": 0, "calls": 0, "errors": 0})
+        entry["duration_s"] += record["duration_s"]
+        entry["rows"] += record["rows"]
+        entry["bytes"] += record["bytes"]
+        entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"], int(record["peak_rss_mb"] * 1024 ** 2))
+        entry["calls"] += 1
+        entry["errors"] += record["status"] != "ok"
+    return entries
+
+
+def prometheus_text(records: List[Dict]) -> str:
+    """Records in the Prometheus text exposition format, one series per (stage, city_id)."""
+    def label(value: Optional[str]) -> str:
+        return (value or "").replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    entries = aggregate(records)
+    lines = []
+    for metric, help_text, field in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for (stage_name, city_id), entry in sorted(entries.items(), key=lambda item: tuple(v or "" for v in item[0])):
+            labels = f'stage="{label(stage_name)}",city_id="{label(city_id)}"'
+            lines.append(f"{metric}{{{labels}}} {entry[field]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, records: List[Dict]) -> bool:
+    """Write records as a Prometheus text file; never raises, like write_duckdb_file.
+
+    The file is replaced atomically so a scraper never reads half a file.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(tmp_path, "w") as f:
+            f.write(prometheus_text(records))
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        # e.g. an unwritable directory or a full disk
+        logger.warning(f"Could not write {len(records)} stage metric(s) to {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def log_summary(records: List[Dict]):
+    """Log total time, rows and peak RSS per stage."""
+    by_stage = {}
+    for (stage_name, _), entry in aggregate(records).items():
+        total = by_stage.setdefault(stage_name, {"duration_s": 0.0, "rows": 0, "peak_rss_bytes": 0, "calls": 0})
+        total["duration_s"] += entry["duration_s"]
+        total["rows"] += entry["rows"]
+        total["peak_rss_bytes"] = max(total["peak_rss_bytes"], entry["peak_rss_bytes"])
+        total["calls"] += entry["calls"]
+    if not by_stage:
+        return
+    logger.info(f"{'stage':<20} {'calls':>6} {'total s':>9} {'rows':>12} {'peak MB':>9}")
+    for stage_name, total in by_stage.items():
+        logger.info(
+            f"{stage_name:<20} {total['calls']:>6} {total['duration_s']:>9.2f} "
+            f"{total['rows']:>12,} {total['peak_rss_bytes'] / 1024 ** 2:>9.0f}"
+        )
+
+
+def export_metrics(
+    db_path: Optional[str] = None,
+    prometheus_path: Optional[str] = None,
+    conn=None,
+    collector: MetricsCollector = METRICS
+) -> List[Dict]:
+    """Drain the collector into the metrics table (an open connection or a database file) and/or a Prometheus file.
+
+    Only a failure on an open connection raises; the caller owns that
+    connection. Failed file writes are logged and the records dropped.
+    """
+    records = collector.drain()
+    log_summary(records)
+    if conn is not None:
+        write_duckdb(conn, records)
+    elif db_path:
+        write_duckdb_file(db_path, records)
+    if prometheus_path:
+        write_prometheus(prometheus_path, records)
+    return records
@@ -0,0 +1,90 @@
+"""Parquet writer profiles for the raw dataset.
+
+A profile in config.PARQUET_WRITER_PROFILES fixes compression, row-group
+size, row order, statistics and per-column encodings:
+
+- rows sorted by (city_id, time), so row-group min/max statistics are
+  tight and DuckDB can skip row groups on time ranges and cities
+- column statistics plus the page index, for page-level skipping
+- BYTE_STREAM_SPLIT for high-cardinality float columns; Open-Meteo rounds
+  most readings to 0.1, and those compress better dictionary-encoded
+- dictionary encoding for the city metadata and every other column
+- optional bloom filters, written only when the installed pyarrow supports them
+"""
+
+import inspect
+from typing import Dict, List, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from config import PARQUET_WRITER_PROFILES, PARQUET_WRITER_PROFILE
+from utils import logger
+
+SORT_COLUMNS = ["city_id", "time"]
+BLOOM_FILTER_FPP = 0.01
+# Float columns with more distinct values than this share of rows use BYTE_STREAM_SPLIT
+BYTE_STREAM_SPLIT_MIN_DISTINCT_RATIO = 0.25
+
+SUPPORTS_BLOOM_FILTERS = "bloom_filter_options" in inspect.signature(pq.write_table).parameters
+
+
+def decoded(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    """A column with dictionary encoding removed."""
+    return pc.cast(values, values.type.value_type) if pa.types.is_dictionary(values.type) else values
+
+
+def sort_table(table: pa.Table, columns: List[str] = SORT_COLUMNS) -> pa.Table:
+    """Sort rows by the given columns; dictionary columns sort by their values."""
+    keys = {column: decoded(table.column(column)) for column in columns}
+    return table.take(pc.sort_indices(pa.table(keys), sort_keys=[(column, "ascending") for column in columns]))
+
+
+def writer_options(table: pa.Table, profile: str = PARQUET_WRITER_PROFILE) -> Dict:
+    """pq.write_table keyword arguments of a profile for a table's schema."""
+    if profile not in PARQUET_WRITER_PROFILES:
+        raise ValueError(f"Unknown Parquet writer profile: {profile}. Available: {list(PARQUET_WRITER_PROFILES.keys())}")
+    settings = PARQUET_WRITER_PROFILES[profile]
+    schema = table.schema
+
+    options = {"compression": settings["compression"], "write_statistics": True}
+    if "compression_level" in settings:
+        options["compression_level"] = settings["compression_level"]
+    if "row_group_size" in settings:
+        options["row_group_size"] = settings["row_group_size"]
+    if settings.get("page_index"):
+        options["write_page_index"] = True
+
+    if settings.get("byte_stream_split"):
+        split = [
+            field.name for field in schema
+            if pa.types.is_floating(field.type)
+            and pc.count_distinct(table.column(field.name)).as_py() > BYTE_STREAM_SPLIT_MIN_DISTINCT_RATIO * table.num_rows
+        ]
+        if split:
+            options["use_byte_stream_split"] = split
+            options["use_dictionary"] = [name for name in schema.names if name not in split]
+
+    if settings.get("sort"):
+        options["sorting_columns"] = [pq.SortingColumn(schema.get_field_index(column)) for column in SORT_COLUMNS]
+
+    bloom_columns = settings.get("bloom_filter_columns")
+    if bloom_columns:
+        if SUPPORTS_BLOOM_FILTERS:
+            options["bloom_filter_options"] = {
+                column: {"ndv": max(pc.count_distinct(decoded(table.column(column))).as_py(), 1), "fpp": BLOOM_FILTER_FPP}
+                for column in bloom_columns
+            }
+        else:
+            logger.warning(f"pyarrow {pa.__version__} cannot write bloom filters; writing {profile} files without them")
+
+    return options
+
+
+def apply_writer_profile(table: pa.Table, profile: str = PARQUET_WRITER_PROFILE) -> Tuple[pa.Table, Dict]:
+    """The table in the profile's row order and the write options to use for it."""
+    options = writer_options(table, profile)
+    if PARQUET_WRITER_PROFILES[profile].get("sort"):
+        table = sort_table(table)
+    return table, options
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Incremental, parallel upload of the raw Parquet dataset to S3.
+
+A local JSON-lines manifest records (path, key, size, mtime, md5,
+uploaded_at) for every uploaded file. A run uploads only files that are
+new or whose content changed:
+
+- size and mtime unchanged since the manifest record: skipped without reading
+- size or mtime changed: md5 computed; an unchanged checksum only refreshes
+  the record
+
+Uploads go through a thread pool with a multipart ``TransferConfig``, and
+each file is retried on its own with jittered backoff, so one flaky file
+neither stops nor restarts the rest. ``S3_ENDPOINT_URL`` points the client
+at MinIO or moto instead of AWS.
+"""
+
+import os
+import glob
+import json
+import hashlib
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from config import (
+    RAW_DATA_PATH, S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, AWS_REGION,
+    UPLOAD_MANIFEST_PATH, UPLOAD_MAX_WORKERS, UPLOAD_MAX_RETRIES, UPLOAD_MULTIPART_BYTES,
+    RETRY_DELAY, MAX_RETRY_DELAY
+)
+from utils import backoff_delay, logger
+
+HASH_CHUNK_BYTES = 1024 ** 2
+
+
+class UploadManifest:
+    """Append-only JSON-lines log of uploaded files; the latest record per path wins."""
+
+    def __init__(self, path: str = UPLOAD_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def entries(self) -> Dict[str, Dict]:
+        """Fold the log into the latest record of each local path."""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("deleted"):
+                    entries.pop(record["path"], None)
+                else:
+                    entries[record["path"]] = record
+        return entries
+
+    def append(self, record: Dict):
+        """Durably append one record; safe to call from upload threads."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, sort_keys=True) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compact(self):
+        """Rewrite the log with one line per live path."""
+        if not os.path.exists(self.path):
+            return
+        entries = self.entries()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            for record in entries.values():
+                f.write(json.dumps(record, sort_keys=True) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+def file_md5(path: str) -> str:
+    """Hex md5 of a file, read in chunks."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_s3_client(endpoint_url: Optional[str] = S3_ENDPOINT_URL, max_workers: int = UPLOAD_MAX_WORKERS):
+    """S3 client with a connection pool sized for the upload threads."""
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        region_name=AWS_REGION,
+        config=Config(max_pool_connections=max_workers * 4, retries={"max_attempts": 3, "mode": "standard"})
+    )
+
+
+def transfer_config() -> TransferConfig:
+    """Multipart settings for large (compacted) files."""
+    return TransferConfig(
+        multipart_threshold=UPLOAD_MULTIPART_BYTES,
+        multipart_chunksize=UPLOAD_MULTIPART_BYTES,
+        max_concurrency=4,
+        use_threads=True
+    )
+
+
+def plan_uploads(
+    data_dir: str,
+    bucket: str,
+    prefix: str,
+    manifest_entries: Dict[str, Dict]
+) -> Tuple[List[Dict], List[Dict], int]:
+    """Split local Parquet files into files to upload, touched-but-unchanged records to refresh, and a count of skipped files."""
+    to_upload, refreshed, skipped = [], [], 0
+    for path in sorted(glob.glob(os.path.join(data_dir, "**", "*.parquet"), recursive=True)):
+        stat = os.stat(path)
+        candidate = {
+            "path": path,
+            "key": f"{prefix}/{os.path.relpath(path, data_dir).replace(os.sep, '/')}",
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+        record = manifest_entries.get(path)
+        same_target = record is not None and (record["bucket"], record["key"]) == (bucket, candidate["key"])
+        if same_target and (record["size"], record["mtime"]) == (candidate["size"], candidate["mtime"]):
+            skipped += 1
+            continue
+
+        candidate["md5"] = file_md5(path)
+        if same_target and record["md5"] == candidate["md5"]:
+            refreshed.append({**record, "size": candidate["size"], "mtime": candidate["mtime"]})
+        else:
+            to_upload.append(candidate)
+    return to_upload, refreshed, skipped
+
+
+def upload_one(client, candidate: Dict, bucket: str, config: TransferConfig, max_retries: int = UPLOAD_MAX_RETRIES) -> Dict:
+    """Upload one file with its own retries and return its manifest record."""
+    for attempt in range(max_retries):
+        try:
+            client.upload_file(
+                candidate["path"], bucket, candidate["key"],
+                ExtraArgs={"Metadata": {"md5": candidate["md5"]}},
+                Config=config
+            )
+            return {**candidate, "bucket": bucket, "uploaded_at": datetime.now().isoformat(timespec="seconds")}
+        except (BotoCoreError, ClientError, OSError) as e:
+            if attempt == max_retries - 1:
+                raise
+            delay = backoff_delay(attempt, RETRY_DELAY, MAX_RETRY_DELAY)
+            logger.warning(f"Upload of {candidate['key']} failed ({e}); retry {attempt + 1}/{max_retries - 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def delete_removed(client, bucket: str, manifest: UploadManifest, manifest_entries: Dict[str, Dict]) -> int:
+    """Delete objects whose local file is gone (e.g. merged by compaction) and forget them."""
+    removed = [record for path, record in manifest_entries.items() if not os.path.exists(path)]
+    for offset in range(0, len(removed), 1000):
+        batch = removed[offset:offset + 1000]
+        client.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": record["key"]} for record in batch], "Quiet": True})
+        for record in batch:
+            manifest.append({"path": record["path"], "deleted": True})
+    if removed:
+        logger.info(f"Deleted {len(removed)} object(s) whose local file no longer exists")
+    return len(removed)
+
+
+def upload_dataset(
+    data_dir: str = RAW_DATA_PATH,
+    bucket: str = S3_BUCKET,
+    prefix: str = S3_PREFIX,
+    endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+    manifest: Optional[UploadManifest] = None,
+    max_workers: int = UPLOAD_MAX_WORKERS,
+    delete_missing: bool = False,
+    dry_run: bool = False,
+    client=None
+) -> Dict:
+    """Upload new and changed Parquet files under data_dir and return run statistics.
+
+    Failed files are reported in ``failed`` and left out of the manifest, so
+    the next run retries them.
+    """
+    manifest = manifest or UploadManifest()
+    entries = manifest.entries()
+    to_upload, refreshed, skipped = plan_uploads(data_dir, bucket, prefix, entries)
+    total_bytes = sum(candidate["size"] for candidate in to_upload)
+    logger.info(
+        f"Upload plan: {len(to_upload)} new or changed file(s) ({total_bytes / 1024 ** 2:.1f} MB), "
+        f"{len(refreshed)} touched but unchanged, {skipped} already uploaded"
+    )
+
+    stats = {"uploaded": 0, "bytes": 0, "refreshed": len(refreshed), "deleted": 0, "failed": []}
+    if dry_run:
+        for candidate in to_upload:
+            logger.info(f"Would upload {candidate['path']} -> s3://{bucket}/{candidate['key']}")
+        return stats
+
+    for record in refreshed:
+        manifest.append(record)
+
+    client = client or make_s3_client(endpoint_url, max_workers)
+    config = transfer_config()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload") as executor:
+        futures = {executor.submit(upload_one, client, candidate, bucket, config): candidate for candidate in to_upload}
+        for future in as_completed(futures):
+            candidate = futures[future]
+            try:
+                manifest.append(future.result())
+                stats["uploaded"] += 1
+                stats["bytes"] += candidate["size"]
+            except Exception as e:
+                logger.error(f"Giving up on {candidate['path']}: {e}")
+                stats["failed"].append(candidate["path"])
+
+    if delete_missing:
+        stats["deleted"] = delete_removed(client, bucket, manifest, manifest.entries())
+    manifest.compact()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Uploaded {stats['uploaded']} file(s), {stats['bytes'] / 1024 ** 2:.1f} MB in {elapsed:.1f}s "
+        f"to s3://{bucket}/{prefix}/; {len(stats['failed'])} failed"
+    )
+    return stats
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Upload new and changed raw Parquet files to S3",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python s3_upload.py
+  python s3_upload.py --dry-run
+  python s3_upload.py --endpoint-url http://localhost:9000 --bucket weather-test
+  python s3_upload.py --delete-missing
+        """
+    )
+    parser.add_argument("--data-dir", default=RAW_DATA_PATH, help="Local raw dataset directory")
+    parser.add_argument("--bucket", default=S3_BUCKET, help="Target bucket")
+    parser.add_argument("--prefix", default=S3_PREFIX, help="Key prefix in the bucket")
+    parser.add_argument("--endpoint-url", default=S3_ENDPOINT_URL, help="S3-compatible endpoint, e.g. MinIO")
+    parser.add_argument("--manifest", default=UPLOAD_MANIFEST_PATH, help="Upload manifest path")
+    parser.add_argument("--max-workers", type=int, default=UPLOAD_MAX_WORKERS, help="Files uploaded in parallel")
+    parser.add_argument(
+        "--delete-missing",
+        action="store_true",
+        help="Delete objects whose local file was removed, e.g. by compaction"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be uploaded")
+    args = parser.parse_args()
+
+    stats = upload_dataset(
+        args.data_dir, args.bucket, args.prefix, args.endpoint_url,
+        UploadManifest(args.manifest), args.max_workers, args.delete_missing, args.dry_run
+    )
+    if stats["failed"]:
+        print(f"\n{len(stats['failed'])} file(s) failed to upload. Rerun to retry them.")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
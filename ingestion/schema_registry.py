@@ -0,0 +1,167 @@
+"""Canonical column types for raw weather Parquet files and DuckDB tables.
+
+Ingestion casts every table to these types before writing, and
+duckdb/setup_database.py creates the raw tables from the same registry, so
+both sides agree on one compact schema.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import HOURLY_VARIABLES, DAILY_VARIABLES
+
+ARROW_TYPES = {
+    "float32": pa.float32(),
+    "float64": pa.float64(),
+    "int8": pa.int8(),
+    "int16": pa.int16(),
+    "timestamp": pa.timestamp("us"),
+    "string": pa.dictionary(pa.int32(), pa.string()),
+}
+
+DUCKDB_TYPES = {
+    "float32": "FLOAT",
+    "float64": "DOUBLE",
+    "int8": "TINYINT",
+    "int16": "SMALLINT",
+    "timestamp": "TIMESTAMP",
+    "string": "VARCHAR",
+}
+
+# Narrowest lossless type per API variable; anything not listed is a float32 reading
+VARIABLE_TYPES = {
+    "relative_humidity_2m": "int8",
+    "weather_code": "int8",
+    "cloud_cover": "int8",
+    "cloud_cover_low": "int8",
+    "cloud_cover_mid": "int8",
+    "cloud_cover_high": "int8",
+    "wind_direction_10m": "int16",
+    "wind_direction_100m": "int16",
+    "wind_direction_10m_dominant": "int16",
+    "sunrise": "timestamp",
+    "sunset": "timestamp",
+}
+
+# Physically plausible (min, max) per variable, in Open-Meteo units; used by data quality checks
+VARIABLE_RANGES = {
+    "temperature_2m": (-90, 60),
+    "relative_humidity_2m": (0, 100),
+    "dew_point_2m": (-100, 40),
+    "apparent_temperature": (-100, 70),
+    "precipitation": (0, 500),
+    "rain": (0, 500),
+    "snowfall": (0, 200),
+    "snow_depth": (0, 30),
+    "weather_code": (0, 99),
+    "pressure_msl": (850, 1090),
+    "surface_pressure": (300, 1100),
+    "cloud_cover": (0, 100),
+    "cloud_cover_low": (0, 100),
+    "cloud_cover_mid": (0, 100),
+    "cloud_cover_high": (0, 100),
+    "et0_fao_evapotranspiration": (0, 30),
+    "vapour_pressure_deficit": (0, 15),
+    "wind_speed_10m": (0, 400),
+    "wind_speed_100m": (0, 500),
+    "wind_direction_10m": (0, 360),
+    "wind_direction_100m": (0, 360),
+    "wind_gusts_10m": (0, 500),
+    "soil_temperature_0_to_7cm": (-60, 80),
+    "soil_temperature_7_to_28cm": (-60, 80),
+    "soil_temperature_28_to_100cm": (-60, 80),
+    "soil_temperature_100_to_255cm": (-60, 80),
+    "soil_moisture_0_to_7cm": (0, 1),
+    "soil_moisture_7_to_28cm": (0, 1),
+    "soil_moisture_28_to_100cm": (0, 1),
+    "soil_moisture_100_to_255cm": (0, 1),
+    "temperature_2m_max": (-90, 60),
+    "temperature_2m_min": (-90, 60),
+    "temperature_2m_mean": (-90, 60),
+    "apparent_temperature_max": (-100, 70),
+    "apparent_temperature_min": (-100, 70),
+    "apparent_temperature_mean": (-100, 70),
+    "daylight_duration": (0, 86400),
+    "sunshine_duration": (0, 86400),
+    "precipitation_sum": (0, 2000),
+    "rain_sum": (0, 2000),
+    "snowfall_sum": (0, 500),
+    "precipitation_hours": (0, 24),
+    "wind_speed_10m_max": (0, 400),
+    "wind_gusts_10m_max": (0, 500),
+    "wind_direction_10m_dominant": (0, 360),
+    "shortwave_radiation_sum": (0, 50),
+}
+
+METADATA_TYPES = {
+    "city_id": "string",
+    "city_name": "string",
+    "latitude": "float64",
+    "longitude": "float64",
+    "timezone": "string",
+    "ingestion_timestamp": "timestamp",
+    "batch_id": "string",
+}
+
+DATASET_VARIABLES = {
+    "hourly": HOURLY_VARIABLES,
+    "daily": DAILY_VARIABLES,
+}
+
+
+def column_types(dataset: str) -> Dict[str, str]:
+    """Ordered mapping of column name to logical type for a dataset."""
+    if dataset not in DATASET_VARIABLES:
+        raise ValueError(f"Unknown dataset: {dataset}. Available: {list(DATASET_VARIABLES.keys())}")
+
+    types = {"time": "timestamp"}
+    for variable in DATASET_VARIABLES[dataset]:
+        types[variable] = VARIABLE_TYPES.get(variable, "float32")
+    types.update(METADATA_TYPES)
+    return types
+
+
+def variable_range(variable: str) -> Optional[Tuple[float, float]]:
+    """Plausible (min, max) of a variable, or None when it has no range."""
+    return VARIABLE_RANGES.get(variable)
+
+
+def arrow_type(dataset: str, column: str) -> pa.DataType:
+    """Arrow type of a single column."""
+    return ARROW_TYPES[column_types(dataset)[column]]
+
+
+def arrow_schema(dataset: str) -> pa.Schema:
+    """Arrow schema used for raw Parquet files."""
+    return pa.schema([(name, ARROW_TYPES[kind]) for name, kind in column_types(dataset).items()])
+
+
+def duckdb_columns(dataset: str) -> List[Tuple[str, str]]:
+    """(column, DuckDB type) pairs used for raw tables."""
+    return [(name, DUCKDB_TYPES[kind]) for name, kind in column_types(dataset).items()]
+
+
+def conform_table(table: pa.Table, dataset: str) -> pa.Table:
+    """Cast a table to the registry schema, failing on lossy conversions.
+
+    Columns missing from the response are added as nulls, columns unknown
+    to the registry are kept as they are.
+    """
+    schema = arrow_schema(dataset)
+    columns = {}
+    for field in schema:
+        if field.name not in table.column_names:
+            columns[field.name] = pa.nulls(table.num_rows, field.type)
+            continue
+        column = table.column(field.name)
+        if column.type != field.type:
+            column = pc.cast(column, field.type)
+        columns[field.name] = column
+
+    for name in table.column_names:
+        if name not in columns:
+            columns[name] = table.column(name)
+
+    return pa.table(columns)
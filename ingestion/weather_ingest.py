@@ -4,46 +4,79 @@
 import os
 import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
 from config import (
     CITIES, HISTORICAL_API_URL, FORECAST_API_URL,
-    BACKFILL_START_DATE, BACKFILL_END_DATE,
+    BACKFILL_START_DATE, BACKFILL_END_DATE, BACKFILL_WINDOW,
     HOURLY_VARIABLES, DAILY_VARIABLES,
-    REQUEST_TIMEOUT, MAX_RETRIES, RETRY_DELAY,
-    RAW_DATA_PATH, get_incremental_date
+    REQUEST_TIMEOUT, MAX_RETRIES, RETRY_DELAY, MAX_RETRY_DELAY, HTTP_POOL_SIZE,
+    MAX_CONCURRENT_REQUESTS, REQUESTS_PER_SECOND,
+    RAW_DATA_PATH, TRANSFORM_ENGINE, PARQUET_WRITER_PROFILES, PARQUET_WRITER_PROFILE,
+    METRICS_DB_PATH, METRICS_PROMETHEUS_PATH, get_incremental_date
 )
+from backfill import BackfillCheckpoint, WINDOW_CHOICES, plan_windows
+from cache import ResponseCache, archive_ttl_seconds
+from metrics import export_metrics, stage
+from parquet_profiles import apply_writer_profile
+from raw_layout import write_partitioned
+from schema_registry import conform_table
+from validation import validate_payload, quarantine_payload
 from utils import (
-    make_api_request, validate_weather_data,
+    HostRateLimiter, make_api_request, validate_weather_data,
     generate_batch_id, log_ingestion_stats, logger
 )
 
+rate_limiter = HostRateLimiter(REQUESTS_PER_SECOND)
+response_cache = ResponseCache()
+
+
+TRANSFORM_ENGINES = ["arrow", "pandas"]
+
+
+def constant_column(value: Any, num_rows: int) -> pa.DictionaryArray:
+    """Dictionary-encode a per-request constant so it is stored once, not once per row."""
+    indices = pa.array(np.zeros(num_rows, dtype=np.int32))
+    return pa.DictionaryArray.from_arrays(indices, pa.array([value]))
+
 
 class WeatherIngestion:
     """Weather data ingestion handler."""
     
-    def __init__(self, city_id: str):
+    def __init__(
+        self,
+        city_id: str,
+        use_cache: bool = True,
+        engine: str = TRANSFORM_ENGINE,
+        writer_profile: str = PARQUET_WRITER_PROFILE,
+        batch_id: Optional[str] = None
+    ):
         if city_id not in CITIES:
             raise ValueError(f"Unknown city: {city_id}. Available: {list(CITIES.keys())}")
             
         self.city_id = city_id
         self.city_config = CITIES[city_id]
         self.city_name = self.city_config["name"]
-        self.batch_id = generate_batch_id()
+        self.batch_id = batch_id or generate_batch_id(city_id)
+        self.use_cache = use_cache
+        self.engine = engine
+        self.writer_profile = writer_profile
         
         logger.info(f"Initialized ingestion for: {self.city_name}")
         
-    def fetch_weather_data(
+    def build_request(
         self,
         start_date: str,
         end_date: str,
         use_historical_api: bool = True
-    ) -> Optional[Dict]:
-        """Fetch weather data from Open-Meteo API."""
+    ) -> Tuple[str, Dict]:
+        """API URL and query parameters for a date range."""
         api_url = HISTORICAL_API_URL if use_historical_api else FORECAST_API_URL
         
         params = {
@@ -55,6 +88,23 @@ class WeatherIngestion:
             "daily": ",".join(DAILY_VARIABLES),
             "timezone": self.city_config["timezone"]
         }
+        return api_url, params
+        
+    def fetch_weather_data(
+        self,
+        start_date: str,
+        end_date: str,
+        use_historical_api: bool = True
+    ) -> Optional[Dict]:
+        """Fetch weather data from Open-Meteo API."""
+        api_url, params = self.build_request(start_date, end_date, use_historical_api)
+        
+        # Forecast responses change between runs, so only archive data is cached
+        use_cache = self.use_cache and use_historical_api
+        if use_cache:
+            data = response_cache.get(api_url, params, archive_ttl_seconds(end_date))
+            if data and validate_weather_data(data, ["hourly", "daily"]):
+                return data
         
         logger.info(f"Fetching data for {self.city_name} ({start_date} to {end_date})")
         
@@ -63,10 +113,15 @@ class WeatherIngestion:
             params=params,
             timeout=REQUEST_TIMEOUT,
             max_retries=MAX_RETRIES,
-            retry_delay=RETRY_DELAY
+            retry_delay=RETRY_DELAY,
+            rate_limiter=rate_limiter,
+            pool_size=HTTP_POOL_SIZE,
+            max_retry_delay=MAX_RETRY_DELAY
         )
         
         if data and validate_weather_data(data, ["hourly", "daily"]):
+            if use_cache:
+                response_cache.put(api_url, params, data)
             return data
         else:
             logger.error(f"Failed to fetch valid data for {self.city_name}")
@@ -100,57 +155,224 @@ class WeatherIngestion:
         logger.info(f"Transformed {len(df_hourly):,} hourly records and {len(df_daily):,} daily records")
         return df_hourly, df_daily
         
-    def save_to_parquet(self, df_hourly: pd.DataFrame, df_daily: pd.DataFrame, start_date: str, end_date: str):
-        """Save DataFrames to Parquet files."""
-        os.makedirs(RAW_DATA_PATH, exist_ok=True)
-        
-        hourly_filename = f"{self.city_id}_hourly_{start_date}_{end_date}_{self.batch_id}.parquet"
-        hourly_filepath = os.path.join(RAW_DATA_PATH, hourly_filename)
+    def transform_to_arrow(self, raw_data: Dict) -> tuple[pa.Table, pa.Table]:
+        """Transform API response to Arrow tables (hourly and daily) without going through pandas."""
+        ingestion_timestamp = datetime.now()
+        tables = []
         
-        daily_filename = f"{self.city_id}_daily_{start_date}_{end_date}_{self.batch_id}.parquet"
-        daily_filepath = os.path.join(RAW_DATA_PATH, daily_filename)
-        
-        df_hourly.to_parquet(hourly_filepath, engine='pyarrow', compression='snappy', index=False)
-        df_daily.to_parquet(daily_filepath, engine='pyarrow', compression='snappy', index=False)
-        
-        hourly_size_mb = os.path.getsize(hourly_filepath) / (1024 * 1024)
-        daily_size_mb = os.path.getsize(daily_filepath) / (1024 * 1024)
-        
-        logger.info(f"Saved hourly data: {hourly_filepath} ({hourly_size_mb:.2f} MB)")
-        logger.info(f"Saved daily data: {daily_filepath} ({daily_size_mb:.2f} MB)")
+        for section in ("hourly", "daily"):
+            section_data = raw_data.get(section, {})
+            num_rows = len(section_data.get("time", []))
+            
+            # Arrays are built with inferred types and then safely cast by the
+            # schema registry, so a fractional value never truncates silently
+            columns = {name: pa.array(values) for name, values in section_data.items()}
+                    
+            constants = {
+                "city_id": self.city_id,
+                "city_name": self.city_name,
+                "latitude": raw_data.get("latitude"),
+                "longitude": raw_data.get("longitude"),
+                "timezone": raw_data.get("timezone"),
+                "ingestion_timestamp": ingestion_timestamp,
+                "batch_id": self.batch_id
+            }
+            for name, value in constants.items():
+                columns[name] = constant_column(value, num_rows)
+                
+            tables.append(conform_table(pa.table(columns), section))
+            
+        table_hourly, table_daily = tables
+        logger.info(f"Transformed {table_hourly.num_rows:,} hourly records and {table_daily.num_rows:,} daily records")
+        return table_hourly, table_daily
         
-        return hourly_filepath, daily_filepath
+    def save_to_parquet(
+        self,
+        hourly: Union[pd.DataFrame, pa.Table],
+        daily: Union[pd.DataFrame, pa.Table],
+        start_date: str,
+        end_date: str
+    ):
+        """Save DataFrames or Arrow tables into the partitioned raw dataset."""
+        saved = {}
+        for dataset, data in (("hourly", hourly), ("daily", daily)):
+            table = pa.Table.from_pandas(data, preserve_index=False) if isinstance(data, pd.DataFrame) else data
+            filename = f"{self.city_id}_{dataset}_{start_date}_{end_date}_{self.batch_id}.parquet"
+            table, write_options = apply_writer_profile(conform_table(table, dataset), self.writer_profile)
+            paths = write_partitioned(table, dataset, self.city_id, filename, RAW_DATA_PATH, **write_options)
+            
+            size_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+            logger.info(f"Saved {dataset} data: {len(paths)} partition file(s) ({size_mb:.2f} MB)")
+            for path in paths:
+                logger.info(f"  {path}")
+            saved[dataset] = paths
+            
+        return saved["hourly"], saved["daily"]
         
     def run(
         self,
         start_date: str,
         end_date: str,
         use_historical_api: bool = True
-    ) -> Optional[str]:
-        """Execute full ingestion pipeline."""
+    ) -> Optional[List[str]]:
+        """Execute full ingestion pipeline and return the hourly files written."""
         try:
             logger.info("=" * 70)
             logger.info("STARTING WEATHER INGESTION")
             logger.info("=" * 70)
             
-            raw_data = self.fetch_weather_data(start_date, end_date, use_historical_api)
-            if not raw_data:
-                return None
+            with stage("ingest", city_id=self.city_id, batch_id=self.batch_id) as ingested:
+                with stage("fetch") as fetched:
+                    raw_data = self.fetch_weather_data(start_date, end_date, use_historical_api)
+                    if raw_data:
+                        fetched["rows"] = len(raw_data["hourly"].get("time", [])) + len(raw_data["daily"].get("time", []))
+                    else:
+                        fetched["status"] = "failed"
+                if not raw_data:
+                    ingested["status"] = "failed"
+                    return None
+                    
+                with stage("validate") as validated:
+                    issues = validate_payload(raw_data, start_date, end_date)
+                    if issues:
+                        validated["status"] = "failed"
+                if issues:
+                    ingested["status"] = "failed"
+                    for found in issues:
+                        logger.error(f"Validation failed [{found['section']}.{found['check']}] {found['variable'] or ''} {found['detail']}")
+                    path = quarantine_payload(raw_data, issues, self.city_id, start_date, end_date, self.batch_id)
+                    logger.error(f"Quarantined {self.city_name} {start_date} to {end_date}: {path}")
+                    if self.use_cache and use_historical_api:
+                        # Otherwise a retry of the window gets the same payload from the cache
+                        response_cache.discard(*self.build_request(start_date, end_date, use_historical_api))
+                    return None
+                    
+                with stage("transform") as transformed:
+                    if self.engine == "arrow":
+                        hourly, daily = self.transform_to_arrow(raw_data)
+                    else:
+                        hourly, daily = self.transform_to_dataframe(raw_data)
+                    transformed["rows"] = len(hourly) + len(daily)
+                del raw_data
+                
+                with stage("parquet_write") as written:
+                    hourly_paths, daily_paths = self.save_to_parquet(hourly, daily, start_date, end_date)
+                    written["rows"] = len(hourly) + len(daily)
+                    written["bytes"] = sum(os.path.getsize(path) for path in hourly_paths + daily_paths)
+                log_ingestion_stats(self.city_name, start_date, end_date, len(hourly))
                 
-            df_hourly, df_daily = self.transform_to_dataframe(raw_data)
-            hourly_path, daily_path = self.save_to_parquet(df_hourly, df_daily, start_date, end_date)
-            log_ingestion_stats(self.city_name, start_date, end_date, len(df_hourly))
-            
             logger.info("INGESTION COMPLETED SUCCESSFULLY")
             logger.info("=" * 70)
             
-            return hourly_path
+            return hourly_paths
             
         except Exception as e:
             logger.error(f"INGESTION FAILED: {e}", exc_info=True)
             return None
 
 
+def run_cities(
+    city_ids: List[str],
+    start_date: str,
+    end_date: str,
+    use_historical_api: bool = True,
+    max_workers: int = MAX_CONCURRENT_REQUESTS,
+    use_cache: bool = True,
+    engine: str = TRANSFORM_ENGINE,
+    writer_profile: str = PARQUET_WRITER_PROFILE
+) -> Dict[str, Optional[List[str]]]:
+    """Ingest several cities concurrently, writing each city's files as soon as it completes."""
+    ingestions = [WeatherIngestion(city_id, use_cache, engine, writer_profile) for city_id in city_ids]
+    results = {}
+    
+    logger.info(f"Ingesting {len(ingestions)} cities with up to {max_workers} concurrent requests")
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest") as executor:
+        futures = {
+            executor.submit(ingestion.run, start_date, end_date, use_historical_api): ingestion.city_id
+            for ingestion in ingestions
+        }
+        for future in as_completed(futures):
+            city_id = futures[future]
+            results[city_id] = future.result()
+            
+    succeeded = sum(1 for paths in results.values() if paths)
+    logger.info(f"Multi-city ingestion finished: {succeeded}/{len(results)} cities succeeded")
+    return results
+
+
+def run_backfill(
+    city_ids: List[str],
+    start_date: str,
+    end_date: str,
+    window: str = BACKFILL_WINDOW,
+    max_workers: int = MAX_CONCURRENT_REQUESTS,
+    resume: bool = True,
+    use_cache: bool = True,
+    engine: str = TRANSFORM_ENGINE,
+    writer_profile: str = PARQUET_WRITER_PROFILE
+) -> List[Tuple[str, str, str]]:
+    """Backfill cities window by window in parallel, skipping checkpointed windows.
+    
+    Returns the (city_id, start_date, end_date) windows that failed.
+    """
+    windows = plan_windows(start_date, end_date, window)
+    checkpoints = {city_id: BackfillCheckpoint(city_id) for city_id in city_ids}
+    
+    pending = [
+        (city_id, window_start, window_end)
+        for city_id in city_ids
+        for window_start, window_end in windows
+        if not (resume and checkpoints[city_id].is_done(window_start, window_end))
+    ]
+    skipped = len(city_ids) * len(windows) - len(pending)
+    logger.info(
+        f"Backfill plan: {len(windows)} {window} window(s) x {len(city_ids)} cities, "
+        f"{skipped} already done, {len(pending)} to fetch"
+    )
+    
+    # One ingestion, and so one batch_id, per city and window
+    ingestions = {
+        (city_id, window_start, window_end): WeatherIngestion(
+            city_id, use_cache, engine, writer_profile, generate_batch_id(city_id, window_start)
+        )
+        for city_id, window_start, window_end in pending
+    }
+    
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backfill") as executor:
+        futures = {
+            executor.submit(ingestions[pending_window].run, pending_window[1], pending_window[2], True): pending_window
+            for pending_window in pending
+        }
+        for future in as_completed(futures):
+            city_id, window_start, window_end = futures[future]
+            hourly_paths = future.result()
+            if hourly_paths:
+                batch_id = ingestions[futures[future]].batch_id
+                checkpoints[city_id].mark_done(window_start, window_end, hourly_paths, batch_id)
+            else:
+                logger.error(f"Backfill window {window_start}..{window_end} failed for {city_id}")
+                failed.append((city_id, window_start, window_end))
+                
+    logger.info(f"Backfill finished: {len(pending) - len(failed)}/{len(pending)} window(s) succeeded")
+    return sorted(failed)
+
+
+def parse_cities(value: str) -> List[str]:
+    """Parse the --cities argument ('all' or a comma-separated list)."""
+    if value == "all":
+        return list(CITIES.keys())
+        
+    city_ids = [city.strip() for city in value.split(",") if city.strip()]
+    unknown = [city for city in city_ids if city not in CITIES]
+    if unknown or not city_ids:
+        raise argparse.ArgumentTypeError(
+            f"Unknown city: {', '.join(unknown) or value}. Available: {list(CITIES.keys())}"
+        )
+    return city_ids
+
+
 def main():
     """Command-line entry point."""
     parser = argparse.ArgumentParser(
@@ -160,16 +382,25 @@ def main():
 Examples:
   python weather_ingest.py --city amsterdam --mode backfill
   python weather_ingest.py --city new_york --mode incremental
+  python weather_ingest.py --cities all --mode incremental
+  python weather_ingest.py --cities amsterdam,paris --mode backfill --max-workers 2
+  python weather_ingest.py --cities all --mode backfill --window quarter
   python weather_ingest.py --city london --start-date 2024-01-01 --end-date 2024-01-31
         """
     )
     
-    parser.add_argument(
+    city_group = parser.add_mutually_exclusive_group()
+    city_group.add_argument(
         "--city",
         choices=list(CITIES.keys()),
         default="amsterdam",
         help="City to fetch data for"
     )
+    city_group.add_argument(
+        "--cities",
+        type=parse_cities,
+        help="Fetch several cities concurrently: 'all' or a comma-separated list"
+    )
     
     parser.add_argument(
         "--mode",
@@ -180,6 +411,50 @@ Examples:
     
     parser.add_argument("--start-date", help="Start date (YYYY-MM-DD)")
     parser.add_argument("--end-date", help="End date (YYYY-MM-DD)")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=MAX_CONCURRENT_REQUESTS,
+        help="Maximum number of concurrent API requests"
+    )
+    parser.add_argument(
+        "--window",
+        choices=WINDOW_CHOICES,
+        default=BACKFILL_WINDOW,
+        help="Window size used to split backfill requests"
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Refetch backfill windows that are already recorded as finished"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the on-disk response cache for archive requests"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=TRANSFORM_ENGINES,
+        default=TRANSFORM_ENGINE,
+        help="Transform engine used to build the Parquet tables"
+    )
+    parser.add_argument(
+        "--writer-profile",
+        choices=list(PARQUET_WRITER_PROFILES.keys()),
+        default=PARQUET_WRITER_PROFILE,
+        help="Parquet writer profile (compression, row groups, sort order, encodings)"
+    )
+    parser.add_argument(
+        "--metrics-db",
+        default=METRICS_DB_PATH,
+        help="DuckDB file whose metrics table receives per-stage timings"
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        default=METRICS_PROMETHEUS_PATH,
+        help="Also write per-stage metrics to this Prometheus text file"
+    )
     
     args = parser.parse_args()
     
@@ -199,14 +474,48 @@ Examples:
         end_date = args.end_date
         use_historical = True
         
-    ingestion = WeatherIngestion(args.city)
-    result = ingestion.run(start_date, end_date, use_historical)
+    try:
+        if args.mode == "backfill":
+            failed = run_backfill(
+                args.cities or [args.city], start_date, end_date,
+                args.window, args.max_workers,
+                resume=not args.no_resume, use_cache=not args.no_cache, engine=args.engine,
+                writer_profile=args.writer_profile
+            )
+            if failed:
+                for city_id, window_start, window_end in failed:
+                    print(f"{city_id}: {window_start} to {window_end} FAILED")
+                print("\nBackfill incomplete. Rerun the same command to resume.")
+                exit(1)
+            print("\nBackfill complete.")
+            return
+        
+        if args.cities:
+            results = run_cities(
+                args.cities, start_date, end_date, use_historical,
+                args.max_workers, use_cache=not args.no_cache, engine=args.engine,
+                writer_profile=args.writer_profile
+            )
+            failed = [city_id for city_id, paths in results.items() if not paths]
+            for city_id, paths in results.items():
+                print(f"{city_id}: {', '.join(paths) if paths else 'FAILED'}")
+            if failed:
+                print(f"\nIngestion failed for: {', '.join(failed)}. Check logs above.")
+                exit(1)
+            return
+        
+        ingestion = WeatherIngestion(
+            args.city, use_cache=not args.no_cache, engine=args.engine, writer_profile=args.writer_profile
+        )
+        result = ingestion.run(start_date, end_date, use_historical)
     
-    if result:
-        print(f"\nSuccess! Data saved to: {result}")
-    else:
-        print("\nIngestion failed. Check logs above.")
-        exit(1)
+        if result:
+            print(f"\nSuccess! Data saved to: {', '.join(result)}")
+        else:
+            print("\nIngestion failed. Check logs above.")
+            exit(1)
+    finally:
+        export_metrics(args.metrics_db, args.metrics_prometheus)
 
 
 if __name__ == "__main__":
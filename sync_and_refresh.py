@@ -1,51 +1,259 @@
 #!/usr/bin/env python3
-"""Sync data from S3 and refresh local database."""
+"""Sync data from S3 and refresh local database.
 
-import subprocess
+Everything runs in this process: the bucket listing and downloads go
+through boto3, the database is refreshed with setup_database's functions
+on one DuckDB connection, and dbt is invoked through dbtRunner. Only keys
+that are missing locally or changed remotely are downloaded, and the
+database is updated incrementally from the files it has not loaded yet,
+so a refresh with nothing new finishes in seconds. With --delete-missing local files whose
+object is gone (e.g. small files merged by compaction and removed with
+s3_upload.py --delete-missing) are deleted too, and the next load drops
+them from the loaded-files ledger.
+
+With --direct nothing is downloaded: the database build reads the Parquet
+files in place from S3 through a persistent local block cache (see
+duckdb/storage.py).
+"""
+
+import os
 import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 PROJECT_ROOT = Path(__file__).parent
 DATA_DIR = PROJECT_ROOT / "data" / "raw"
+DBT_PROJECT_DIR = PROJECT_ROOT / "weather_dbt"
+
+sys.path.insert(0, str(PROJECT_ROOT / "ingestion"))
+sys.path.insert(0, str(PROJECT_ROOT / "duckdb"))
+
+from config import S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, UPLOAD_MAX_WORKERS, METRICS_PROMETHEUS_PATH
+from metrics import export_metrics, stage
+from s3_upload import make_s3_client
+import setup_database
+from storage import S3Storage
+
+
+def list_remote_files(client, bucket: str, prefix: str) -> List[Dict]:
+    """Every Parquet object under prefix, with its size and modification time."""
+    objects = []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}/"):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(".parquet"):
+                objects.append({
+                    "key": obj["Key"],
+                    "size": obj["Size"],
+                    "mtime": obj["LastModified"].timestamp()
+                })
+    return objects
+
+
+def plan_downloads(objects: List[Dict], prefix: str, data_dir: Path) -> List[Dict]:
+    """Objects missing locally, or whose size or remote timestamp differs from the local copy."""
+    pending = []
+    for obj in objects:
+        path = data_dir / obj["key"][len(prefix) + 1:]
+        if path.exists():
+            stat = path.stat()
+            if stat.st_size == obj["size"] and int(stat.st_mtime) >= int(obj["mtime"]):
+                continue
+        pending.append({**obj, "path": path})
+    return pending
+
+
+def plan_removals(objects: List[Dict], prefix: str, data_dir: Path) -> List[Path]:
+    """Local files of the partitioned layout that have no object under prefix."""
+    remote = {data_dir / obj["key"][len(prefix) + 1:] for obj in objects}
+    return sorted(path for path in data_dir.glob("dataset=*/**/*.parquet") if path not in remote)
+
+
+def download_one(client, bucket: str, obj: Dict) -> Path:
+    """Download into a temporary file and move it into place, so loaders never see partial files."""
+    path = obj["path"]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    client.download_file(bucket, obj["key"], str(tmp_path))
+    # Stamp the remote time so the next sync recognises the file as current
+    os.utime(tmp_path, (obj["mtime"], obj["mtime"]))
+    os.replace(tmp_path, path)
+    return path
+
+
+def sync_from_s3(
+    bucket: str = S3_BUCKET,
+    prefix: str = S3_PREFIX,
+    data_dir: Path = DATA_DIR,
+    endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+    max_workers: int = UPLOAD_MAX_WORKERS,
+    dry_run: bool = False,
+    delete_missing: bool = False,
+    client=None
+) -> Tuple[List[Path], List[Path]]:
+    """Download new and changed objects concurrently; return the downloaded and the deleted local paths.
+
+    Local files are only deleted with delete_missing, because data_dir may
+    also hold files ingested locally that were never uploaded.
+    """
+    client = client or make_s3_client(endpoint_url, max_workers)
+    objects = list_remote_files(client, bucket, prefix)
+    pending = plan_downloads(objects, prefix, data_dir)
+    removals = plan_removals(objects, prefix, data_dir) if delete_missing else []
+    total_mb = sum(obj["size"] for obj in pending) / 1024 ** 2
+    print(
+        f"{len(objects)} remote file(s), {len(pending)} new or changed ({total_mb:.1f} MB), "
+        f"{len(removals)} local file(s) no longer in the bucket"
+    )
+    if dry_run:
+        for obj in pending:
+            print(f"  would download s3://{bucket}/{obj['key']}")
+        for path in removals:
+            print(f"  would delete {path}")
+        return [], []
+
+    downloaded = []
+    with stage("s3_sync") as synced, ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download") as executor:
+        futures = {executor.submit(download_one, client, bucket, obj): obj for obj in pending}
+        for future in as_completed(futures):
+            try:
+                downloaded.append(future.result())
+            except Exception as e:
+                raise RuntimeError(f"Download of s3://{bucket}/{futures[future]['key']} failed: {e}") from e
+            synced["bytes"] += futures[future]["size"]
+    for path in removals:
+        path.unlink(missing_ok=True)
+    return sorted(downloaded), removals
+
 
-def run_command(cmd, description):
-    """Run shell command and handle errors."""
+def refresh_database(full_refresh: bool = False, storage=None) -> Dict[str, List[str]]:
+    """Load new raw files and update derived tables on one DuckDB connection."""
+    setup_database.ensure_directories()
+    conn = setup_database.create_database()
+    try:
+        return setup_database.refresh_database(conn, full_refresh, storage)
+    finally:
+        # dbt opens the database file itself
+        conn.close()
+
+
+def run_dbt(profiles_dir: Optional[str] = None):
+    """Run the dbt models in-process."""
+    from dbt.cli.main import dbtRunner
+
+    args = ["run", "--project-dir", str(DBT_PROJECT_DIR)]
+    if profiles_dir:
+        args += ["--profiles-dir", profiles_dir]
+    with stage("dbt_run"):
+        result = dbtRunner().invoke(args)
+    if not result.success:
+        raise RuntimeError(f"dbt run failed: {result.exception}")
+
+
+def run_step(description: str, func, *args, **kwargs):
+    """Run one step, timing it and exiting on failure."""
     print(f"\n{'='*60}")
     print(f"{description}")
     print(f"{'='*60}")
-    result = subprocess.run(cmd, shell=True, capture_output=False)
-    if result.returncode != 0:
-        print(f"Error: {description} failed")
+    started = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        print(f"Error: {description} failed: {e}")
         sys.exit(1)
-    print(f"Success: {description} completed")
+    print(f"Success: {description} completed in {time.perf_counter() - started:.1f}s")
+    return result
+
+
+def report_new_files(new_files: List[Path], loaded: Dict[str, List[str]], removed_files: List[Path] = ()):
+    """Summarise which files arrived or were deleted and which batches they loaded."""
+    print(f"\nNew files: {len(new_files)}")
+    for path in new_files:
+        print(f"  {path.relative_to(DATA_DIR)}")
+    if removed_files:
+        print(f"Deleted files: {len(removed_files)}")
+        for path in removed_files:
+            print(f"  {path.relative_to(DATA_DIR)}")
+    for dataset, batch_ids in loaded.items():
+        if batch_ids:
+            print(f"New {dataset} batches: {', '.join(batch_ids)}")
+
 
 def main():
-    print("SYNCING DATA FROM S3 AND REFRESHING DATABASE")
-    
-    # Step 1: Download from S3
-    run_command(
-        f"{PROJECT_ROOT}/.venv/bin/aws s3 sync s3://weather-data-koorosh-thesis/raw/ {DATA_DIR}/",
-        "Downloading data from S3"
+    parser = argparse.ArgumentParser(
+        description="Sync raw Parquet files from S3 and refresh the local DuckDB database",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python sync_and_refresh.py
+  python sync_and_refresh.py --dry-run
+  python sync_and_refresh.py --skip-dbt
+  python sync_and_refresh.py --full-refresh
+  python sync_and_refresh.py --delete-missing
+  python sync_and_refresh.py --direct
+        """
     )
-    
-    # Step 2: Rebuild DuckDB database
-    run_command(
-        f"{PROJECT_ROOT}/.venv/bin/python {PROJECT_ROOT}/duckdb/setup_database.py",
-        "Rebuilding DuckDB database"
+    parser.add_argument("--bucket", default=S3_BUCKET, help="Source bucket")
+    parser.add_argument("--prefix", default=S3_PREFIX, help="Key prefix in the bucket")
+    parser.add_argument("--endpoint-url", default=S3_ENDPOINT_URL, help="S3-compatible endpoint, e.g. MinIO")
+    parser.add_argument("--max-workers", type=int, default=UPLOAD_MAX_WORKERS, help="Files downloaded in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the files that would be downloaded")
+    parser.add_argument("--full-refresh", action="store_true", help="Rebuild the database from every raw file")
+    parser.add_argument(
+        "--delete-missing",
+        action="store_true",
+        help="Delete local raw files whose object is no longer in the bucket (e.g. after compaction)"
     )
-    
-    # Step 3: Run dbt models
-    run_command(
-        f"cd {PROJECT_ROOT}/weather_dbt && ../.venv/bin/dbt run",
-        "Running dbt transformations"
+    parser.add_argument(
+        "--direct",
+        action="store_true",
+        help="Read raw Parquet in place from S3 (with a local block cache) instead of downloading it"
     )
-    
+    parser.add_argument("--skip-dbt", action="store_true", help="Do not run the dbt models")
+    parser.add_argument("--profiles-dir", help="dbt profiles directory (default: dbt's own lookup)")
+    parser.add_argument(
+        "--metrics-prometheus",
+        default=METRICS_PROMETHEUS_PATH,
+        help="Also write per-stage metrics to this Prometheus text file (they always go to the metrics table)"
+    )
+    args = parser.parse_args()
+
+    print("SYNCING DATA FROM S3 AND REFRESHING DATABASE")
+
+    storage = None
+    new_files, removed_files = [], []
+    if args.direct:
+        storage = S3Storage(f"s3://{args.bucket}/{args.prefix}", endpoint_url=args.endpoint_url)
+    else:
+        new_files, removed_files = run_step(
+            "Downloading new data from S3",
+            sync_from_s3, args.bucket, args.prefix, DATA_DIR, args.endpoint_url, args.max_workers,
+            args.dry_run, args.delete_missing
+        )
+        if args.dry_run:
+            return
+
+    # Always load, even when nothing was downloaded: data_dir may hold files ingested
+    # locally or left unloaded by an earlier failed run, and the incremental load of
+    # an unchanged directory only compares the file listing with its ledger
+    loaded = run_step("Loading new data into DuckDB database", refresh_database, args.full_refresh, storage)
+
+    if not args.skip_dbt:
+        run_step("Running dbt transformations", run_dbt, args.profiles_dir)
+
+    # After dbt, which needs the database file to itself
+    export_metrics(str(setup_database.DB_PATH), args.metrics_prometheus)
+    report_new_files(new_files, loaded, removed_files)
+
     print("\n" + "="*60)
     print("DATABASE READY FOR ANALYSIS")
     print("="*60)
-    print(f"\nDatabase: {PROJECT_ROOT}/duckdb/weather.db")
+    print(f"\nDatabase: {setup_database.DB_PATH}")
     print("\nQuery the data:")
-    print(f"  duckdb {PROJECT_ROOT}/duckdb/weather.db")
+    print(f"  duckdb {setup_database.DB_PATH}")
     print("\nOr use Python:")
     print(f"  python -c 'import duckdb; conn = duckdb.connect(\"duckdb/weather.db\"); print(conn.execute(\"SELECT * FROM analytics_mart.weather_daily LIMIT 5\").fetchdf())'")
 
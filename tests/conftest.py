@@ -0,0 +1,11 @@
+"""Shared fixtures; puts ingestion/, duckdb/ and benchmarks/ on sys.path as their scripts expect."""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+for directory in ("benchmarks", "duckdb", "ingestion"):
+    path = str(PROJECT_ROOT / directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,61 @@
+"""Tests for incremental rolling and seasonal anomaly scoring."""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+import duckdb
+import pytest
+
+from anomaly_engine import ANOMALY_SCORES_TABLE, build_anomaly_scores
+from schemas import LOADED_FILES_SCHEMA
+from setup_database import create_schemas, load_raw_dataset, mark_touched_days
+from storage import LocalStorage
+from tests.test_raw_load import write_batch
+
+START = datetime(2023, 12, 1)
+HOURS = [START + timedelta(hours=hour) for hour in range(77 * 24)]
+
+
+def scores(conn):
+    return conn.execute(f"""
+        SELECT time, variable, value, rolling_mean, rolling_stddev, rolling_count,
+            seasonal_mean, seasonal_stddev, seasonal_count, is_rolling_anomaly, is_seasonal_anomaly
+        FROM {ANOMALY_SCORES_TABLE}
+        ORDER BY time, variable
+    """).fetchall()
+
+
+def assert_rows_equal(actual, expected):
+    assert len(actual) == len(expected)
+    for a, e in zip(actual, expected):
+        for x, y in zip(a, e):
+            if isinstance(y, float) and not math.isnan(y):
+                assert x == pytest.approx(y), (a, e)
+            else:
+                assert x == y, (a, e)
+
+
+def test_incremental_scores_match_a_full_rebuild(tmp_path):
+    base_path = str(tmp_path)
+    rng = random.Random(3)
+    conn = duckdb.connect()
+    create_schemas(conn)
+    conn.execute(LOADED_FILES_SCHEMA)
+
+    write_batch(base_path, "20240301_000000_amsterdam", datetime(2024, 3, 1),
+                [(hour, rng.gauss(5, 2)) for hour in HOURS])
+    load_raw_dataset(conn, "hourly", full_refresh=True, storage=LocalStorage(base_path))
+    build_anomaly_scores(conn)
+
+    # Reingest one January day with very different values
+    reingested = [hour for hour in HOURS if hour.date() == datetime(2024, 1, 5).date()]
+    write_batch(base_path, "20240302_000000_amsterdam", datetime(2024, 3, 2),
+                [(hour, rng.gauss(25, 2)) for hour in reingested])
+    batch_ids = load_raw_dataset(conn, "hourly", full_refresh=False, storage=LocalStorage(base_path))
+    mark_touched_days(conn, batch_ids)
+    build_anomaly_scores(conn, incremental=True)
+    incremental = scores(conn)
+
+    build_anomaly_scores(conn)
+    assert_rows_equal(incremental, scores(conn))
@@ -0,0 +1,75 @@
+"""Tests for backfill window planning, checkpoints and per-window batches."""
+
+import pytest
+
+import weather_ingest
+from backfill import BackfillCheckpoint, plan_windows
+
+
+def test_month_windows_cut_at_month_ends():
+    assert plan_windows("2024-01-15", "2024-03-10", "month") == [
+        ("2024-01-15", "2024-01-31"),
+        ("2024-02-01", "2024-02-29"),
+        ("2024-03-01", "2024-03-10"),
+    ]
+
+
+def test_quarter_windows_align_to_calendar_quarters():
+    assert plan_windows("2024-02-10", "2024-10-01", "quarter") == [
+        ("2024-02-10", "2024-03-31"),
+        ("2024-04-01", "2024-06-30"),
+        ("2024-07-01", "2024-09-30"),
+        ("2024-10-01", "2024-10-01"),
+    ]
+
+
+def test_year_windows_cross_year_boundary():
+    assert plan_windows("2023-12-31", "2025-01-01", "year") == [
+        ("2023-12-31", "2023-12-31"),
+        ("2024-01-01", "2024-12-31"),
+        ("2025-01-01", "2025-01-01"),
+    ]
+
+
+def test_december_month_window_rolls_into_next_year():
+    assert plan_windows("2024-12-01", "2025-01-31", "month") == [
+        ("2024-12-01", "2024-12-31"),
+        ("2025-01-01", "2025-01-31"),
+    ]
+
+
+def test_none_window_keeps_range_whole():
+    assert plan_windows("2024-01-01", "2025-12-31", "none") == [("2024-01-01", "2025-12-31")]
+
+
+@pytest.mark.parametrize("start, end, window", [("2024-02-01", "2024-01-01", "month"), ("2024-01-01", "2024-02-01", "week")])
+def test_invalid_plans_raise(start, end, window):
+    with pytest.raises(ValueError):
+        plan_windows(start, end, window)
+
+
+def test_checkpoint_survives_reload(tmp_path):
+    checkpoint = BackfillCheckpoint("amsterdam", str(tmp_path))
+    checkpoint.mark_done("2024-01-01", "2024-01-31", ["a.parquet"], "batch")
+
+    reloaded = BackfillCheckpoint("amsterdam", str(tmp_path))
+
+    assert reloaded.is_done("2024-01-01", "2024-01-31")
+    assert not reloaded.is_done("2024-02-01", "2024-02-29")
+
+
+def test_each_backfill_window_is_its_own_batch(monkeypatch, tmp_path):
+    monkeypatch.setattr(weather_ingest, "BackfillCheckpoint", lambda city_id: BackfillCheckpoint(city_id, str(tmp_path)))
+    monkeypatch.setattr(weather_ingest.WeatherIngestion, "run", lambda self, start, end, *args: [f"{start}.parquet"])
+
+    failed = weather_ingest.run_backfill(["amsterdam", "paris"], "2024-01-01", "2024-03-31", "month", resume=False)
+
+    assert failed == []
+    batch_ids = [
+        window["batch_id"]
+        for city_id in ("amsterdam", "paris")
+        for window in BackfillCheckpoint(city_id, str(tmp_path)).windows.values()
+    ]
+    assert len(batch_ids) == 6
+    assert len(set(batch_ids)) == 6
+    assert any(batch_id.endswith("_paris_20240201") for batch_id in batch_ids)
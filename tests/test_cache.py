@@ -0,0 +1,85 @@
+"""Tests for the on-disk API response cache."""
+
+import os
+import time
+
+import cache
+from cache import ResponseCache, archive_ttl_seconds
+
+URL = "https://archive.example/v1/archive"
+
+
+def params(day: int) -> dict:
+    return {"latitude": 52.37, "longitude": 4.9, "start_date": f"2024-01-{day:02d}", "end_date": f"2024-01-{day:02d}"}
+
+
+def disk_size(response_cache: ResponseCache) -> int:
+    return sum(os.path.getsize(path) for path in response_cache._entries())
+
+
+def test_round_trip_and_key_ignores_unrelated_params(tmp_path):
+    response_cache = ResponseCache(str(tmp_path))
+    response_cache.put(URL, params(1), {"hourly": {"time": [1]}})
+
+    assert response_cache.get(URL, {**params(1), "apikey": "other"}, ttl_seconds=60) == {"hourly": {"time": [1]}}
+    assert response_cache.get(URL, params(2), ttl_seconds=60) is None
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    response_cache = ResponseCache(str(tmp_path))
+    response_cache.put(URL, params(1), {"a": 1})
+    path = response_cache._path(response_cache.make_key(URL, params(1)))
+    written = time.time() - 3600
+    os.utime(path, (written, written))
+
+    assert response_cache.get(URL, params(1), ttl_seconds=60) is None
+    assert response_cache.get(URL, params(1), ttl_seconds=7200) == {"a": 1}
+
+
+def test_settled_windows_get_archive_ttl(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_ARCHIVE_TTL_DAYS", 365)
+    monkeypatch.setattr(cache, "CACHE_RECENT_TTL_HOURS", 6)
+
+    assert archive_ttl_seconds("2000-01-01") == 365 * 86400
+    assert archive_ttl_seconds("2999-01-01") == 6 * 3600
+
+
+def test_overwriting_an_entry_does_not_inflate_tracked_size(tmp_path):
+    response_cache = ResponseCache(str(tmp_path))
+    response_cache.put(URL, params(1), {"values": list(range(500))})
+    response_cache.put(URL, params(2), {"values": [1]})
+
+    for _ in range(5):
+        response_cache.put(URL, params(1), {"values": list(range(500))})
+
+    assert response_cache._size == disk_size(response_cache)
+
+
+def test_lru_eviction_keeps_recently_read_entries(tmp_path):
+    response_cache = ResponseCache(str(tmp_path))
+    payload = {"values": list(range(2000))}
+    for day in (1, 2, 3):
+        response_cache.put(URL, params(day), payload)
+        path = response_cache._path(response_cache.make_key(URL, params(day)))
+        os.utime(path, (1000 + day, time.time()))
+    entry_size = disk_size(response_cache) // 3
+    response_cache.get(URL, params(1), ttl_seconds=60)
+
+    response_cache.max_bytes = entry_size * 3
+    response_cache.put(URL, params(4), payload)
+
+    assert response_cache.get(URL, params(2), ttl_seconds=60) is None
+    assert response_cache.get(URL, params(1), ttl_seconds=60) == payload
+    assert response_cache._size == disk_size(response_cache) <= response_cache.max_bytes
+
+
+def test_discard_removes_entry_and_its_size(tmp_path):
+    response_cache = ResponseCache(str(tmp_path))
+    response_cache.put(URL, params(1), {"a": 1})
+    response_cache.put(URL, params(2), {"b": 2})
+
+    response_cache.discard(URL, params(1))
+    response_cache.discard(URL, params(1))
+
+    assert response_cache.get(URL, params(1), ttl_seconds=60) is None
+    assert response_cache._size == disk_size(response_cache)
@@ -0,0 +1,101 @@
+"""Tests for the rule-based data quality engine."""
+
+from datetime import datetime
+
+import duckdb
+import pytest
+
+from config import CITIES
+from dq_engine import evaluate_table, expand_rules, load_rules, sql_literal
+from schema_registry import DATASET_VARIABLES, variable_range
+
+
+def rules_by_name(spec):
+    return {rule["name"]: rule for rule in expand_rules(spec)}
+
+
+def test_not_null_expands_to_one_rule_per_column():
+    rules = rules_by_name({"rules": [{"type": "not_null", "columns": ["time", "city_id"]}]})
+
+    assert rules["not_null_time"]["violation"] == "time IS NULL"
+    assert rules["not_null_city_id"]["columns"] == ["city_id"]
+    assert rules["not_null_city_id"]["severity"] == "error"
+
+
+def test_unique_rule_counts_duplicates_per_key():
+    rule, = expand_rules({"rules": [{"type": "unique", "columns": ["city_id", "time"], "severity": "warn"}]})
+
+    assert rule["name"] == "unique_city_id_time"
+    assert rule["violation"] == "COUNT(*) OVER (PARTITION BY city_id, time) > 1"
+    assert rule["severity"] == "warn"
+
+
+def test_range_rules_use_given_bounds_or_the_registry():
+    rules = rules_by_name({"rules": [
+        {"type": "range", "column": "a", "min": 0},
+        {"type": "range", "column": "b", "min": -1.5, "max": 2},
+    ]})
+    assert rules["range_a"]["violation"] == "a < 0"
+    assert rules["range_b"]["violation"] == "b < -1.5 OR b > 2"
+
+    registry = rules_by_name({"dataset": "hourly", "rules": [{"type": "range", "registry": True}]})
+    checked = [variable for variable in DATASET_VARIABLES["hourly"] if variable_range(variable)]
+    assert sorted(registry) == sorted(f"range_{variable}" for variable in checked)
+
+
+def test_range_rule_without_bounds_is_rejected():
+    with pytest.raises(ValueError, match="min or max"):
+        expand_rules({"rules": [{"type": "range", "column": "a"}]})
+
+
+def test_relationship_and_expression_rules():
+    rules = rules_by_name({"rules": [
+        {"type": "relationship", "column": "city_id", "to": "cities"},
+        {"type": "expression", "name": "ordered", "expression": "low <= high", "columns": ["low", "high"]},
+    ]})
+
+    assert rules["relationship_city_id_cities"]["violation"].startswith("city_id NOT IN (")
+    assert all(sql_literal(city) in rules["relationship_city_id_cities"]["violation"] for city in CITIES)
+    assert rules["ordered"]["violation"] == "NOT (low <= high)"
+
+
+def test_unknown_rule_type_is_rejected():
+    with pytest.raises(ValueError, match="Unknown data quality rule type"):
+        expand_rules({"rules": [{"type": "regex"}]})
+
+
+def test_sql_literal_escapes_quotes():
+    assert sql_literal("O'Hare") == "'O''Hare'"
+    assert sql_literal(2.5) == "2.5"
+
+
+def test_shipped_rules_expand():
+    for spec in load_rules().values():
+        assert expand_rules(spec)
+
+
+def test_evaluate_table_counts_violations_in_one_scan():
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE readings (city_id VARCHAR, time TIMESTAMP, value DOUBLE, batch_id VARCHAR)")
+    conn.executemany("INSERT INTO readings VALUES (?, ?, ?, ?)", [
+        ["amsterdam", datetime(2024, 1, 1, 0), 1.0, "a"],
+        ["amsterdam", datetime(2024, 1, 1, 0), 2.0, "a"],
+        ["amsterdam", datetime(2024, 1, 1, 1), None, "b"],
+        ["amsterdam", datetime(2024, 1, 1, 2), 50.0, "b"],
+    ])
+    spec = {"key": ["city_id", "time"], "batch_column": "batch_id", "rules": [
+        {"type": "unique", "columns": ["city_id", "time"]},
+        {"type": "not_null", "columns": ["value"]},
+        {"type": "range", "column": "value", "max": 10, "severity": "warn"},
+    ]}
+
+    results = {r["rule_name"]: r for r in evaluate_table(conn, "readings", spec)}
+    assert {name: (r["failed_count"], r["status"]) for name, r in results.items()} == {
+        "unique_city_id_time": (2, "fail"),
+        "not_null_value": (1, "fail"),
+        "range_value": (1, "warn"),
+    }
+    assert results["range_value"]["sample_rows"] == ['{"city_id":"amsterdam","time":"2024-01-01 02:00:00","value":50.0}']
+
+    batch_b = {r["rule_name"]: r["failed_count"] for r in evaluate_table(conn, "readings", spec, ["b"])}
+    assert batch_b == {"unique_city_id_time": 0, "not_null_value": 1, "range_value": 1}
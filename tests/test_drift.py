@@ -0,0 +1,73 @@
+"""Tests for sketch-based drift scores."""
+
+from datetime import datetime, timedelta
+
+import duckdb
+import numpy as np
+import pytest
+
+from drift import KS_MIN_SAMPLES, PSI_THRESHOLD, detect_drift, ks_critical, ks_statistic, psi, score_column
+from profiler import profile_raw_files
+from sketches import ColumnProfile, TDigest
+from storage import LocalStorage
+from tests.test_raw_load import write_batch
+
+rng = np.random.default_rng(21)
+REFERENCE = rng.normal(10, 2, 20_000)
+
+
+def test_psi_and_ks_are_small_for_the_same_distribution():
+    batch = TDigest.from_values(rng.normal(10, 2, 5_000))
+    reference = TDigest.from_values(REFERENCE)
+
+    assert psi(batch, reference) < 0.02
+    assert ks_statistic(batch, reference) < ks_critical(5_000, 20_000)
+
+
+def test_psi_and_ks_grow_with_a_shift():
+    batch = TDigest.from_values(rng.normal(13, 2, 5_000))
+    reference = TDigest.from_values(REFERENCE)
+
+    assert psi(batch, reference) > PSI_THRESHOLD
+    # Two normals one and a half sigma apart differ by about 0.55 in CDF at the midpoint
+    assert ks_statistic(batch, reference) == pytest.approx(0.55, abs=0.03)
+
+
+def test_empty_digests_have_no_scores():
+    reference = TDigest.from_values(REFERENCE)
+    assert psi(TDigest(), reference) is None
+    assert ks_statistic(reference, TDigest()) is None
+    assert ks_critical(0, 100) is None
+
+
+def test_small_batches_are_not_flagged():
+    reference = ColumnProfile.from_values(REFERENCE)
+    day = ColumnProfile.from_values(rng.normal(12, 2, 24))
+    month = ColumnProfile.from_values(rng.normal(12, 2, 24 * 30))
+
+    small = score_column(day, reference)
+    assert small["ks"] > small["ks_critical"] and not small["is_drift"]
+    assert score_column(month, reference)["is_drift"]
+    assert KS_MIN_SAMPLES > 24
+
+
+def test_first_batch_of_a_city_is_never_a_target(tmp_path):
+    base_path = str(tmp_path)
+    conn = duckdb.connect()
+    start = datetime(2024, 1, 1)
+    hours = [start + timedelta(hours=hour) for hour in range(24 * 10)]
+    write_batch(base_path, "20240201_000000_amsterdam", datetime(2024, 2, 1), [(hour, 5.0 + hour.hour) for hour in hours])
+    profile_raw_files(conn, LocalStorage(base_path))
+
+    assert detect_drift(conn) == 0
+    assert detect_drift(conn) == 0
+    assert conn.execute("SELECT COUNT(*) FROM profile.drift_scores").fetchone()[0] == 0
+
+    later = [hour + timedelta(days=10) for hour in hours]
+    write_batch(base_path, "20240202_000000_amsterdam", datetime(2024, 2, 2), [(hour, 25.0 + hour.hour) for hour in later])
+    profile_raw_files(conn, LocalStorage(base_path))
+
+    assert detect_drift(conn) == 1
+    assert conn.execute("""
+        SELECT batch_id, is_drift FROM profile.drift_scores WHERE column_name = 'temperature_2m'
+    """).fetchall() == [("20240202_000000_amsterdam", True)]
@@ -0,0 +1,79 @@
+"""Tests for stage metrics and their exports."""
+
+import duckdb
+import pytest
+
+from metrics import MetricsCollector, export_metrics, prometheus_text, stage, write_duckdb_file
+
+
+def record_stages(collector: MetricsCollector):
+    with stage("transform", collector, city_id="amsterdam", batch_id="b1") as m:
+        m["rows"] = 10
+    with stage("transform", collector, city_id="amsterdam", batch_id="b2") as m:
+        m["rows"] = 5
+    with stage("transform", collector, city_id="berlin", batch_id="b2") as m:
+        m["status"] = "failed"
+    with pytest.raises(ValueError):
+        with stage("transform", collector, city_id="berlin", batch_id="b3"):
+            raise ValueError("bad payload")
+
+
+def test_stage_records_status_and_inherits_tags():
+    collector = MetricsCollector()
+    with stage("ingest", collector, city_id="amsterdam", batch_id="b1"):
+        with stage("fetch", collector):
+            pass
+    record_stages(collector)
+    records = collector.drain()
+
+    assert [(r["stage"], r["city_id"], r["batch_id"], r["status"]) for r in records] == [
+        ("fetch", "amsterdam", "b1", "ok"),
+        ("ingest", "amsterdam", "b1", "ok"),
+        ("transform", "amsterdam", "b1", "ok"),
+        ("transform", "amsterdam", "b2", "ok"),
+        ("transform", "berlin", "b2", "failed"),
+        ("transform", "berlin", "b3", "error"),
+    ]
+    assert collector.drain() == []
+
+
+def test_prometheus_series_are_per_stage_and_city():
+    collector = MetricsCollector()
+    record_stages(collector)
+    text = prometheus_text(collector.drain())
+
+    assert "batch_id" not in text
+    assert 'weather_stage_rows{stage="transform",city_id="amsterdam"} 15' in text
+    assert 'weather_stage_calls{stage="transform",city_id="amsterdam"} 2' in text
+    assert 'weather_stage_errors{stage="transform",city_id="berlin"} 2' in text
+
+
+def test_failed_exports_do_not_raise(tmp_path):
+    collector = MetricsCollector()
+    record_stages(collector)
+    records = collector.records()
+    # A metrics table from an older schema cannot take the records
+    db_path = str(tmp_path / "metrics.db")
+    conn = duckdb.connect(db_path)
+    conn.execute("CREATE TABLE metrics (run_id VARCHAR)")
+    conn.close()
+    # A file where the Prometheus directory should be
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+
+    assert write_duckdb_file(db_path, records, retries=1) is False
+    assert export_metrics(db_path, str(blocker / "weather.prom"), collector=collector) == records
+
+
+def test_exports_write_the_records(tmp_path):
+    collector = MetricsCollector()
+    record_stages(collector)
+    db_path = str(tmp_path / "metrics.db")
+    prometheus_path = tmp_path / "textfile" / "weather.prom"
+
+    export_metrics(db_path, str(prometheus_path), collector=collector)
+
+    conn = duckdb.connect(db_path)
+    assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT batch_id) FROM metrics").fetchone() == (4, 3)
+    conn.close()
+    assert prometheus_path.read_text().startswith("# HELP weather_stage_duration_seconds")
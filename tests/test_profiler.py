@@ -0,0 +1,80 @@
+"""Tests for incremental column profiling of the raw dataset."""
+
+import os
+import glob
+from datetime import datetime, timedelta
+
+import duckdb
+import pytest
+
+from compaction import CompactionManifest, compact_dataset
+from profiler import BATCH_KEYS, PARTITION_KEYS, load_profiles, profile_raw_files
+from storage import LocalStorage
+from tests.test_raw_load import write_batch
+
+
+def day_rows(day: int, offset: float = 0.0):
+    start = datetime(2024, 1, day)
+    return [(start + timedelta(hours=hour), float(day * 10 + hour) + offset) for hour in range(24)]
+
+
+def summaries(conn, table: str, keys):
+    return {
+        key: profile.summary()
+        for key, profile in load_profiles(conn, table, keys, "WHERE dataset = 'hourly'").items()
+    }
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    base_path = str(tmp_path / "raw")
+    for day in (1, 2, 3):
+        write_batch(base_path, f"2024010{day}_000000_amsterdam", datetime(2024, 1, day), day_rows(day))
+    return base_path
+
+
+def profile(conn, base_path):
+    return profile_raw_files(conn, LocalStorage(base_path))
+
+
+def check_against_full_refresh(conn, base_path):
+    full = duckdb.connect()
+    profile_raw_files(full, LocalStorage(base_path), full_refresh=True)
+    for table, keys in (("profile.partition_profiles", PARTITION_KEYS), ("profile.batch_profiles", BATCH_KEYS)):
+        assert summaries(conn, table, keys) == summaries(full, table, keys)
+
+
+def test_incremental_profile_after_compaction(dataset, tmp_path):
+    conn = duckdb.connect()
+    profile(conn, dataset)
+    compact_dataset("hourly", dataset, CompactionManifest(str(tmp_path / "manifest.jsonl")))
+
+    assert profile(conn, dataset)["hourly"] == []
+    check_against_full_refresh(conn, dataset)
+
+    write_batch(dataset, "20240104_000000_amsterdam", datetime(2024, 1, 4), day_rows(4))
+
+    assert profile(conn, dataset)["hourly"] == ["20240104_000000_amsterdam"]
+    check_against_full_refresh(conn, dataset)
+
+
+def test_incremental_profile_when_every_file_is_stale(dataset):
+    conn = duckdb.connect()
+    profile(conn, dataset)
+    for path in glob.glob(os.path.join(dataset, "**", "*.parquet"), recursive=True):
+        os.utime(path, (1_000_000_000, 1_000_000_000))
+
+    assert profile(conn, dataset)["hourly"] == []
+    check_against_full_refresh(conn, dataset)
+
+
+def test_replaced_batches_are_profiled_from_their_remaining_rows(dataset):
+    conn = duckdb.connect()
+    profile(conn, dataset)
+    write_batch(dataset, "20240105_000000_amsterdam", datetime(2024, 1, 5), day_rows(2, offset=100.0))
+
+    assert profile(conn, dataset)["hourly"] == ["20240105_000000_amsterdam"]
+    check_against_full_refresh(conn, dataset)
+    assert ("hourly", "20240102_000000_amsterdam", "amsterdam", "temperature_2m") not in load_profiles(
+        conn, "profile.batch_profiles", BATCH_KEYS, "WHERE dataset = 'hourly'"
+    )
@@ -0,0 +1,102 @@
+"""Tests for the deduplicating raw load in setup_database.py."""
+
+from datetime import datetime
+
+import duckdb
+import pyarrow as pa
+import pytest
+
+from raw_layout import write_partitioned
+from schema_registry import conform_table
+from schemas import LOADED_FILES_SCHEMA
+from setup_database import create_schemas, load_raw_dataset
+from storage import LocalStorage
+
+HOUR = datetime(2024, 1, 1, 0)
+NEXT_HOUR = datetime(2024, 1, 1, 1)
+
+
+def write_batch(base_path, batch_id, ingested, rows):
+    table = conform_table(pa.table({
+        "city_id": ["amsterdam"] * len(rows),
+        "time": [time for time, _ in rows],
+        "temperature_2m": [value for _, value in rows],
+        "batch_id": [batch_id] * len(rows),
+        "ingestion_timestamp": [ingested] * len(rows),
+    }), "hourly")
+    write_partitioned(table, "hourly", "amsterdam", f"{batch_id}.parquet", base_path)
+
+
+def load(conn, base_path, full_refresh):
+    return load_raw_dataset(conn, "hourly", full_refresh=full_refresh, storage=LocalStorage(base_path))
+
+
+def stored(conn):
+    return conn.execute("""
+        SELECT time, temperature_2m, batch_id FROM raw.weather_hourly ORDER BY time
+    """).fetchall()
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect()
+    create_schemas(conn)
+    conn.execute(LOADED_FILES_SCHEMA)
+    yield conn
+    conn.close()
+
+
+def test_latest_ingestion_wins_within_one_load(conn, tmp_path):
+    base_path = str(tmp_path)
+    write_batch(base_path, "20240102_000000_amsterdam", datetime(2024, 1, 2), [(HOUR, 1.0), (NEXT_HOUR, 2.0)])
+    write_batch(base_path, "20240103_000000_amsterdam", datetime(2024, 1, 3), [(HOUR, 10.0)])
+
+    load(conn, base_path, full_refresh=True)
+
+    assert stored(conn) == [
+        (HOUR, 10.0, "20240103_000000_amsterdam"),
+        (NEXT_HOUR, 2.0, "20240102_000000_amsterdam"),
+    ]
+
+
+def test_equal_ingestion_timestamps_keep_the_highest_batch_id(conn, tmp_path):
+    base_path = str(tmp_path)
+    ingested = datetime(2024, 1, 2)
+    write_batch(base_path, "20240102_000000_amsterdam_20240101", ingested, [(HOUR, 1.0)])
+    write_batch(base_path, "20240102_000000_amsterdam_20240201", ingested, [(HOUR, 2.0)])
+
+    load(conn, base_path, full_refresh=True)
+
+    assert stored(conn) == [(HOUR, 2.0, "20240102_000000_amsterdam_20240201")]
+
+
+@pytest.mark.parametrize("late_batch, late_ingested, expected", [
+    ("20240101_000000_amsterdam", datetime(2024, 1, 1), 2.0),
+    ("20240103_000000_amsterdam", datetime(2024, 1, 3), 3.0),
+    ("20240102_000000_amsterdam_a", datetime(2024, 1, 2), 2.0),
+    ("20240102_000000_amsterdam_z", datetime(2024, 1, 2), 3.0),
+])
+def test_incremental_load_agrees_with_full_refresh(conn, tmp_path, late_batch, late_ingested, expected):
+    base_path = str(tmp_path)
+    write_batch(base_path, "20240102_000000_amsterdam_m", datetime(2024, 1, 2), [(HOUR, 2.0)])
+    load(conn, base_path, full_refresh=True)
+
+    write_batch(base_path, late_batch, late_ingested, [(HOUR, 3.0)])
+    load(conn, base_path, full_refresh=False)
+    incremental = stored(conn)
+    load(conn, base_path, full_refresh=True)
+
+    assert incremental == stored(conn)
+    assert [value for _, value, _ in incremental] == [expected]
+
+
+def test_replaced_rows_are_logged(conn, tmp_path):
+    base_path = str(tmp_path)
+    write_batch(base_path, "20240102_000000_amsterdam", datetime(2024, 1, 2), [(HOUR, 1.0), (NEXT_HOUR, 2.0)])
+    load(conn, base_path, full_refresh=True)
+    write_batch(base_path, "20240103_000000_amsterdam", datetime(2024, 1, 3), [(HOUR, 10.0)])
+    load(conn, base_path, full_refresh=False)
+
+    assert conn.execute("""
+        SELECT time, temperature_2m, batch_id, replaced_at IS NOT NULL FROM raw.weather_hourly_replaced
+    """).fetchall() == [(HOUR, 1.0, "20240102_000000_amsterdam", True)]
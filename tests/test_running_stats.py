@@ -0,0 +1,72 @@
+"""Tests for Chan-merged running moments."""
+
+import duckdb
+import numpy as np
+import pytest
+
+from running_stats import merge_moments, moments_select, rebuild_moments
+
+KEYS = [("city_id", "VARCHAR")]
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect()
+    rng = np.random.default_rng(7)
+    conn.execute("CREATE TABLE rows (batch INTEGER, city_id VARCHAR, temperature DOUBLE)")
+    conn.executemany("INSERT INTO rows VALUES (?, ?, ?)", [
+        [batch, city_id, float(rng.normal(10 * batch, 3))]
+        for batch in range(3) for city_id in ("amsterdam", "berlin") for _ in range(50)
+    ])
+    yield conn
+    conn.close()
+
+
+def moments(conn, where: str) -> str:
+    return moments_select(f"SELECT * FROM rows WHERE {where}", ["city_id"], ["temperature"])
+
+
+def stored(conn, table: str):
+    return conn.execute(f"SELECT city_id, metric, n, mean, m2 FROM {table} ORDER BY city_id").fetchall()
+
+
+def assert_moments_equal(actual, expected):
+    assert [row[:3] for row in actual] == [row[:3] for row in expected]
+    for a, e in zip(actual, expected):
+        assert a[3] == pytest.approx(e[3]) and a[4] == pytest.approx(e[4])
+
+
+def test_merging_batches_matches_a_rebuild(conn):
+    rebuild_moments(conn, "moments", moments(conn, "batch = 0"), KEYS)
+    merge_moments(conn, "moments", moments(conn, "batch = 1"), ["city_id"])
+    merge_moments(conn, "moments", moments(conn, "batch = 2"), ["city_id"])
+
+    rebuild_moments(conn, "expected", moments(conn, "true"), KEYS)
+    assert_moments_equal(stored(conn, "moments"), stored(conn, "expected"))
+
+    values = [value for value, in conn.execute("SELECT temperature FROM rows WHERE city_id = 'amsterdam'").fetchall()]
+    _, _, n, mean, m2 = stored(conn, "moments")[0]
+    assert (n, mean, m2 / (n - 1)) == (150, pytest.approx(np.mean(values)), pytest.approx(np.var(values, ddof=1)))
+
+
+def test_removing_a_batch_matches_a_rebuild_without_it(conn):
+    rebuild_moments(conn, "moments", moments(conn, "true"), KEYS)
+    merge_moments(conn, "moments", moments(conn, "batch = 1"), ["city_id"], remove=True)
+
+    rebuild_moments(conn, "expected", moments(conn, "batch <> 1"), KEYS)
+    assert_moments_equal(stored(conn, "moments"), stored(conn, "expected"))
+
+
+def test_removing_every_row_leaves_empty_moments(conn):
+    rebuild_moments(conn, "moments", moments(conn, "city_id = 'berlin'"), KEYS)
+    merge_moments(conn, "moments", moments(conn, "city_id = 'berlin'"), ["city_id"], remove=True)
+
+    assert stored(conn, "moments") == [("berlin", "temperature", 0, 0, 0)]
+
+
+def test_new_keys_are_inserted(conn):
+    rebuild_moments(conn, "moments", moments(conn, "city_id = 'berlin'"), KEYS)
+    merge_moments(conn, "moments", moments(conn, "city_id = 'amsterdam'"), ["city_id"])
+
+    rebuild_moments(conn, "expected", moments(conn, "true"), KEYS)
+    assert_moments_equal(stored(conn, "moments"), stored(conn, "expected"))
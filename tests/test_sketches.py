@@ -0,0 +1,72 @@
+"""Tests for the mergeable profiling sketches."""
+
+import numpy as np
+import pytest
+
+from sketches import ColumnProfile, HyperLogLog, TDigest
+
+
+@pytest.fixture
+def halves():
+    rng = np.random.default_rng(11)
+    values = np.concatenate([rng.normal(0, 1, 20_000), rng.exponential(5, 20_000)])
+    rng.shuffle(values)
+    return values, values[:20_000], values[20_000:]
+
+
+def test_merged_tdigest_quantiles_match_the_data(halves):
+    values, left, right = halves
+    merged = TDigest.from_values(left).merge(TDigest.from_values(right))
+
+    assert merged.weights.sum() == len(values)
+    assert len(merged.means) <= 2 * merged.compression
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        assert merged.quantile(q) == pytest.approx(np.quantile(values, q), abs=0.05 * values.std())
+
+
+def test_tdigest_merge_with_empty_digest_is_identity(halves):
+    _, left, _ = halves
+    digest = TDigest.from_values(left)
+    merged = digest.merge(TDigest())
+
+    assert merged.quantile(0.5) == pytest.approx(digest.quantile(0.5))
+    assert TDigest().quantile(0.5) is None
+
+
+def test_hll_merge_equals_sketch_of_the_union():
+    rng = np.random.default_rng(5)
+    left = rng.integers(0, 30_000, 50_000).astype(np.float64)
+    right = rng.integers(20_000, 50_000, 50_000).astype(np.float64)
+
+    merged = HyperLogLog.from_values(left).merge(HyperLogLog.from_values(right))
+
+    assert np.array_equal(merged.registers, HyperLogLog.from_values(np.concatenate([left, right])).registers)
+    assert merged.estimate() == pytest.approx(len(np.unique(np.concatenate([left, right]))), rel=0.05)
+
+
+def test_hll_small_cardinalities_are_exact_enough():
+    assert HyperLogLog.from_values(np.arange(10, dtype=np.float64)).estimate() == pytest.approx(10, abs=1)
+    assert HyperLogLog().estimate() == 0
+
+
+def test_column_profile_merge_matches_profile_of_all_rows(halves):
+    values, left, right = halves
+    values = values.copy()
+    values[::100] = np.nan
+    left, right = values[:20_000], values[20_000:]
+
+    merged = ColumnProfile.from_values(left).merge(ColumnProfile.from_values(right))
+    whole = ColumnProfile.from_values(values)
+
+    assert (merged.row_count, merged.null_count, merged.n) == (whole.row_count, whole.null_count, whole.n)
+    assert (merged.min_value, merged.max_value) == (whole.min_value, whole.max_value)
+    assert merged.mean == pytest.approx(whole.mean)
+    assert merged.variance == pytest.approx(whole.variance)
+
+
+def test_column_profile_round_trips_through_a_record(halves):
+    _, left, _ = halves
+    profile = ColumnProfile.from_values(left)
+    restored = ColumnProfile.from_record(profile.to_record())
+
+    assert restored.summary() == profile.summary()
@@ -0,0 +1,57 @@
+"""Tests for reading the raw dataset in place from S3 through the block cache."""
+
+import io
+import os
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip("s3fs")
+moto_server = pytest.importorskip("moto.server")
+
+from storage import LocalStorage, S3Storage, open_storage
+
+BUCKET = "weather-test"
+KEY = "raw/dataset=hourly/city_id=amsterdam/year=2024/month=1/a.parquet"
+
+
+def parquet_bytes(values) -> bytes:
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({"temperature_2m": values}), buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    server = moto_server.ThreadedMotoServer(port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    url = f"http://{host}:{port}"
+    boto3.client("s3", endpoint_url=url, region_name="us-east-1").create_bucket(Bucket=BUCKET)
+    yield url
+    server.stop()
+
+
+def test_open_storage_picks_the_backend(tmp_path):
+    assert isinstance(open_storage(str(tmp_path)), LocalStorage)
+
+
+def test_rewritten_object_is_fetched_again(endpoint, tmp_path):
+    client = boto3.client("s3", endpoint_url=endpoint, region_name="us-east-1")
+    client.put_object(Bucket=BUCKET, Key=KEY, Body=parquet_bytes([1.0, 2.0]))
+    storage = S3Storage(f"s3://{BUCKET}/raw", endpoint_url=endpoint, region="us-east-1", cache_path=str(tmp_path / "cache"))
+
+    files = storage.list_files("hourly")
+    assert [f["path"] for f in files] == [f"s3://{BUCKET}/{KEY}"]
+    assert storage.read_table(files[0]["path"]).column("temperature_2m").to_pylist() == [1.0, 2.0]
+    assert os.listdir(tmp_path / "cache")
+
+    client.put_object(Bucket=BUCKET, Key=KEY, Body=parquet_bytes([3.0, 4.0, 5.0]))
+    files = storage.list_files("hourly")
+
+    for _ in range(2):
+        assert storage.read_table(files[0]["path"]).column("temperature_2m").to_pylist() == [3.0, 4.0, 5.0]
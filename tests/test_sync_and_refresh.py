@@ -0,0 +1,69 @@
+"""Tests for the S3 sync and database refresh entry point."""
+
+import sys
+
+import boto3
+import pytest
+
+moto = pytest.importorskip("moto")
+
+import sync_and_refresh
+from sync_and_refresh import sync_from_s3
+
+BUCKET = "weather-test"
+KEYS = [
+    "raw/dataset=hourly/city_id=amsterdam/year=2024/month=1/a.parquet",
+    "raw/dataset=hourly/city_id=amsterdam/year=2024/month=1/b.parquet",
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        for key in KEYS:
+            client.put_object(Bucket=BUCKET, Key=key, Body=key.encode())
+        yield client
+
+
+def sync(client, data_dir, **kwargs):
+    return sync_from_s3(BUCKET, "raw", data_dir, max_workers=2, client=client, **kwargs)
+
+
+def test_only_new_objects_are_downloaded(client, tmp_path):
+    downloaded, _ = sync(client, tmp_path)
+    assert sorted(path.name for path in downloaded) == ["a.parquet", "b.parquet"]
+    assert (tmp_path / KEYS[0][len("raw/"):]).read_bytes() == KEYS[0].encode()
+
+    assert sync(client, tmp_path) == ([], [])
+
+
+def test_delete_missing_prunes_local_files_without_an_object(client, tmp_path):
+    sync(client, tmp_path)
+    local_only = tmp_path / "dataset=hourly" / "city_id=berlin" / "year=2024" / "month=1" / "local.parquet"
+    local_only.parent.mkdir(parents=True)
+    local_only.write_bytes(b"local")
+    client.delete_object(Bucket=BUCKET, Key=KEYS[1])
+
+    assert sync(client, tmp_path) == ([], [])
+    assert local_only.exists()
+
+    _, removed = sync(client, tmp_path, delete_missing=True)
+    assert sorted(path.name for path in removed) == ["b.parquet", "local.parquet"]
+    assert not local_only.exists()
+    assert (tmp_path / KEYS[0][len("raw/"):]).exists()
+
+
+def test_database_is_refreshed_when_nothing_was_downloaded(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sync_and_refresh, "sync_from_s3", lambda *args: ([], []))
+    monkeypatch.setattr(sync_and_refresh, "refresh_database", lambda *args: calls.append(args) or {})
+    monkeypatch.setattr(sync_and_refresh, "export_metrics", lambda *args: True)
+    monkeypatch.setattr(sys, "argv", ["sync_and_refresh.py", "--skip-dbt"])
+
+    sync_and_refresh.main()
+
+    assert calls == [(False, None)]
@@ -0,0 +1,35 @@
+"""Tests for ingestion/utils.py and per-city batch ids."""
+
+import utils
+import weather_ingest
+from utils import generate_batch_id
+
+
+def test_batch_id_names_city_and_window():
+    batch_id = generate_batch_id("amsterdam", "2024-03-01")
+
+    assert batch_id.endswith("_amsterdam_20240301")
+
+
+def test_batch_id_sorts_by_time_first(monkeypatch):
+    fixed = utils.datetime(2024, 1, 2, 3, 4, 5)
+
+    class FixedDatetime:
+        @staticmethod
+        def now():
+            return fixed
+
+    monkeypatch.setattr(utils, "datetime", FixedDatetime)
+
+    assert generate_batch_id() == "20240102_030405"
+    assert generate_batch_id("paris") == "20240102_030405_paris"
+
+
+def test_concurrent_cities_get_their_own_batch(monkeypatch):
+    monkeypatch.setattr(weather_ingest.WeatherIngestion, "run", lambda self, *args: [self.batch_id])
+
+    results = weather_ingest.run_cities(["amsterdam", "paris", "london"], "2024-01-01", "2024-01-01")
+
+    batch_ids = [paths[0] for paths in results.values()]
+    assert len(set(batch_ids)) == 3
+    assert all(batch_id.endswith(f"_{city_id}") for city_id, (batch_id,) in results.items())
@@ -0,0 +1,89 @@
+"""Tests for pre-write payload validation and quarantine."""
+
+import os
+import gzip
+import json
+import glob
+
+import pytest
+
+import validation
+import weather_ingest
+from cache import ResponseCache
+from mock_open_meteo import SyntheticWeather
+from validation import validate_payload
+
+START, END = "2024-01-01", "2024-01-03"
+
+
+@pytest.fixture
+def payload():
+    return SyntheticWeather(seed=1).payload(52.37, 4.9, START, END)
+
+
+def checks(issues):
+    return {(found["section"], found["check"], found["variable"]) for found in issues}
+
+
+def test_clean_payload_has_no_issues(payload):
+    assert validate_payload(payload, START, END) == []
+
+
+def test_gap_and_order_in_timestamps(payload):
+    times = payload["hourly"]["time"]
+    times[5], times[6] = times[6], times[5]
+    del payload["daily"]["time"][1]
+    for variable in list(payload["daily"]):
+        if variable != "time":
+            del payload["daily"][variable][1]
+
+    # A swapped pair steps back one hour and then forward two
+    assert checks(validate_payload(payload, START, END)) == {
+        ("hourly", "monotonic", None), ("hourly", "gap_free", None), ("daily", "gap_free", None),
+    }
+
+
+def test_short_coverage(payload):
+    assert checks(validate_payload(payload, START, "2024-01-04")) == {
+        ("hourly", "coverage", None), ("daily", "coverage", None),
+    }
+
+
+def test_nulls_and_out_of_range_values(payload):
+    hourly = payload["hourly"]
+    hourly["temperature_2m"] = [None] * len(hourly["time"])
+    hourly["relative_humidity_2m"][3] = 140
+
+    assert checks(validate_payload(payload, START, END)) == {
+        ("hourly", "null_ratio", "temperature_2m"), ("hourly", "range", "relative_humidity_2m"),
+    }
+
+
+def test_structural_problems(payload):
+    payload["hourly"]["precipitation"].pop()
+    del payload["daily"]["temperature_2m_max"]
+
+    assert checks(validate_payload(payload, START, END)) == {
+        ("hourly", "array_length", None), ("daily", "present", "temperature_2m_max"),
+    }
+    assert checks(validate_payload({}, START, END)) == {("hourly", "present", None), ("daily", "present", None)}
+
+
+def test_quarantined_payload_is_written_and_dropped_from_cache(payload, tmp_path, monkeypatch):
+    payload["hourly"]["relative_humidity_2m"][3] = 140
+    response_cache = ResponseCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(weather_ingest, "response_cache", response_cache)
+    monkeypatch.setattr(weather_ingest, "make_api_request", lambda **kwargs: payload)
+    monkeypatch.setattr(weather_ingest, "RAW_DATA_PATH", str(tmp_path / "raw"))
+    monkeypatch.setattr(validation, "QUARANTINE_PATH", str(tmp_path / "quarantine"))
+
+    ingestion = weather_ingest.WeatherIngestion("amsterdam")
+    assert ingestion.run(START, END) is None
+
+    quarantined, = glob.glob(str(tmp_path / "quarantine" / "amsterdam" / "*.json.gz"))
+    with gzip.open(quarantined, "rt") as f:
+        record = json.load(f)
+    assert record["batch_id"] == ingestion.batch_id
+    assert checks(record["issues"]) == {("hourly", "range", "relative_humidity_2m")}
+    assert response_cache.get(*ingestion.build_request(START, END), ttl_seconds=3600) is None
+    assert not os.path.exists(tmp_path / "raw")
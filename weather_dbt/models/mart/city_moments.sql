@@ -0,0 +1,134 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key=['city_id', 'metric']
+    )
+}}
+
+-- Running (n, mean, M2) per city and metric, the dbt counterpart of
+-- duckdb/running_stats.merge_moments. Incremental builds carry the stored
+-- moments forward and update them with Chan's pairwise formulas:
+--   * rows loaded since the last build (ingestion_timestamp above the
+--     watermark) are folded in;
+--   * rows a reingest replaced since the last build are folded out, if they
+--     had been folded in (ingestion_timestamp at or below the watermark).
+--     setup_database.py copies every replaced raw row to
+--     raw.weather_hourly_replaced before deleting it.
+-- Replaced rows are kept for REPLACED_ROWS_RETENTION_DAYS; a build after a
+-- longer gap, or after a full refresh of the raw tables, needs --full-refresh.
+
+with
+{% if is_incremental() %}
+previous_build as (
+    select max(last_ingestion_timestamp) as watermark, max(built_at) as built_at
+    from {{ this }}
+),
+{% endif %}
+
+new_rows as (
+    select city_id, ingestion_timestamp, cast(temperature_2m as double) as temperature_2m, cast(precipitation as double) as precipitation
+    from {{ ref('stg_weather') }}
+    {% if is_incremental() %}
+    where ingestion_timestamp > (select watermark from previous_build)
+    {% endif %}
+),
+
+added as (
+    select
+        city_id,
+        metric,
+        count(value) as n,
+        avg(value) as mean,
+        var_pop(value) * count(value) as m2,
+        max(ingestion_timestamp) as last_ingestion_timestamp
+    from (
+        unpivot new_rows
+        on temperature_2m, precipitation
+        into name metric value value
+    )
+    group by city_id, metric
+)
+
+{% if is_incremental() %}
+,
+
+-- Same defaults as stg_weather, so the removed values are the ones that were folded in
+replaced_rows as (
+    select
+        city_id,
+        cast(coalesce(temperature_2m, 0.0) as double) as temperature_2m,
+        cast(coalesce(precipitation, 0.0) as double) as precipitation
+    from {{ source('raw', 'weather_hourly_replaced') }}
+    where replaced_at > (select built_at from previous_build)
+      and ingestion_timestamp <= (select watermark from previous_build)
+),
+
+removed as (
+    select city_id, metric, count(value) as n, avg(value) as mean, var_pop(value) * count(value) as m2
+    from (
+        unpivot replaced_rows
+        on temperature_2m, precipitation
+        into name metric value value
+    )
+    group by city_id, metric
+),
+
+-- Stored moments of the touched cities with the replaced rows folded out
+remainder as (
+    select
+        city_id,
+        metric,
+        n,
+        mean,
+        case when r_n is null then t_m2
+            when n > 0 then greatest(t_m2 - r_m2 - pow(r_mean - mean, 2) * n * r_n / t_n, 0)
+            else 0
+        end as m2,
+        last_ingestion_timestamp
+    from (
+        select
+            t.city_id,
+            t.metric,
+            t.n as t_n,
+            t.m2 as t_m2,
+            r.n as r_n,
+            r.mean as r_mean,
+            r.m2 as r_m2,
+            t.n - coalesce(r.n, 0) as n,
+            case when r.n is null then t.mean
+                when t.n > r.n then (t.n * t.mean - r.n * r.mean) / (t.n - r.n)
+                else 0
+            end as mean,
+            t.last_ingestion_timestamp
+        from {{ this }} t
+        left join removed r
+            on r.city_id = t.city_id and r.metric = t.metric
+        where t.city_id in (select city_id from added union select city_id from removed)
+    )
+)
+
+select
+    coalesce(a.city_id, t.city_id) as city_id,
+    coalesce(a.metric, t.metric) as metric,
+    coalesce(t.n, 0) + coalesce(a.n, 0) as n,
+    case when coalesce(a.n, 0) = 0 then t.mean
+        when coalesce(t.n, 0) = 0 then a.mean
+        else t.mean + (a.mean - t.mean) * a.n / (t.n + a.n)
+    end as mean,
+    case when coalesce(a.n, 0) = 0 then t.m2
+        when coalesce(t.n, 0) = 0 then a.m2
+        else t.m2 + a.m2 + pow(a.mean - t.mean, 2) * t.n * a.n / (t.n + a.n)
+    end as m2,
+    greatest(t.last_ingestion_timestamp, a.last_ingestion_timestamp) as last_ingestion_timestamp,
+    current_localtimestamp() as built_at
+from remainder t
+full outer join added a
+    on a.city_id = t.city_id and a.metric = t.metric
+
+{% else %}
+
+select *, current_localtimestamp() as built_at
+from added
+
+{% endif %}
@@ -1,15 +1,24 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key=['city_id', 'time']
+    )
+}}
+
 with staging as (
     select * from {{ ref('stg_weather') }}
 ),
 
+-- Baselines come from the stored running moments rather than a full staging scan
 stats as (
     select
         city_id,
-        avg(temperature_2m) as avg_temp,
-        stddev(temperature_2m) as stddev_temp,
-        avg(precipitation) as avg_precip,
-        stddev(precipitation) as stddev_precip
-    from staging
+        max(mean) filter (where metric = 'temperature_2m') as avg_temp,
+        max(case when n > 1 then sqrt(m2 / (n - 1)) end) filter (where metric = 'temperature_2m') as stddev_temp,
+        max(mean) filter (where metric = 'precipitation') as avg_precip,
+        max(case when n > 1 then sqrt(m2 / (n - 1)) end) filter (where metric = 'precipitation') as stddev_precip
+    from {{ ref('city_moments') }}
     group by city_id
 ),
 
@@ -20,6 +29,7 @@ anomalies as (
         s.city_name,
         s.temperature_2m,
         s.precipitation,
+        s.ingestion_timestamp,
         
         (s.temperature_2m - st.avg_temp) / nullif(st.stddev_temp, 0) as temp_zscore,
         (s.precipitation - st.avg_precip) / nullif(st.stddev_precip, 0) as precip_zscore,
@@ -37,6 +47,10 @@ anomalies as (
     from staging s
     join stats st on s.city_id = st.city_id
     where (s.temperature_2m - st.avg_temp) / nullif(st.stddev_temp, 0) is not null
+    {% if is_incremental() %}
+    -- Score only rows loaded since the last build; the moments still cover all history
+    and s.ingestion_timestamp > (select max(ingestion_timestamp) from {{ this }})
+    {% endif %}
 )
 
 select * from anomalies
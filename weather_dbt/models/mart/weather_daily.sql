@@ -1,5 +1,23 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key=['city_id', 'date']
+    )
+}}
+
 with staging as (
-    select * from {{ ref('stg_weather') }}
+    select * from {{ ref('stg_weather') }} s
+    {% if is_incremental() %}
+    -- Only recompute the city-days that received rows since the last build
+    where exists (
+        select 1
+        from {{ ref('stg_weather') }} n
+        where n.city_id = s.city_id
+          and n.date = s.date
+          and n.ingestion_timestamp > (select max(last_updated) from {{ this }})
+    )
+    {% endif %}
 ),
 
 daily_aggregated as (
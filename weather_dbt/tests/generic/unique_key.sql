@@ -0,0 +1,12 @@
+{% test unique_key(model, columns) %}
+
+-- Keyed uniqueness check: groups on the key columns directly instead of
+-- building a concatenated string for every row
+select
+    {{ columns | join(', ') }},
+    count(*) as n_records
+from {{ model }}
+group by {{ columns | join(', ') }}
+having count(*) > 1
+
+{% endtest %}